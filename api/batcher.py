@@ -0,0 +1,182 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+import torch
+
+
+@dataclass
+class _PendingPick:
+    """Una richiesta in coda: indici nella tabella delle feature e future del risultato."""
+    pack_ids: List[int]
+    pool_ids: List[int]
+    pick_number: int
+    future: asyncio.Future
+    # Pool già codificato (sessioni): se presente si copia così com'è invece di usare pool_ids.
+    pool_features: Optional[torch.Tensor] = None
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class MicroBatcher:
+    """
+    Unisce le richieste concorrenti in un'unica forward del modello: la prima
+    richiesta apre una finestra di al massimo 'max_wait_ms' millisecondi (o
+    'max_batch_size' richieste) e tutte quelle arrivate nel frattempo vengono
+    valutate insieme. La forward gira in un thread dedicato, così l'event loop
+    continua ad accettare richieste (e a riempire il batch successivo).
+
+    Pack e pool vengono riempiti fino alle dimensioni massime come in AIBot:
+    i punteggi sono identici a quelli che il modello dà durante un draft.
+    """
+    def __init__(
+        self,
+        model: torch.nn.Module,
+        features: torch.Tensor,
+        max_pack_size: int,
+        max_pool_size: int,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        device: str = "cpu"
+    ):
+        self.model = model.eval()
+        self.features = features
+        self.max_pack_size = max_pack_size
+        self.max_pool_size = max_pool_size
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.device = device
+
+        self._queue: asyncio.Queue = None
+        self._task: asyncio.Task = None
+        # Un solo thread: le forward sono serializzate e torch usa i suoi thread interni.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="drafter")
+
+        # Statistiche per l'endpoint delle latenze.
+        self.batch_sizes: Deque[int] = deque(maxlen=10_000)
+        self.queue_waits: Deque[float] = deque(maxlen=10_000)
+        self.forward_times: Deque[float] = deque(maxlen=10_000)
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    def warmup(self, batch_sizes=(1, 8)):
+        """Forward di prova all'avvio, così la prima richiesta reale non paga l'inizializzazione."""
+        for size in batch_sizes:
+            dummy = [_PendingPick([0] * self.max_pack_size, [], 1, future=None) for _ in range(size)]
+            self._forward(dummy)
+
+    async def score(
+        self,
+        pack_ids: List[int],
+        pool_ids: List[int],
+        pick_number: int,
+        pool_features: Optional[torch.Tensor] = None
+    ) -> List[float]:
+        """
+        Punteggi del modello per le carte del pack, nello stesso ordine. Il pool
+        si può passare come id oppure già codificato ('pool_features', una riga per carta).
+        """
+        self._validate(pack_ids, pool_ids, pick_number, pool_features)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingPick(pack_ids, pool_ids, pick_number, future, pool_features))
+        return await future
+
+    def _validate(self, pack_ids, pool_ids, pick_number, pool_features):
+        """Controlli per richiesta prima di entrare nel batch: una richiesta malformata non deve far fallire le altre."""
+        if not pack_ids:
+            raise ValueError("Il pack è vuoto.")
+        pool_size = len(pool_features) if pool_features is not None else len(pool_ids)
+        if len(pack_ids) > self.max_pack_size or pool_size > self.max_pool_size:
+            raise ValueError(f"Pack o pool troppo grandi (massimo {self.max_pack_size} e {self.max_pool_size} carte).")
+        num_cards = self.features.shape[0]
+        ids = list(pack_ids) if pool_features is not None else list(pack_ids) + list(pool_ids)
+        if any(not isinstance(card_id, int) or isinstance(card_id, bool) or not 0 <= card_id < num_cards for card_id in ids):
+            raise ValueError(f"Id delle carte non validi (devono essere interi tra 0 e {num_cards - 1}).")
+        if not isinstance(pick_number, int) or isinstance(pick_number, bool):
+            raise ValueError("Il numero del pick deve essere un intero.")
+        if pool_features is not None and tuple(pool_features.shape[1:]) != (self.features.shape[1],):
+            raise ValueError("Le feature del pool non hanno la dimensione attesa.")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self._executor, self._forward, batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    if not batch[0].future.done():
+                        batch[0].future.set_exception(e)
+                    continue
+                # Un errore non deve ricadere sulle altre richieste del batch: si
+                # rivaluta una richiesta alla volta e fallisce solo quella colpevole.
+                results = []
+                for item in batch:
+                    try:
+                        results.extend(await loop.run_in_executor(self._executor, self._forward, [item]))
+                    except Exception as item_error:
+                        results.append(item_error)
+
+            self.batch_sizes.append(len(batch))
+            self.forward_times.append(time.perf_counter() - started)
+            for item, scores in zip(batch, results):
+                self.queue_waits.append(started - item.enqueued_at)
+                if item.future.done():
+                    continue
+                if isinstance(scores, Exception):
+                    item.future.set_exception(scores)
+                else:
+                    item.future.set_result(scores)
+
+    def _forward(self, batch: List[_PendingPick]) -> List[List[float]]:
+        size = len(batch)
+        feature_size = self.features.shape[1]
+        packs = torch.zeros(size, self.max_pack_size, feature_size)
+        pools = torch.zeros(size, self.max_pool_size, feature_size)
+        for i, item in enumerate(batch):
+            packs[i, :len(item.pack_ids)] = self.features[item.pack_ids]
+            if item.pool_features is not None:
+                pools[i, :len(item.pool_features)] = item.pool_features
+            elif item.pool_ids:
+                pools[i, :len(item.pool_ids)] = self.features[item.pool_ids]
+        picks = torch.tensor([[item.pick_number] for item in batch], dtype=torch.long)
+
+        with torch.no_grad():
+            scores = self.model(packs.to(self.device), pools.to(self.device), picks.to(self.device)).cpu()
+        return [scores[i, :len(item.pack_ids)].tolist() for i, item in enumerate(batch)]
+
+    def stats(self) -> Dict[str, float]:
+        def mean(values) -> float:
+            return sum(values) / len(values) if values else 0.0
+        return {
+            "batches": len(self.batch_sizes),
+            "mean_batch_size": mean(self.batch_sizes),
+            "max_batch_size": max(self.batch_sizes, default=0),
+            "mean_queue_wait_ms": mean(self.queue_waits) * 1000,
+            "mean_forward_ms": mean(self.forward_times) * 1000,
+            "queued": self._queue.qsize() if self._queue is not None else 0
+        }
@@ -0,0 +1,327 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from http import HTTPStatus
+from typing import Deque, Dict, Optional, Tuple
+
+from api.batcher import MicroBatcher
+from api.sessions import SessionFullError, SessionStore
+from src.features.cardtable import CardFeatureTable
+from src.models.pickcache import PickCache
+
+# Limiti per richieste malformate o ostili.
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 256 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class PickService:
+    """
+    Servizio HTTP asincrono (solo libreria standard) che consiglia il pick:
+    POST /pick con {"pack": [...], "pool": [...], "pick_number": n}, dove le carte
+    sono nomi o id del database, restituisce le carte del pack ordinate per
+    punteggio. GET /health e GET /metrics espongono stato e latenze.
+    Modello e tabella delle feature sono caricati all'avvio e restano in memoria.
+
+    Con uno SessionStore sono attive anche le sessioni di draft, che tengono il
+    pool lato server: POST /sessions apre una sessione (pool iniziale opzionale),
+    POST /sessions/<id>/picks aggiunge una carta, POST /sessions/<id>/recommend
+    riceve solo il pack, DELETE /sessions/<id> chiude la sessione.
+
+    Con una PickCache gli stati già valutati (stesso pack, stesso pool e stesso
+    pick, in qualunque ordine) vengono serviti senza passare dal modello.
+    """
+    def __init__(
+        self,
+        table: CardFeatureTable,
+        batcher: MicroBatcher,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        sessions: Optional[SessionStore] = None,
+        cache: Optional[PickCache] = None
+    ):
+        self.table = table
+        self.batcher = batcher
+        self.sessions = sessions
+        self.cache = cache
+        self._eviction_task: Optional[asyncio.Task] = None
+        self.host = host
+        self.port = port
+        self.started_at = time.time()
+        self.latencies: Deque[float] = deque(maxlen=10_000)
+        self.requests = 0
+        self.errors = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        await self.batcher.start()
+        if self.sessions is not None:
+            self._eviction_task = asyncio.create_task(self._evict_idle_sessions())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # Con porta 0 il sistema ne sceglie una libera.
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Servizio dei pick in ascolto su http://{self.host}:{self.port}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._eviction_task is not None:
+            self._eviction_task.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def _evict_idle_sessions(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.sessions.idle_timeout_s / 4))
+            self.sessions.evict_idle()
+
+    # --- HTTP ---
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Header troppo grandi.")
+        if len(head) > MAX_HEADER_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Header troppo grandi.")
+
+        lines = head.decode('latin-1').split("\r\n")
+        try:
+            method, path, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Riga di richiesta non valida.")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length non valido.")
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length non valido.")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corpo della richiesta troppo grande.")
+        body = await reader.readexactly(length) if length else b""
+        return method, path.split("?", 1)[0], headers, body
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                keep_alive = True
+                request = None
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    started = time.perf_counter()
+                    status, payload = await self._dispatch(method, path, body)
+                    if path == "/pick" or path.endswith("/recommend"):
+                        self.requests += 1
+                        self.latencies.append(time.perf_counter() - started)
+                except HTTPError as e:
+                    self.errors += 1
+                    status, payload = e.status, {"error": e.message}
+                    # Richiesta non leggibile (header o Content-Length): lo stream non è più allineato.
+                    if request is None:
+                        keep_alive = False
+                except asyncio.IncompleteReadError:
+                    break
+                except (ConnectionError, asyncio.CancelledError):
+                    raise
+                except Exception as e:
+                    # Errore inatteso: il client riceve comunque una risposta e la connessione si chiude.
+                    self.errors += 1
+                    keep_alive = False
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"Errore interno: {type(e).__name__}"}
+
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[HTTPStatus, Dict]:
+        routes = {
+            ("POST", "/pick"): self._pick,
+            ("GET", "/health"): self._health,
+            ("GET", "/metrics"): self._metrics,
+        }
+        if self.sessions is not None and path.startswith("/sessions"):
+            return HTTPStatus.OK, await self._dispatch_session(method, path, body)
+        handler = routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in routes):
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"Metodo {method} non supportato su {path}.")
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Percorso sconosciuto: {path}")
+        return HTTPStatus.OK, await handler(body)
+
+    async def _dispatch_session(self, method: str, path: str, body: bytes) -> Dict:
+        parts = [part for part in path.split("/") if part]
+        if parts == ["sessions"] and method == "POST":
+            return self._open_session(body)
+        if len(parts) < 2:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Percorso sconosciuto: {path}")
+
+        session = self.sessions.get(parts[1])
+        if session is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Sessione inesistente o scaduta: {parts[1]}")
+        if len(parts) == 2 and method == "DELETE":
+            self.sessions.close(session.session_id)
+            return {"closed": session.session_id}
+        action = parts[2] if len(parts) == 3 else None
+        if action == "picks" and method == "POST":
+            card_id = self._resolve(self._parse_json(body).get('card') if body else None, single=True)
+            try:
+                self.sessions.add_pick(session, card_id)
+            except SessionFullError as e:
+                raise HTTPError(HTTPStatus.CONFLICT, str(e))
+            return {"session_id": session.session_id, "pool_size": session.pool_size}
+        if action == "recommend" and method == "POST":
+            request = self._parse_json(body)
+            pack_ids = self._resolve(request.get('pack'))
+            # Senza pick_number si assume un draft regolare: il pick nel pack corrente.
+            pick_number = request.get('pick_number')
+            if pick_number is None:
+                pick_number = session.pool_size % self.batcher.max_pack_size + 1
+            pick_number = self._check_pick_number(
+                pick_number, "Servono 'pack' (lista) e opzionalmente 'pick_number' (intero)."
+            )
+            scores = await self._score(pack_ids, session.pool_ids, pick_number, session.pool_features[:session.pool_size])
+            return {"session_id": session.session_id, **self._ranking(pack_ids, scores, pick_number)}
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"Percorso sconosciuto: {method} {path}")
+
+    def _open_session(self, body: bytes) -> Dict:
+        pool = self._parse_json(body).get('pool', []) if body else []
+        try:
+            session = self.sessions.create(self._resolve(pool))
+        except SessionFullError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+        return {"session_id": session.session_id, "pool_size": session.pool_size}
+
+    # --- Endpoint ---
+
+    @staticmethod
+    def _parse_json(body: bytes) -> Dict:
+        try:
+            request = json.loads(body)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Il corpo della richiesta non è JSON valido.")
+        if not isinstance(request, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Il corpo della richiesta deve essere un oggetto JSON.")
+        return request
+
+    @staticmethod
+    def _check_pick_number(value, message: str) -> int:
+        # Solo interi JSON: int() accetterebbe anche 3.7, "3" e true.
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, message)
+        return value
+
+    def _resolve(self, cards, single: bool = False):
+        """Id delle carte indicate per nome o id (una sola con single=True)."""
+        if single:
+            cards = [cards] if isinstance(cards, (str, int)) else None
+        if not isinstance(cards, list):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Le carte vanno indicate con una lista di nomi o id." if not single
+                            else "Serve 'card': nome o id della carta scelta.")
+        try:
+            ids = self.table.resolve(cards)
+        except KeyError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Carte sconosciute: {e.args[0]}")
+        return ids[0] if single else ids
+
+    async def _score(self, pack_ids, pool_ids, pick_number, pool_features=None):
+        """Punteggi delle carte del pack; con 'pool_features' il pool non viene ricodificato (pool_ids serve alla cache)."""
+        if self.cache is not None:
+            scores = self.cache.get_scores(pack_ids, pool_ids, pick_number)
+            if scores is not None:
+                return scores
+        try:
+            scores = await self.batcher.score(pack_ids, pool_ids, pick_number, pool_features)
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+        except Exception as e:
+            raise HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, f"Errore nella valutazione del modello: {type(e).__name__}")
+        if self.cache is not None:
+            self.cache.put(pack_ids, pool_ids, pick_number, scores)
+        return scores
+
+    async def _pick(self, body: bytes) -> Dict:
+        request = self._parse_json(body)
+        pick_number = self._check_pick_number(
+            request.get('pick_number'), "Servono 'pack' (lista), 'pick_number' (intero) e opzionalmente 'pool'."
+        )
+        pack_ids = self._resolve(request.get('pack'))
+        pool_ids = self._resolve(request.get('pool', []))
+        scores = await self._score(pack_ids, pool_ids, pick_number)
+        return self._ranking(pack_ids, scores, pick_number)
+
+    def _ranking(self, pack_ids, scores, pick_number: int) -> Dict:
+        # Probabilità come softmax sui punteggi delle sole carte del pack.
+        top = max(scores)
+        weights = [math.exp(score - top) for score in scores]
+        total = sum(weights)
+        ranking = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return {
+            "pick_number": pick_number,
+            "ranking": [
+                {"index": i, "id": pack_ids[i], "card": self.table.names[pack_ids[i]],
+                 "score": scores[i], "probability": weights[i] / total}
+                for i in ranking
+            ]
+        }
+
+    async def _health(self, body: bytes) -> Dict:
+        return {"status": "ok", "cards": len(self.table), "uptime_s": round(time.time() - self.started_at, 1)}
+
+    async def _metrics(self, body: bytes) -> Dict:
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_ms": {
+                "p50": _percentile(latencies, 0.50) * 1000,
+                "p95": _percentile(latencies, 0.95) * 1000,
+                "p99": _percentile(latencies, 0.99) * 1000,
+                "max": (latencies[-1] if latencies else 0.0) * 1000
+            },
+            "batching": self.batcher.stats(),
+            "sessions": self.sessions.stats() if self.sessions is not None else None,
+            "cache": self.cache.stats() if self.cache is not None else None
+        }
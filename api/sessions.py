@@ -0,0 +1,105 @@
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import torch
+
+
+@dataclass
+class DraftSession:
+    """
+    Stato di un draft lato server: id delle carte scelte e tensore del pool già
+    codificato e preallocato alla dimensione massima, così ogni pick scrive una
+    sola riga e le raccomandazioni non ricodificano il pool.
+    """
+    session_id: str
+    pool_ids: List[int]
+    pool_features: torch.Tensor
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def pool_size(self) -> int:
+        return len(self.pool_ids)
+
+
+class SessionFullError(Exception):
+    """Il pool della sessione ha raggiunto la dimensione massima del modello."""
+
+
+class SessionStore:
+    """
+    Sessioni di draft in memoria, in ordine di ultimo utilizzo. Le sessioni
+    inattive da più di 'idle_timeout_s' vengono eliminate, e il numero di
+    sessioni è limitato dalla memoria massima concessa ai tensori dei pool:
+    oltre il limite si elimina la sessione usata meno di recente.
+    """
+    def __init__(self, features: torch.Tensor, max_pool_size: int, max_memory_mb: float = 256, idle_timeout_s: float = 1800):
+        self.features = features
+        self.max_pool_size = max_pool_size
+        self.idle_timeout_s = idle_timeout_s
+        self.bytes_per_session = max_pool_size * features.shape[1] * features.element_size()
+        self.max_sessions = max(1, int(max_memory_mb * 1024 * 1024) // self.bytes_per_session)
+        self._sessions: "OrderedDict[str, DraftSession]" = OrderedDict()
+        self.evicted_idle = 0
+        self.evicted_memory = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, pool_ids: Optional[List[int]] = None) -> DraftSession:
+        pool_ids = list(pool_ids or [])
+        if len(pool_ids) > self.max_pool_size:
+            raise SessionFullError(f"Il pool iniziale supera le {self.max_pool_size} carte.")
+        self.evict_idle()
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted_memory += 1
+
+        pool_features = torch.zeros(self.max_pool_size, self.features.shape[1], dtype=self.features.dtype)
+        if pool_ids:
+            pool_features[:len(pool_ids)] = self.features[pool_ids]
+        session = DraftSession(secrets.token_hex(8), pool_ids, pool_features)
+        self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[DraftSession]:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def add_pick(self, session: DraftSession, card_id: int):
+        """Aggiunge una carta al pool: una riga copiata dalla tabella delle feature."""
+        if session.pool_size >= self.max_pool_size:
+            raise SessionFullError(f"Il pool ha già {self.max_pool_size} carte.")
+        session.pool_features[session.pool_size] = self.features[card_id]
+        session.pool_ids.append(card_id)
+
+    def close(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def evict_idle(self) -> int:
+        """Elimina le sessioni inattive; restituisce quante ne sono state eliminate."""
+        cutoff = time.monotonic() - self.idle_timeout_s
+        evicted = 0
+        # Le sessioni sono in ordine di ultimo uso: ci si ferma alla prima ancora attiva.
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used > cutoff:
+                break
+            self._sessions.popitem(last=False)
+            evicted += 1
+        self.evicted_idle += evicted
+        return evicted
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "memory_mb": len(self._sessions) * self.bytes_per_session / (1024 * 1024),
+            "evicted_idle": self.evicted_idle,
+            "evicted_memory": self.evicted_memory
+        }
@@ -7,6 +7,7 @@
 #   ./fullcycle.sh          - Esegue il ciclo completo (default)
 #   ./fullcycle.sh generate - Parte dalla generazione dei log
 #   ./fullcycle.sh train    - Parte dall'addestramento
+#   ./fullcycle.sh stream   - Genera e addestra insieme, in memoria
 #   ./fullcycle.sh evaluate - Esegue solo la valutazione
 #   ./fullcycle.sh cleanup  - Esegue solo la pulizia
 # ===================================================================
@@ -62,6 +63,12 @@ do_train_model() {
     echo "✅ Modello addestrato e salvato."
 }
 
+do_stream_train() {
+    echo "▶️  FASE 2.5+3: Generazione e addestramento in memoria (senza log su disco)..."
+    python scripts/trainstreaming.py
+    echo "✅ Modello addestrato e salvato."
+}
+
 do_evaluate_model() {
     echo "▶️  FASE 4: Valutazione del modello addestrato..."
     python scripts/evaluatemodel.py
@@ -96,6 +103,10 @@ elif [[ "$START_PHASE" == "generate" ]]; then
     do_train_model
     echo
     do_evaluate_model
+elif [[ "$START_PHASE" == "stream" ]]; then
+    do_stream_train
+    echo
+    do_evaluate_model
 elif [[ "$START_PHASE" == "train" ]]; then
     do_train_model
     echo
@@ -104,7 +115,7 @@ elif [[ "$START_PHASE" == "evaluate" ]]; then
     do_evaluate_model
 else
     echo "❌ Argomento non valido: '$START_PHASE'"
-    echo "Uso: ./fullcycle.sh [generate|train|evaluate|cleanup]"
+    echo "Uso: ./fullcycle.sh [generate|stream|train|evaluate|cleanup]"
     exit 1
 fi
 
@@ -0,0 +1,257 @@
+from pathlib import Path
+import sys
+import json
+import platform
+import random
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+import numpy as np
+import torch
+
+from src.utils.config_loader import CONFIG
+from src.utils.constants import ABILITY_PATTERNS, FEATURE_SIZE, KEYWORD_LIST
+from src.environment.draft import Card, DraftPack, Player
+from src.environment.draftsimulator import DraftSimulator
+from src.environment.draftstate import rollout_scores
+from src.environment.opponents import AIBot, RolloutBot, ScoringBot
+from src.features.cardencoders import CardEncoder
+from src.training.logger import DraftLogger
+from src.data.loaders import custom_collate_fn
+from src.evaluation.deckanalyzer import evaluate_deck
+from src.models.transformerdrafter import TransformerDrafter
+
+# Le dimensioni del draft sono fisse: i tempi restano confrontabili anche se
+# cambia la configurazione della simulazione.
+NUM_PLAYERS, PACK_SIZE, NUM_PACKS = 8, 15, 3
+COLORS = ['W', 'U', 'B', 'R', 'G']
+TYPES = ["Creature — Elf", "Creature — Human Wizard", "Instant", "Sorcery", "Artifact", "Enchantment — Aura", "Land"]
+
+# ==================== FIXTURE SINTETICHE ====================
+
+def synthetic_card(rng: random.Random, index: int) -> Card:
+    """Carta finta ma con tutti i campi letti da encoder, bot e analisi dei mazzi."""
+    type_line = rng.choice(TYPES)
+    colors = [] if type_line == "Land" else rng.sample(COLORS, rng.choice([0, 1, 1, 1, 2]))
+    # Testo costruito dai pattern reali, così anche il matching delle abilità lavora davvero.
+    patterns = [p for _, ps in rng.sample(sorted(ABILITY_PATTERNS.items()), 2) for p in ps]
+    details = {
+        "name": f"Synthetic Card {index}",
+        "colors": colors,
+        "color_identity": colors,
+        "cmc": float(rng.randint(0, 7)),
+        "type_line": type_line,
+        "keywords": rng.sample(KEYWORD_LIST, rng.randint(0, 2)),
+        "oracle_text": "When this enters, " + ", ".join(patterns) + ".",
+        "rarity": "common"
+    }
+    if type_line.startswith("Creature"):
+        details.update(power=str(rng.randint(0, 5)), toughness=str(rng.randint(1, 5)))
+    return Card(name=details["name"], details=details)
+
+
+def synthetic_cube(seed: int = 0, size: int = NUM_PLAYERS * PACK_SIZE * NUM_PACKS) -> List[Card]:
+    rng = random.Random(seed)
+    return [synthetic_card(rng, i) for i in range(size)]
+
+
+def synthetic_model(seed: int = 0) -> TransformerDrafter:
+    """TransformerDrafter con pesi casuali ma riproducibili: conta il costo, non la qualità."""
+    torch.manual_seed(seed)
+    return TransformerDrafter(config=CONFIG['model'], feature_size=FEATURE_SIZE).eval()
+
+
+def logged_picks(cube: List[Card]) -> List[Dict]:
+    """Pick di un draft completo registrato dal DraftLogger, nel formato letto dal Dataset."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        logger = DraftLogger(Path(tmp_dir))
+        random.seed(0)
+        players = [Player(player_id=i) for i in range(NUM_PLAYERS)]
+        DraftSimulator(cube, [ScoringBot(p) for p in players], NUM_PLAYERS, PACK_SIZE, NUM_PACKS,
+                       draft_id="fixture", logger=logger, rng=random.Random(0)).run_draft()
+        with open(Path(tmp_dir) / "draft_log_fixture.json", 'r', encoding='utf-8') as f:
+            return json.load(f)['picks']
+
+# ==================== MISURA ====================
+
+def measure(fn: Callable, setup: Optional[Callable] = None, min_time: float = 0.5, min_calls: int = 5) -> Dict[str, float]:
+    """
+    Chiama fn finché il tempo misurato supera 'min_time' (e almeno 'min_calls'
+    volte). 'setup' gira prima di ogni chiamata e non viene cronometrato; il suo
+    risultato viene passato a fn. La prima chiamata è di riscaldamento.
+    """
+    fn(setup()) if setup else fn()
+    samples = []
+    while sum(samples) < min_time or len(samples) < min_calls:
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        fn(argument) if setup else fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "median_ms": statistics.median(samples) * 1000,
+        "p90_ms": samples[int(0.9 * (len(samples) - 1))] * 1000,
+        "calls": len(samples)
+    }
+
+
+def build_benchmarks(log_dir: Path) -> Dict[str, tuple]:
+    """Nome -> (funzione, setup) dei percorsi critici della pipeline; i log vanno in 'log_dir'."""
+    cube = synthetic_cube()
+    encoder = CardEncoder()
+    model = synthetic_model()
+    picks = logged_picks(cube)
+    pack = DraftPack(cards=cube[:PACK_SIZE])
+    pool = cube[PACK_SIZE:PACK_SIZE + 20]
+
+    def bot_with_pool(bot_class, **kwargs):
+        player = Player(player_id=0)
+        player.pool.extend(pool)
+        return bot_class(player, **kwargs)
+
+    scoring_bot = bot_with_pool(ScoringBot)
+    ai_bot = bot_with_pool(AIBot, model=model)
+
+    def new_draft(logger: Optional[DraftLogger] = None) -> DraftSimulator:
+        random.seed(0)
+        players = [Player(player_id=i) for i in range(NUM_PLAYERS)]
+        return DraftSimulator(cube, [ScoringBot(p) for p in players], NUM_PLAYERS, PACK_SIZE, NUM_PACKS,
+                              draft_id="bench", logger=logger, rng=random.Random(0))
+
+    def opening_state(rollout_bot: RolloutBot):
+        """Stato del draft al primo pick (il rollout più lungo), senza buste pre-generate."""
+        simulator = new_draft()
+        rollout_bot.bind_simulator(simulator)
+        simulator.current_packs = simulator._create_packs(1)
+        simulator.current_pack_number, simulator.current_pick_number, simulator.current_seat = 1, 1, 0
+        return simulator.snapshot(rollout_bot.table)
+
+    rollout_bot = RolloutBot(Player(player_id=0), {}, seed=0)
+    draft_state = opening_state(rollout_bot)
+    rollout_rng = np.random.default_rng(0)
+    rollout_lanes = 256
+
+    def rollout_batch():
+        lanes = draft_state.expand(rollout_lanes, rollout_bot.table, rollout_rng, observer=0)
+        rollout_scores(lanes, rollout_bot.table, 0, np.arange(rollout_lanes) % PACK_SIZE, rollout_bot.policy, rollout_rng)
+
+    def filled_logger() -> DraftLogger:
+        logger = DraftLogger(log_dir)
+        logger.start_draft("bench")
+        logger._current_draft_data["bench"]["picks"] = list(picks)
+        return logger
+
+    def model_inputs(batch_size: int):
+        torch.manual_seed(batch_size)
+        return (torch.randn(batch_size, CONFIG['model']['max_pack_size'], FEATURE_SIZE),
+                torch.randn(batch_size, CONFIG['model']['max_pool_size'], FEATURE_SIZE),
+                torch.randint(1, PACK_SIZE + 1, (batch_size, 1)))
+
+    def forward(inputs):
+        with torch.no_grad():
+            model(*inputs)
+
+    benchmarks = {
+        "encode_card": (lambda: [encoder.encode_card(card.details) for card in cube[:100]], None),
+        "scoringbot_pick": (lambda: scoring_bot.pick(pack, 1, 1), None),
+        "run_draft": (lambda simulator: simulator.run_draft(), new_draft),
+        "run_draft_logged": (lambda simulator: simulator.run_draft(),
+                             lambda: new_draft(DraftLogger(log_dir))),
+        "save_draft_log": (lambda logger: logger.save_draft_log("bench"), filled_logger),
+        "collate_batch_64": (lambda: custom_collate_fn(picks[:64]), None),
+        "aibot_pick": (lambda: ai_bot.pick(pack, 1, 1), None),
+        "evaluate_deck": (lambda: evaluate_deck(cube[:45]), None),
+        "draft_state_fork": (lambda: draft_state.fork(), None),
+        "rollout_batch_256": (rollout_batch, None),
+    }
+    for batch_size in CONFIG['benchmark'].get('forward_batch_sizes', [1, 32, 256]):
+        benchmarks[f"forward_batch_{batch_size}"] = (forward, lambda b=batch_size: model_inputs(b))
+    return benchmarks
+
+# ==================== CONFRONTO ====================
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Nomi dei benchmark la cui mediana supera quella della baseline di oltre 'threshold'."""
+    regressions = []
+    print(f"\n{'Benchmark':<22} | {'Mediana (ms)':>12} | {'Baseline (ms)':>13} | {'Rapporto':>8}")
+    print("-" * 66)
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name:<22} | {result['median_ms']:>12.3f} | {'-':>13} | {'nuovo':>8}")
+            continue
+        ratio = result['median_ms'] / reference['median_ms']
+        flag = "  << REGRESSIONE" if ratio > 1 + threshold else ""
+        print(f"{name:<22} | {result['median_ms']:>12.3f} | {reference['median_ms']:>13.3f} | {ratio:>8.2f}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    """
+    Misura i percorsi critici della pipeline su dati sintetici. Con
+    --save-baseline salva i risultati come nuova baseline; altrimenti li
+    confronta con quella salvata ed esce con errore se qualcuno peggiora oltre
+    la soglia. Altri argomenti limitano la misura ai benchmark indicati.
+    """
+    print("--- Benchmark della Pipeline di Draft ---")
+    bench_config = CONFIG['benchmark']
+    baseline_path = PROJECT_ROOT / bench_config['baseline_path']
+    threshold = bench_config.get('regression_threshold', 0.25)
+    save_baseline = "--save-baseline" in sys.argv
+    selected = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+
+    # Un solo thread: i tempi non dipendono dal carico del resto della macchina.
+    torch.set_num_threads(bench_config.get('threads', 1))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as log_dir:
+        for name, (fn, setup) in build_benchmarks(Path(log_dir)).items():
+            if selected and name not in selected:
+                continue
+            results[name] = measure(fn, setup, min_time=bench_config.get('min_time_s', 0.5))
+            print(f"{name:<22} {results[name]['median_ms']:>10.3f} ms  (p90 {results[name]['p90_ms']:.3f} ms, "
+                  f"{results[name]['calls']} chiamate)")
+
+    meta = {
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "threads": torch.get_num_threads(),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+    if save_baseline or not baseline_path.exists():
+        # Si aggiornano solo i benchmark misurati: gli altri restano come erano.
+        baseline = {"meta": meta, "results": {}}
+        if baseline_path.exists():
+            with open(baseline_path, 'r', encoding='utf-8') as f:
+                baseline["results"] = json.load(f)["results"]
+        baseline["results"].update(results)
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\nBaseline salvata in {baseline_path}")
+        return
+
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    for key in ("python", "torch", "machine", "threads"):
+        if baseline["meta"].get(key) != meta[key]:
+            print(f"ATTENZIONE: baseline misurata con {key}={baseline['meta'].get(key)}, ora {meta[key]}.")
+
+    regressions = compare(results, baseline["results"], threshold)
+    if regressions:
+        print(f"\nERRORE: {len(regressions)} benchmark oltre la soglia del {threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\nNessuna regressione oltre la soglia del {threshold:.0%}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from pathlib import Path
+import sys
+import os
+import subprocess
+import time
+from multiprocessing import get_context
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+# Moduli importati dai worker: per ognuno si misura il tempo di import in un
+# interprete nuovo e si controlla se ha caricato torch o letto il YAML.
+MODULES = [
+    "src.utils.config_loader",
+    "src.environment.opponents",
+    "src.environment.draftsimulator",
+    "src.evaluation.evaluationengine",
+    "src.models.transformerdrafter",
+]
+
+_PROBE = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+from src.utils.config_loader import CONFIG
+print(elapsed, 'torch' in sys.modules, CONFIG._data is not None)
+"""
+
+def measure_import(module: str, repeats: int = 3):
+    """Tempo minimo di import di 'module' su più interpreti nuovi."""
+    timings = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(root=str(PROJECT_ROOT), module=module)],
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        timings.append(float(output[0]))
+    return min(timings), output[1] == "True", output[2] == "True"
+
+def _worker_ready(_):
+    # Lavoro minimo di un worker di generazione: un draft con soli ScoringBot richiede solo questo.
+    from src.environment.draft import Player
+    from src.environment.opponents import ScoringBot
+    ScoringBot(Player(player_id=0))
+    return os.getpid(), "torch" in sys.modules
+
+def measure_pool_startup(num_workers: int):
+    """Tempo dal lancio di un pool 'spawn' alla prima risposta di tutti i worker."""
+    start = time.perf_counter()
+    with get_context('spawn').Pool(processes=num_workers) as pool:
+        results = pool.map(_worker_ready, range(num_workers), chunksize=1)
+    return time.perf_counter() - start, any(loaded for _, loaded in results)
+
+def main():
+    print("--- Benchmark dei tempi di avvio ---")
+    print(f"{'Modulo':<36} | {'Import (ms)':>11} | {'torch':>5} | {'YAML letto':>10}")
+    print("-" * 72)
+    for module in MODULES:
+        elapsed, torch_loaded, config_loaded = measure_import(module)
+        print(f"{module:<36} | {elapsed * 1000:>11.1f} | {'sì' if torch_loaded else 'no':>5} | {'sì' if config_loaded else 'no':>10}")
+
+    num_workers = int(sys.argv[1]) if len(sys.argv) > 1 else min(4, os.cpu_count() or 1)
+    elapsed, torch_loaded = measure_pool_startup(num_workers)
+    print(f"\nPool 'spawn' di {num_workers} worker ScoringBot pronto in {elapsed * 1000:.0f} ms "
+          f"(torch caricato nei worker: {'sì' if torch_loaded else 'no'})")
+
+if __name__ == "__main__":
+    main()
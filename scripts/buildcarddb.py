@@ -0,0 +1,33 @@
+from pathlib import Path
+import sys
+import time
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.config_loader import CONFIG
+from src.data.carddb import ingest_card_file, rarity_filter
+
+def main():
+    """
+    Crea il database SQLite delle carte da un file JSON locale (bulk data di
+    Scryfall o un vecchio scryfall_commons.json). Uso:
+        python scripts/buildcarddb.py [file_sorgente.json]
+    """
+    paths_config = CONFIG['paths']
+    card_db_config = CONFIG['card_db']
+
+    source_path = Path(sys.argv[1]) if len(sys.argv) > 1 else PROJECT_ROOT / card_db_config['bulk_path']
+    db_path = PROJECT_ROOT / paths_config['card_db_path']
+    if not source_path.exists():
+        print(f"ERRORE: Il file {source_path} non è stato trovato.")
+        sys.exit(1)
+
+    rarities = card_db_config.get('rarities') or []
+    print(f"Indicizzazione di {source_path} in {db_path} (rarità: {', '.join(rarities) or 'tutte'})...")
+    start = time.perf_counter()
+    num_cards = ingest_card_file(source_path, db_path, predicate=rarity_filter(*rarities) if rarities else None)
+    print(f"✅ {num_cards} carte salvate in {time.perf_counter() - start:.1f}s.")
+
+if __name__ == "__main__":
+    main()
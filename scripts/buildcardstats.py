@@ -0,0 +1,56 @@
+from pathlib import Path
+import sys
+import time
+import numpy as np
+from tqdm import tqdm
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.config_loader import CONFIG
+from src.data.cardstats import CardStatsAccumulator, iter_draft_logs
+
+def main():
+    """
+    Statistiche per carta e per cubo (pick rate, posizione media di presa,
+    frequenza di first pick e di wheel) in un solo passaggio sui log, con
+    memoria limitata. Le cartelle da leggere si possono passare come argomenti
+    (default: la cartella dei log della configurazione).
+    """
+    print("--- Statistiche delle Carte dai Log di Draft ---")
+    stats_config = CONFIG['card_stats']
+    log_dirs = [Path(arg) for arg in sys.argv[1:]] or [PROJECT_ROOT / CONFIG['paths']['log_output_dir']]
+    log_files = sorted(path for log_dir in log_dirs for path in log_dir.glob("*.json"))
+    if not log_files:
+        print(f"ERRORE: Nessun log trovato in {', '.join(map(str, log_dirs))}")
+        sys.exit(1)
+
+    accumulator = CardStatsAccumulator(batch_rows=stats_config.get('batch_rows', 1_000_000))
+    started = time.perf_counter()
+    for log in tqdm(iter_draft_logs(log_files), total=len(log_files), desc="Log"):
+        accumulator.add_draft(log)
+    table = accumulator.table()
+    elapsed = time.perf_counter() - started
+
+    print(f"{table.drafts} draft, {table.picks} pick, {len(table.card_names)} carte in "
+          f"{len(table.cube_names)} cubi ({elapsed:.1f} s, {table.picks / max(elapsed, 1e-9):.0f} pick/s)")
+    if accumulator.skipped:
+        print(f"AVVISO: {accumulator.skipped} log senza i nomi delle carte (generati prima di 'pack_cards') ignorati.")
+
+    min_seen, top_n = stats_config.get('min_seen', 20), stats_config.get('top_n', 10)
+    for cube in table.cube_names:
+        stats = table.statistics(cube)
+        known = np.nonzero(stats['seen'] >= min_seen)[0]
+        best = known[np.argsort(stats['avg_pick'][known])][:top_n]
+        print(f"\n{cube}: carte prese prima (viste almeno {min_seen} volte)")
+        print(f"{'Carta':<40} | {'Viste':>6} | {'Pick rate':>9} | {'Pos. media':>10} | {'First pick':>10} | {'Wheel':>6}")
+        for i in best:
+            print(f"{table.card_names[i]:<40} | {stats['seen'][i]:>6} | {stats['pick_rate'][i]:>9.1%} | "
+                  f"{stats['avg_pick'][i]:>10.2f} | {stats['first_pick_rate'][i]:>10.1%} | {stats['wheel_rate'][i]:>6.1%}")
+
+    output_path = PROJECT_ROOT / stats_config['output_path']
+    table.save(output_path)
+    print(f"\n✅ Tabella salvata in {output_path} ({output_path.stat().st_size / 1024:.0f} KB)")
+
+if __name__ == "__main__":
+    main()
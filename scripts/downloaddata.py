@@ -6,18 +6,30 @@ PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.append(str(PROJECT_ROOT))
 
 
-from src.data.collectors import download_scryfall_commons, download_cubecobra_list
+from src.utils.config_loader import CONFIG
+from src.data.collectors import download_scryfall_bulk, CubeDownloader
+from src.data.carddb import ingest_card_file, rarity_filter
 
 # --- Configurazione ---
 DATA_DIR = PROJECT_ROOT / "data"
-SCRYFALL_OUTPUT_FILE = DATA_DIR / "external" / "scryfall_commons.json"
+SCRYFALL_BULK_FILE = PROJECT_ROOT / CONFIG['card_db']['bulk_path']
+CARD_DB_FILE = PROJECT_ROOT / CONFIG['paths']['card_db_path']
 CUBE_LISTS_DIR = DATA_DIR / "raw" / "cube_lists"
 
 def main():
     """Script per scaricare i dati necessari per l'ambiente Pauper."""
     print("--- Avvio download dati (Focus: Pauper) ---")
 
-    download_scryfall_commons(output_path=SCRYFALL_OUTPUT_FILE)
+    # Un unico file bulk invece delle pagine della ricerca: viene poi letto in
+    # streaming e indicizzato in SQLite, tenendo solo le rarità richieste.
+    download_scryfall_bulk(output_path=SCRYFALL_BULK_FILE, bulk_type=CONFIG['card_db']['bulk_type'])
+    # Il database si ricostruisce anche quando il file bulk è più recente (nuovo download).
+    if SCRYFALL_BULK_FILE.exists() and (
+        not CARD_DB_FILE.exists() or SCRYFALL_BULK_FILE.stat().st_mtime > CARD_DB_FILE.stat().st_mtime
+    ):
+        rarities = CONFIG['card_db'].get('rarities') or []
+        num_cards = ingest_card_file(SCRYFALL_BULK_FILE, CARD_DB_FILE, predicate=rarity_filter(*rarities) if rarities else None)
+        print(f"✅ Database carte creato: {num_cards} carte in {CARD_DB_FILE}")
 
     pauper_cubes_to_download = [
         "thepaupercube",
@@ -28,9 +40,13 @@ def main():
     ]
     
     print("\n--- Download Liste Cubi Pauper ---")
-    for cube_id in pauper_cubes_to_download:
-        cube_output_path = CUBE_LISTS_DIR / f"{cube_id}.json"
-        download_cubecobra_list(cube_id=cube_id, output_path=cube_output_path)
+    # I cubi già scaricati non vengono saltati: se non sono cambiati il server risponde 304.
+    with CubeDownloader(output_dir=CUBE_LISTS_DIR) as downloader:
+        results = downloader.download_many(pauper_cubes_to_download)
+    for status in ("updated", "not_modified", "error"):
+        cube_ids = [cube_id for cube_id, result in results.items() if result == status]
+        if cube_ids:
+            print(f"  {status}: {', '.join(cube_ids)}")
 
     print("\n--- Download completato. ---")
 
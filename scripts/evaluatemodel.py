@@ -1,21 +1,28 @@
 from pathlib import Path
 import sys
+import os
 import json
-import torch
+import re
+import time
 import numpy as np
 from tqdm import tqdm
 from typing import Dict, List
-import random
-from scipy.stats import ttest_ind
 
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.append(str(PROJECT_ROOT))
 
 from src.utils.config_loader import CONFIG
-from src.environment.draft import Card, Player
-from src.environment.draftsimulator import DraftSimulator
-from src.environment.opponents import AIBot, ScoringBot
-from src.evaluation.deckanalyzer import evaluate_deck
+from src.utils.lazyimport import lazy_import
+from src.environment.draft import Card
+from src.data.cuberesolver import resolve_cubes, load_cube_cards, report_unmatched
+from src.evaluation.deckanalyzer import score_pools
+from src.evaluation.evaluationengine import ParallelEvaluator, build_tasks, build_rotation_tasks, build_checkpoint_tasks
+from src.evaluation.sequential import SequentialTest, BETTER, WORSE
+from src.environment.simmetrics import SimulationMetrics, format_metrics_report
+
+# Con 'spawn' ogni worker reimporta questo script: scipy serve solo al processo
+# principale per i test finali, quindi viene importato al primo uso.
+stats = lazy_import("scipy.stats")
 
 def load_json_file(path: Path):
     if not path.exists():
@@ -24,21 +31,25 @@ def load_json_file(path: Path):
     with open(path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def print_deck_comparison(ai_player: Player, bot_player: Player):
+def print_deck_comparison(ai_pool: List[str], bot_pool: List[str], card_details: Dict[str, Dict], deck_config: Dict):
     """Stampa una tabella comparativa dei mazzi finali."""
     print("\n" + "="*95)
     print("--- Confronto Mazzi (dall'ultimo draft eseguito) ---".center(95))
     print("="*95)
     
-    ai_deck_names = sorted([card.name for card in ai_player.pool])
-    bot_deck_names = sorted([card.name for card in bot_player.pool])
+    ai_deck_names = sorted(ai_pool)
+    bot_deck_names = sorted(bot_pool)
     
     max_len = max(len(ai_deck_names), len(bot_deck_names))
     
     # MODIFICA: Estrae il 'final_score' dal dizionario restituito da evaluate_deck.
-    ai_score_dict = evaluate_deck(ai_player.pool)
-    bot_score_dict = evaluate_deck(bot_player.pool)
-    header = f"{f'Mazzo dell\'IA (Punteggio: {ai_score_dict['final_score']:.2f})':<45} | {f'Mazzo dello ScoringBot (Punteggio: {bot_score_dict['final_score']:.2f})':<45}"
+    ai_score_dict, bot_score_dict = score_pools(
+        [[Card(name=name, details=card_details[name]) for name in pool] for pool in (ai_pool, bot_pool)],
+        deck_config=deck_config
+    )
+    ai_title = f"Mazzo dell'IA (Punteggio: {ai_score_dict['final_score']:.2f})"
+    bot_title = f"Mazzo dello ScoringBot (Punteggio: {bot_score_dict['final_score']:.2f})"
+    header = f"{ai_title:<45} | {bot_title:<45}"
     print(header)
     print("-" * len(header))
     
@@ -49,6 +60,144 @@ def print_deck_comparison(ai_player: Player, bot_player: Player):
         print(row)
     print("-" * len(header))
 
+def mean_confidence_interval(values: List[float], confidence: float = 0.95):
+    """Media e semi-ampiezza dell'intervallo di confidenza t di Student."""
+    mean = float(np.mean(values))
+    if len(values) < 2:
+        return mean, float('nan')
+    sem = float(np.std(values, ddof=1)) / np.sqrt(len(values))
+    return mean, float(stats.t.ppf((1 + confidence) / 2, len(values) - 1) * sem)
+
+def find_checkpoints(model_dir: Path, eval_config: Dict) -> Dict[str, Path]:
+    """Checkpoint per epoca salvati dal Trainer (più il modello finale), in ordine di epoca."""
+    checkpoints = {}
+    wanted_epochs = set(eval_config.get('checkpoint_epochs') or [])
+    every = eval_config.get('checkpoint_every', 1)
+    epoch_paths = []
+    for path in model_dir.glob("transformer_drafter_epoch_*.pth"):
+        match = re.search(r"_epoch_(\d+)\.pth$", path.name)
+        if match:
+            epoch_paths.append((int(match.group(1)), path))
+    for epoch, path in sorted(epoch_paths):
+        if (wanted_epochs and epoch in wanted_epochs) or (not wanted_epochs and epoch % every == 0):
+            checkpoints[f"epoch_{epoch}"] = path
+    final_path = model_dir / "model_final.pth"
+    if final_path.exists():
+        checkpoints["final"] = final_path
+    return checkpoints
+
+def load_valid_cubes(paths_config: Dict, sim_config: Dict):
+    """Legge i cubi con abbastanza carte per un draft e li risolve in oggetti Card."""
+    cube_lists_dir = PROJECT_ROOT / paths_config['cube_lists_dir']
+    card_db_path = PROJECT_ROOT / paths_config['card_db_path']
+    
+    cards_needed_for_draft = sim_config['num_players'] * sim_config['num_packs'] * sim_config['pack_size']
+    
+    # I cubi sono risolti in id del database una volta sola e tenuti in cache su disco;
+    # dal database si leggono solo le carte dei cubi usati. Ai worker passiamo solo queste.
+    resolved_cubes = resolve_cubes(cube_lists_dir.glob("*.json"), card_db_path, PROJECT_ROOT / paths_config['cube_cache_dir'])
+    report_unmatched(resolved_cubes)
+    valid_cubes: Dict[str, List[Card]] = load_cube_cards(
+        {name: cube for name, cube in resolved_cubes.items() if len(cube) >= cards_needed_for_draft},
+        card_db_path
+    )
+    card_details = {card.name: card.details for cards in valid_cubes.values() for card in cards}
+
+    if not valid_cubes:
+        print(f"ERRORE: Nessun cubo valido trovato con almeno {cards_needed_for_draft} carte.")
+        sys.exit(1)
+    print(f"Trovati {len(valid_cubes)} cubi validi per la valutazione.")
+    return valid_cubes, card_details
+
+def report_simulation_metrics(metrics: SimulationMetrics, wall_seconds: float, metrics_config: Dict):
+    """Stampa il riepilogo delle metriche di simulazione e lo salva nei file configurati."""
+    print("\n--- Metriche di Simulazione ---")
+    print(format_metrics_report(metrics.summary(wall_seconds)))
+    for output in metrics_config.get('outputs', []):
+        metrics.export(PROJECT_ROOT / output, wall_seconds)
+        print(f"Metriche salvate in {PROJECT_ROOT / output}")
+
+def run_checkpoint_sweep(valid_cubes: Dict[str, List[Card]], model_dir: Path, sim_config: Dict, eval_config: Dict):
+    """
+    Confronta tutti i checkpoint sugli stessi draft: per ogni seme le buste sono
+    identiche per ogni checkpoint e per il draft di riferimento di soli ScoringBot,
+    quindi basta un'unica passata invece di una valutazione completa per epoca.
+    """
+    checkpoints = find_checkpoints(model_dir, eval_config)
+    if not checkpoints:
+        print(f"ERRORE: Nessun checkpoint trovato in {model_dir}.")
+        sys.exit(1)
+
+    num_workers = eval_config.get('num_workers') or os.cpu_count() or 1
+    metrics_config = eval_config.get('metrics', {})
+    seeds_per_cube = eval_config.get('checkpoint_seeds_per_cube', 10)
+    tasks = build_checkpoint_tasks(valid_cubes.keys(), seeds_per_cube, eval_config.get('seed', 0))
+    print(f"Confronto di {len(checkpoints)} checkpoint su {len(tasks)} set di buste condivisi "
+          f"({len(checkpoints) + 1} draft ciascuno) su {num_workers} processi...")
+
+    evaluator = ParallelEvaluator(
+        cubes=valid_cubes,
+        model_path=None,
+        sim_config=sim_config,
+        num_workers=num_workers,
+        threads_per_worker=eval_config.get('threads_per_worker', 1),
+        deck_config=eval_config,
+        checkpoint_paths=checkpoints,
+        pick_cache_size=eval_config.get('pick_cache_size', 0),
+        collect_metrics=metrics_config.get('enabled', False)
+    )
+
+    scores: Dict[str, List[float]] = {name: [] for name in checkpoints}
+    baseline_scores: List[float] = []
+    sim_metrics = SimulationMetrics()
+    started = time.perf_counter()
+    for result in tqdm(evaluator.run(tasks), total=len(tasks), desc="Valutazione Checkpoint"):
+        baseline_scores.append(result.baseline_score)
+        for name, score in result.checkpoint_scores.items():
+            scores[name].append(score)
+        if result.metrics:
+            sim_metrics.merge(SimulationMetrics.from_dict(result.metrics))
+    wall_seconds = time.perf_counter() - started
+
+    # I risultati arrivano in ordine sparso ma ogni lista è allineata per set di buste,
+    # quindi le differenze sono appaiate anche tra checkpoint diversi.
+    baseline = np.array(baseline_scores)
+    best_name = max(scores, key=lambda name: np.mean(scores[name]))
+    best = np.array(scores[best_name])
+
+    print("\n" + "="*95)
+    print("--- Punteggio per Checkpoint (intervalli di confidenza al 95%) ---".center(95))
+    print("="*95)
+    header = f"{'Checkpoint':<12} | {'Punteggio IA':>18} | {'IA - ScoringBot':>18} | {'Distacco dal migliore':>24}"
+    print(header)
+    print("-" * len(header))
+    summary = []
+    for name, values in scores.items():
+        values = np.array(values)
+        mean, half_width = mean_confidence_interval(values)
+        diff_mean, diff_half = mean_confidence_interval(values - baseline)
+        gap_mean, gap_half = mean_confidence_interval(values - best)
+        gap = "migliore" if name == best_name else f"{gap_mean:+.2f} ± {gap_half:.2f}"
+        print(f"{name:<12} | {mean:>9.2f} ± {half_width:<6.2f} | {diff_mean:>+9.2f} ± {diff_half:<6.2f} | {gap:>24}")
+        summary.append({
+            "checkpoint": name, "path": str(checkpoints[name]), "drafts": len(values),
+            "mean_score": mean, "ci95": half_width,
+            "mean_diff_vs_scoringbot": diff_mean, "diff_ci95": diff_half,
+            "mean_gap_vs_best": gap_mean, "gap_ci95": gap_half
+        })
+    print("-" * len(header))
+    print(f"Punteggio medio ScoringBot di riferimento: {baseline.mean():.2f}")
+    print(f"Checkpoint migliore: {best_name} ({checkpoints[best_name].name}). I checkpoint il cui intervallo "
+          f"di distacco include lo zero non sono distinguibili dal migliore.")
+
+    output_path = model_dir / "checkpoint_sweep.json"
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({"best": best_name, "checkpoints": summary}, f, indent=2)
+    print(f"Risultati salvati in {output_path}")
+
+    if sim_metrics.drafts:
+        report_simulation_metrics(sim_metrics, wall_seconds, metrics_config)
+
 def main():
     """Esegue una valutazione statisticamente robusta del modello AI."""
     print("--- Avvio Script di Valutazione Statistica ---")
@@ -56,6 +205,12 @@ def main():
     paths_config = CONFIG['paths']
     sim_config = CONFIG['simulation']
     eval_config = CONFIG['evaluation']
+
+    # "checkpoints": confronta tutte le epoche salvate invece del solo modello finale.
+    if eval_config.get('mode', 'standard') == 'checkpoints':
+        valid_cubes, _ = load_valid_cubes(paths_config, sim_config)
+        run_checkpoint_sweep(valid_cubes, PROJECT_ROOT / paths_config['model_save_dir'], sim_config, eval_config)
+        return
     
     model_name = "model_final.pth"
     model_path = PROJECT_ROOT / paths_config['model_save_dir'] / model_name
@@ -64,66 +219,83 @@ def main():
         sys.exit(1)
     print(f"Valutazione del modello: {model_name}")
 
-    card_db_path = PROJECT_ROOT / paths_config['card_db_path']
-    card_database = load_json_file(card_db_path)
-    card_db_by_name = {card['name']: card for card in card_database}
-    
-    cube_lists_dir = PROJECT_ROOT / paths_config['cube_lists_dir']
-    all_cubes = list(cube_lists_dir.glob("*.json"))
-    
-    cards_needed_for_draft = sim_config['num_players'] * sim_config['num_packs'] * sim_config['pack_size']
-    
-    valid_cubes = []
-    for cube_path in all_cubes:
-        cube_data = load_json_file(cube_path)
-        if len(cube_data.get('cards', [])) >= cards_needed_for_draft:
-            valid_cubes.append(cube_path)
+    valid_cubes, card_details = load_valid_cubes(paths_config, sim_config)
 
-    if not valid_cubes:
-        print(f"ERRORE: Nessun cubo valido trovato con almeno {cards_needed_for_draft} carte.")
-        sys.exit(1)
-    print(f"Trovati {len(valid_cubes)} cubi validi per la valutazione.")
+    num_workers = eval_config.get('num_workers') or os.cpu_count() or 1
+    # "rotated": un set di buste per seme, rigiocato con l'IA in ogni posto e
+    # confrontato con 8 ScoringBot sulle stesse buste (confronti appaiati).
+    rotated = eval_config.get('mode', 'standard') == 'rotated'
+    if rotated:
+        seeds_per_cube = eval_config.get('rotation_seeds_per_cube', 5)
+        tasks = build_rotation_tasks(valid_cubes.keys(), seeds_per_cube, eval_config.get('seed', 0))
+        total_drafts = len(tasks)
+        print(f"Modalità a rotazione: {seeds_per_cube} set di buste per cubo, {total_drafts} in totale "
+              f"({sim_config['num_players'] + 1} draft ciascuno) su {num_workers} processi...")
+    else:
+        drafts_per_cube = eval_config['drafts_per_cube']
+        tasks = build_tasks(valid_cubes.keys(), drafts_per_cube, eval_config.get('seed', 0))
+        total_drafts = len(tasks)
+        print(f"Esecuzione di {drafts_per_cube} draft per cubo, per un totale di {total_drafts} simulazioni "
+              f"su {num_workers} processi...")
 
-    drafts_per_cube = eval_config['drafts_per_cube']
-    total_drafts = len(valid_cubes) * drafts_per_cube
-    print(f"Esecuzione di {drafts_per_cube} draft per cubo, per un totale di {total_drafts} simulazioni...")
+    evaluator = ParallelEvaluator(
+        cubes=valid_cubes,
+        model_path=model_path,
+        sim_config=sim_config,
+        num_workers=num_workers,
+        threads_per_worker=eval_config.get('threads_per_worker', 1),
+        deck_config=eval_config,
+        pick_cache_size=eval_config.get('pick_cache_size', 0),
+        collect_metrics=eval_config.get('metrics', {}).get('enabled', False)
+    )
+
+    # Modalità sequenziale: si controlla il risultato dopo ogni draft e ci si ferma
+    # appena è deciso; il budget di draft sopra diventa solo il massimo.
+    seq_config = eval_config.get('sequential', {})
+    sequential_test = None
+    if seq_config.get('enabled'):
+        sequential_test = SequentialTest(
+            alpha=seq_config.get('alpha', 0.05),
+            min_samples=seq_config.get('min_drafts', 10),
+            optimize_at=seq_config.get('optimize_at', 100),
+            margin=seq_config.get('indifference_margin', 0.0)
+        )
+        print(f"Test sequenziale attivo (alpha={sequential_test.alpha}): "
+              f"la valutazione si ferma appena il risultato è deciso (massimo {total_drafts} draft).")
 
     all_ai_scores, all_bot_scores = [], []
-    last_draft_players = None
+    paired_differences = []
+    last_result = None
+    decision = None
+    sim_metrics = SimulationMetrics()
+    started = time.perf_counter()
 
     with tqdm(total=total_drafts, desc="Valutazione Statistica") as progress_bar:
-        for cube_path in valid_cubes:
-            cube_data = load_json_file(cube_path)
-            cube_card_names = cube_data.get('cards', [])
-            cube_full_details = [Card(name=name, details=card_db_by_name[name]) for name in cube_card_names if name in card_db_by_name]
-            
-            for i in range(drafts_per_cube):
-                players = [Player(player_id=j) for j in range(sim_config['num_players'])]
-                bots = [AIBot(players[0], model_path)] + [ScoringBot(p) for p in players[1:]]
-                
-                simulator = DraftSimulator(
-                    cube_list=cube_full_details,
-                    bots=bots,
-                    num_players=sim_config['num_players'],
-                    pack_size=sim_config['pack_size'],
-                    num_packs=sim_config['num_packs'],
-                    draft_id=f"eval_{cube_path.stem}_{i}"
-                )
-                # MODIFICA: Tratta l'output del simulatore come un dizionario
-                final_players_dict = simulator.run_draft(verbose=False)
-                last_draft_players = final_players_dict
-
-                # MODIFICA: Estrae il 'final_score' e itera sui giocatori corretti
-                ai_player = final_players_dict[0]
-                bot_players = [final_players_dict[i] for i in range(1, sim_config['num_players'])]
-
-                all_ai_scores.append(evaluate_deck(ai_player.pool)['final_score'])
-                all_bot_scores.extend([evaluate_deck(p.pool)['final_score'] for p in bot_players])
-                
-                progress_bar.update(1)
-
-    if last_draft_players:
-        print_deck_comparison(last_draft_players[0], last_draft_players[1])
+        for result in evaluator.run(tasks, ordered=sequential_test is not None):
+            if rotated:
+                all_ai_scores.extend(result.ai_scores)
+                all_bot_scores.extend(result.baseline_scores)
+                paired_difference = result.paired_difference
+            else:
+                all_ai_scores.append(result.ai_score)
+                all_bot_scores.extend(result.bot_scores)
+                # Differenza appaiata: stesso draft, stesse buste per IA e ScoringBot.
+                paired_difference = result.ai_score - float(np.mean(result.bot_scores))
+            paired_differences.append(paired_difference)
+            last_result = result
+            if result.metrics:
+                sim_metrics.merge(SimulationMetrics.from_dict(result.metrics))
+            progress_bar.update(1)
+
+            if sequential_test is not None:
+                decision = sequential_test.update(paired_difference)
+                if decision:
+                    break
+
+    wall_seconds = time.perf_counter() - started
+
+    if last_result:
+        print_deck_comparison(last_result.ai_pool, last_result.bot_pool, card_details, eval_config)
 
     print("\n" + "="*95)
     print("--- Risultati Statistici della Valutazione ---".center(95))
@@ -144,8 +316,24 @@ def main():
     else:
         print("\n❌ L'IA ha ottenuto un punteggio medio INFERIORE o uguale allo ScoringBot.")
         
-    if len(all_ai_scores) > 1 and len(all_bot_scores) > 1:
-        t_stat, p_value = ttest_ind(all_ai_scores, all_bot_scores, equal_var=False, alternative='greater')
+    if sequential_test is not None:
+        # Con l'arresto anticipato il p-value di un t-test a campione fisso non è valido:
+        # vale solo la decisione della confidence sequence, riportata sotto.
+        pass
+    elif rotated and len(paired_differences) > 1:
+        # Ogni set di buste dà una differenza appaiata (media sui posti): test a una coda sulla media.
+        t_stat, p_value = stats.ttest_1samp(paired_differences, 0.0, alternative='greater')
+        print(f"\n--- Test di Significatività (T-test appaiato a una coda, {len(paired_differences)} set di buste) ---")
+        print(f"Differenza media IA - ScoringBot per posto: {np.mean(paired_differences):.2f}")
+        print(f"P-value: {p_value:.4f}")
+
+        alpha = 0.05
+        if p_value < alpha:
+            print(f"Il risultato è statisticamente significativo (p < {alpha}). Si può affermare con alta confidenza che l'IA è superiore.")
+        else:
+            print(f"Il risultato NON è statisticamente significativo (p >= {alpha}). Non si può concludere che la differenza sia reale.")
+    elif len(all_ai_scores) > 1 and len(all_bot_scores) > 1:
+        t_stat, p_value = stats.ttest_ind(all_ai_scores, all_bot_scores, equal_var=False, alternative='greater')
         print(f"\n--- Test di Significatività (T-test a una coda) ---")
         print(f"P-value: {p_value:.4f}")
         
@@ -155,5 +343,22 @@ def main():
         else:
             print(f"Il risultato NON è statisticamente significativo (p >= {alpha}). Non si può concludere che la differenza sia reale.")
 
+    if sequential_test is not None:
+        low, high = sequential_test.interval()
+        print(f"\n--- Test Sequenziale (confidence sequence, alpha={sequential_test.alpha}) ---")
+        print(f"Osservazioni (draft o set di buste): {sequential_test.count} su un massimo di {total_drafts}")
+        print(f"Differenza media IA - ScoringBot per osservazione: {sequential_test.mean:.2f} (intervallo: [{low:.2f}, {high:.2f}])")
+        if decision == BETTER:
+            print("Deciso: l'IA è SUPERIORE allo ScoringBot.")
+        elif decision == WORSE:
+            print("Deciso: l'IA è INFERIORE allo ScoringBot.")
+        elif decision:
+            print("Deciso: la differenza è entro il margine di indifferenza.")
+        else:
+            print("Budget massimo esaurito senza una decisione al livello richiesto.")
+
+    if sim_metrics.drafts:
+        report_simulation_metrics(sim_metrics, wall_seconds, eval_config.get('metrics', {}))
+
 if __name__ == '__main__':
     main()
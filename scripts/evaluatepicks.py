@@ -0,0 +1,91 @@
+from pathlib import Path
+import sys
+import re
+import json
+import time
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.config_loader import CONFIG
+from src.data.loaders import DraftLogDataset, PackedDraftDataset, split_by_draft
+from src.environment.opponents import load_drafter_model
+from src.evaluation.pickaccuracy import PickAccuracyEvaluator, format_pick_report
+
+def list_models(model_dir: Path, all_checkpoints: bool):
+    """Modello finale, oppure tutti i checkpoint per epoca in ordine seguito dal finale."""
+    models = []
+    if all_checkpoints:
+        epoch_paths = []
+        for path in model_dir.glob("transformer_drafter_epoch_*.pth"):
+            match = re.search(r"_epoch_(\d+)\.pth$", path.name)
+            if match:
+                epoch_paths.append((int(match.group(1)), path))
+        models = [path for _, path in sorted(epoch_paths)]
+    final_path = model_dir / "model_final.pth"
+    if final_path.exists():
+        models.append(final_path)
+    return models
+
+def main():
+    """Accuratezza dei pick sui draft di validazione, senza simulare nessun draft."""
+    print("--- Avvio Valutazione Offline dei Pick ---")
+
+    paths_config = CONFIG['paths']
+    model_config = CONFIG['model']
+    train_config = CONFIG['training']
+    offline_config = CONFIG['evaluation'].get('offline', {})
+
+    LOGS_DIR = PROJECT_ROOT / paths_config['log_output_dir']
+    MODEL_DIR = PROJECT_ROOT / paths_config['model_save_dir']
+    DATASET_PATH = PROJECT_ROOT / offline_config.get('dataset_path', "data/processed/pauper_generalist_packed.pt")
+
+    # Come in sweephyperparams.py: i log JSON vengono parsati una volta sola. Il file
+    # si ricostruisce se i log sono cambiati, altrimenti la divisione per draft non
+    # corrisponderebbe più a quella dell'addestramento.
+    if not PackedDraftDataset.is_current(DATASET_PATH, LOGS_DIR):
+        print("Caricamento e compattazione del dataset...")
+        PackedDraftDataset.from_log_dataset(DraftLogDataset(logs_dir=LOGS_DIR)).save(DATASET_PATH)
+    else:
+        print(f"Uso il dataset compatto esistente: {DATASET_PATH}")
+    dataset = PackedDraftDataset.load(DATASET_PATH, mmap=True)
+
+    # Stessa divisione per draft dell'addestramento: si valuta solo su draft mai visti.
+    _, val_set = split_by_draft(
+        dataset,
+        val_fraction=train_config.get('val_fraction', 0.1),
+        seed=train_config.get('split_seed', 42)
+    )
+    evaluator = PickAccuracyEvaluator(
+        dataset,
+        indices=val_set.indices,
+        batch_size=offline_config.get('batch_size', 1024),
+        max_pack_size=model_config['max_pack_size'],
+        max_pool_size=model_config['max_pool_size'],
+        fixed_padding=offline_config.get('fixed_padding', True)
+    )
+    print(f"Pick di validazione: {len(evaluator)}")
+
+    model_paths = list_models(MODEL_DIR, offline_config.get('all_checkpoints', False))
+    if not model_paths:
+        print(f"ERRORE: Nessun modello trovato in {MODEL_DIR}.")
+        sys.exit(1)
+
+    summary = {}
+    for model_path in model_paths:
+        model = load_drafter_model(model_path, "cpu")
+        start = time.perf_counter()
+        metrics = evaluator.evaluate(model)
+        elapsed = time.perf_counter() - start
+        print(f"\n--- {model_path.name} ({metrics['picks'] / max(elapsed, 1e-9) * 60:,.0f} pick/minuto) ---")
+        for line in format_pick_report(metrics):
+            print(line)
+        summary[model_path.name] = metrics
+
+    output_path = MODEL_DIR / "pick_accuracy.json"
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print(f"\nRisultati salvati in {output_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+from pathlib import Path
+import sys
+import random
+import time
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.config_loader import CONFIG
+from src.environment.draft import Player
+from src.environment.draftsimulator import DraftSimulator
+from src.environment.opponents import RolloutBot, ScoringBot
+from src.data.cuberesolver import resolve_cubes, load_cube_cards, report_unmatched
+from src.evaluation.deckanalyzer import DeckFeatureTable, score_pools
+from src.evaluation.evaluationengine import draft_seed
+
+def main():
+    """
+    Confronta RolloutBot e ScoringBot sulle stesse buste: per ogni seme gioca
+    il draft con 8 ScoringBot e lo rigioca con un RolloutBot in un posto (a
+    rotazione); la differenza di punteggio sullo stesso posto è appaiata.
+    """
+    print("--- Valutazione RolloutBot vs ScoringBot (buste condivise) ---")
+    paths_config = CONFIG['paths']
+    sim_config = CONFIG['simulation']
+    rollout_config = CONFIG['rollout_bot']
+    deck_config = CONFIG['evaluation']
+    num_players, pack_size, num_packs = sim_config['num_players'], sim_config['pack_size'], sim_config['num_packs']
+
+    resolved_cubes = resolve_cubes(
+        (PROJECT_ROOT / paths_config['cube_lists_dir']).glob("*.json"),
+        PROJECT_ROOT / paths_config['card_db_path'],
+        PROJECT_ROOT / paths_config['cube_cache_dir']
+    )
+    report_unmatched(resolved_cubes)
+    cube_cards = load_cube_cards(resolved_cubes, PROJECT_ROOT / paths_config['card_db_path'])
+
+    differences, pick_seconds, rollouts = [], [], []
+    for cube_name, cube in sorted(cube_cards.items()):
+        if len(cube) < num_players * pack_size * num_packs:
+            print(f"Salto {cube_name}: carte insufficienti.")
+            continue
+        table = DeckFeatureTable(cube)
+        for draft_index in range(rollout_config.get('drafts_per_cube', 5)):
+            seed = draft_seed(rollout_config.get('seed', 0), cube_name, draft_index)
+            pack_rounds = DraftSimulator.generate_pack_rounds(cube, num_players, pack_size, num_packs, random.Random(seed))
+            seat = draft_index % num_players
+
+            def play(rollout_seat):
+                random.seed(seed)
+                players = [Player(player_id=j) for j in range(num_players)]
+                bots = [
+                    RolloutBot(p, rollout_config, seed=seed) if p.player_id == rollout_seat else ScoringBot(p)
+                    for p in players
+                ]
+                simulator = DraftSimulator(cube, bots, num_players, pack_size, num_packs,
+                                           draft_id=f"rollout_{cube_name}_{draft_index}", pack_rounds=pack_rounds)
+                final_players = simulator.run_draft(verbose=False)
+                return final_players[seat].pool, bots[seat]
+
+            baseline_pool, _ = play(None)
+            started = time.perf_counter()
+            rollout_pool, rollout_bot = play(seat)
+            pick_seconds.append((time.perf_counter() - started) / (pack_size * num_packs))
+            rollouts.extend(rollout_bot.rollout_history)
+
+            baseline_score, rollout_score = (m['final_score'] for m in score_pools([baseline_pool, rollout_pool], table, deck_config))
+            differences.append(rollout_score - baseline_score)
+            print(f"{cube_name} #{draft_index} (posto {seat}): RolloutBot {rollout_score:.2f} vs ScoringBot "
+                  f"{baseline_score:.2f} ({rollout_score - baseline_score:+.2f})")
+
+    if not differences:
+        print("ERRORE: Nessun cubo valutabile.")
+        sys.exit(1)
+    sem = np.std(differences, ddof=1) / np.sqrt(len(differences)) if len(differences) > 1 else float('nan')
+    print(f"\nDifferenza media RolloutBot - ScoringBot: {np.mean(differences):+.2f} ± {1.96 * sem:.2f} "
+          f"su {len(differences)} draft")
+    print(f"Tempo medio per pick del draft con il RolloutBot: {np.mean(pick_seconds) * 1000:.1f} ms "
+          f"(budget del RolloutBot {rollout_config.get('time_budget_ms', 50)} ms)")
+    if rollouts:
+        print(f"Rollout medi per carta candidata: {np.mean(rollouts):.1f} (pick con più candidate: {len(rollouts)})")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from pathlib import Path
 import sys
-import json
+import time
 from tqdm import tqdm
 
 # --- BLOCCO DI CODICE EFFETTIVO ---
@@ -9,10 +9,12 @@ sys.path.append(str(PROJECT_ROOT))
 
 from src.utils.config_loader import CONFIG
 # MODIFICA: Aggiungi l'import mancante per la classe Player
-from src.environment.draft import Card, Player
+from src.environment.draft import Player
 from src.environment.draftsimulator import DraftSimulator
+from src.environment.simmetrics import SimulationMetrics, format_metrics_report
 from src.environment.opponents import ScoringBot
 from src.training.logger import DraftLogger
+from src.data.cuberesolver import resolve_cubes, load_cube_cards, report_unmatched
 
 # --- FINE BLOCCO ---
 
@@ -27,18 +29,12 @@ log_gen_config = CONFIG['log_generation']
 LOGS_DIR = PROJECT_ROOT / paths_config['log_output_dir']
 CUBE_LISTS_DIR = PROJECT_ROOT / paths_config['cube_lists_dir']
 CARD_DB_PATH = PROJECT_ROOT / paths_config['card_db_path']
+CUBE_CACHE_DIR = PROJECT_ROOT / paths_config['cube_cache_dir']
 
 NUM_PLAYERS = sim_config['num_players']
 # MODIFICA: Leggi il parametro dalla sezione corretta
 DRAFTS_PER_CUBE = log_gen_config['num_drafts_per_cube']
 
-def load_json_file(path: Path):
-    if not path.exists():
-        print(f"ERRORE: Il file {path} non è stato trovato.")
-        sys.exit(1)
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
 def main():
     """Genera log di draft sintetici da TUTTI i cubi Pauper disponibili."""
     print("--- Preparazione Generazione Log (Pauper Generalist) ---")
@@ -49,10 +45,12 @@ def main():
     # MODIFICA: Usa 'log_dir' invece di 'output_dir'
     logger = DraftLogger(log_dir=LOGS_DIR)
     
-    card_database = load_json_file(CARD_DB_PATH)
-    card_db_by_name = {card['name']: card for card in card_database}
+    # Cubi risolti in id del database (con cache su disco condivisa con evaluatemodel.py):
+    # dal database si leggono solo le carte citate dai cubi.
+    resolved_cubes = resolve_cubes(CUBE_LISTS_DIR.glob("*.json"), CARD_DB_PATH, CUBE_CACHE_DIR)
+    report_unmatched(resolved_cubes)
+    cube_cards = load_cube_cards(resolved_cubes, CARD_DB_PATH)
     
-    all_cubes = list(CUBE_LISTS_DIR.glob("*.json"))
     draft_id_counter = 0
     
     # MODIFICA: Legge il numero di draft dal file di configurazione
@@ -60,16 +58,15 @@ def main():
     num_drafts_to_generate = log_gen_config['num_drafts_per_cube']
     print(f"Generazione di {num_drafts_to_generate} log per ogni cubo...")
 
-    for cube_path in tqdm(all_cubes, desc="Processing Cubes"):
-        cube_data = load_json_file(cube_path)
-        # MODIFICA: Accedi alla chiave 'cards' per ottenere la lista dei nomi
-        cube_card_names = cube_data.get('cards', []) 
-        
-        cube_full_details = [Card(name=name, details=card_db_by_name[name]) for name in cube_card_names if name in card_db_by_name]
-        
+    # Metriche opzionali: throughput, latenze dei bot, tempo di creazione buste e di log.
+    metrics_config = log_gen_config.get('metrics', {})
+    sim_metrics = SimulationMetrics() if metrics_config.get('enabled') else None
+    started = time.perf_counter()
+
+    for cube_name, cube_full_details in tqdm(cube_cards.items(), desc="Processing Cubes"):
         cards_needed = NUM_PLAYERS * sim_config['pack_size'] * sim_config['num_packs']
         if len(cube_full_details) < cards_needed:
-            tqdm.write(f"Skipping {cube_path.name}, not enough cards.")
+            tqdm.write(f"Skipping {cube_name}, not enough cards.")
             continue
             
         for i in range(DRAFTS_PER_CUBE):
@@ -84,7 +81,9 @@ def main():
                 pack_size=sim_config['pack_size'],
                 num_packs=sim_config['num_packs'],
                 draft_id=draft_id_counter, 
-                logger=logger
+                logger=logger,
+                metrics=sim_metrics,
+                cube_name=cube_name
             )
             simulator.run_draft(verbose=False)
             draft_id_counter += 1
@@ -93,5 +92,13 @@ def main():
     print(f"\n✅ Generazione log completata. Creati {total_logs} file di log totali.")
     print(f"Controlla la cartella: {LOGS_DIR}")
 
+    if sim_metrics is not None:
+        wall_seconds = time.perf_counter() - started
+        print("\n--- Metriche di Simulazione ---")
+        print(format_metrics_report(sim_metrics.summary(wall_seconds)))
+        for output in metrics_config.get('outputs', []):
+            sim_metrics.export(PROJECT_ROOT / output, wall_seconds)
+            print(f"Metriche salvate in {PROJECT_ROOT / output}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,73 @@
+from pathlib import Path
+import sys
+import asyncio
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+import torch
+
+from src.utils.config_loader import CONFIG
+from src.environment.opponents import load_drafter_model
+from src.features.cardtable import CardFeatureTable
+from src.models.pickcache import PickCache
+from api.batcher import MicroBatcher
+from api.server import PickService
+from api.sessions import SessionStore
+
+def main():
+    """Avvia il servizio HTTP dei consigli di pick con il modello addestrato."""
+    print("--- Avvio Servizio dei Pick ---")
+
+    paths_config = CONFIG['paths']
+    model_config = CONFIG['model']
+    api_config = CONFIG['api']
+
+    if api_config.get('threads'):
+        torch.set_num_threads(api_config['threads'])
+
+    model_path = PROJECT_ROOT / paths_config['model_save_dir'] / api_config.get('model_name', "model_final.pth")
+    if not model_path.exists():
+        print(f"ERRORE: Il modello non è stato trovato in {model_path}.")
+        sys.exit(1)
+
+    # Tutto viene caricato prima di accettare connessioni: nessuna richiesta paga l'avvio.
+    table = CardFeatureTable.from_database(PROJECT_ROOT / paths_config['card_db_path'])
+    print(f"Tabella delle feature pronta: {len(table)} carte.")
+    batcher = MicroBatcher(
+        model=load_drafter_model(model_path, "cpu"),
+        features=table.features,
+        max_pack_size=model_config['max_pack_size'],
+        max_pool_size=model_config['max_pool_size'],
+        max_batch_size=api_config.get('max_batch_size', 64),
+        max_wait_ms=api_config.get('max_wait_ms', 2.0)
+    )
+    batcher.warmup()
+
+    session_config = api_config.get('sessions', {})
+    sessions = SessionStore(
+        table.features,
+        max_pool_size=model_config['max_pool_size'],
+        max_memory_mb=session_config.get('max_memory_mb', 256),
+        idle_timeout_s=session_config.get('idle_timeout_s', 1800)
+    )
+    print(f"Sessioni di draft: al massimo {sessions.max_sessions} contemporanee.")
+
+    # La cache vale solo per il modello caricato qui sopra (il servizio non lo ricarica).
+    cache_size = api_config.get('pick_cache_size', 0)
+    cache = PickCache(cache_size) if cache_size > 0 else None
+
+    service = PickService(
+        table, batcher,
+        host=api_config.get('host', "127.0.0.1"),
+        port=api_config.get('port', 8080),
+        sessions=sessions,
+        cache=cache
+    )
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print("\nServizio fermato.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.config_loader import CONFIG
+from src.data.loaders import DraftLogDataset, PackedDraftDataset
+from src.training.sweep import SweepRunner
+
+def main():
+    """Ricerca di iperparametri in parallelo su un unico dataset caricato una volta."""
+    print("--- Avvio Sweep degli Iperparametri (da config.yaml) ---")
+
+    paths_config = CONFIG['paths']
+    sweep_config = CONFIG['sweep']
+
+    LOGS_DIR = PROJECT_ROOT / paths_config['log_output_dir']
+    SWEEP_DIR = PROJECT_ROOT / sweep_config['output_dir']
+    DATASET_PATH = SWEEP_DIR / "packed_dataset.pt"
+
+    # I log JSON vengono parsati una sola volta (di nuovo solo se cambiano); i worker
+    # aprono il file compatto in mmap.
+    if not PackedDraftDataset.is_current(DATASET_PATH, LOGS_DIR):
+        print("Caricamento e compattazione del dataset...")
+        dataset = DraftLogDataset(logs_dir=LOGS_DIR)
+        PackedDraftDataset.from_log_dataset(dataset).save(DATASET_PATH)
+        print(f"Dataset compatto ({len(dataset)} campioni) salvato in: {DATASET_PATH}")
+    else:
+        print(f"Uso il dataset compatto esistente: {DATASET_PATH}")
+
+    runner = SweepRunner(
+        base_config=CONFIG,
+        sweep_config=sweep_config,
+        dataset_path=DATASET_PATH,
+        output_dir=SWEEP_DIR
+    )
+    best = runner.run()
+
+    if best:
+        print("\n--- Miglior Trial ---")
+        print(f"Parametri: {best['params']}")
+        print(f"Val loss: {best['val_loss']:.4f} - Top-1: {best['val_top1_accuracy']:.2%} ({best['epochs']} epoche)")
+        print(f"Risultati completi in: {runner.results_path}")
+
+if __name__ == '__main__':
+    main()
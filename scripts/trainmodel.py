@@ -8,9 +8,10 @@ sys.path.append(str(PROJECT_ROOT))
 
 from src.utils.config_loader import CONFIG
 from src.utils.constants import FEATURE_SIZE
-from src.data.loaders import DraftLogDataset, custom_collate_fn
+from src.data.loaders import DraftLogDataset, custom_collate_fn, split_by_draft, train_collate_fn
 from src.models.transformerdrafter import TransformerDrafter
 from src.training.trainer import Trainer
+from src.training.profiler import StepProfiler
 
 def main():
     """Funzione principale per l'addestramento del modello."""
@@ -30,15 +31,31 @@ def main():
     
     print("Caricamento del dataset...")
     dataset = DraftLogDataset(logs_dir=LOGS_DIR)
+    train_set, val_set = split_by_draft(
+        dataset,
+        val_fraction=train_config.get('val_fraction', 0.0),
+        seed=train_config.get('split_seed', 42)
+    )
     train_loader = DataLoader(
-        dataset, 
+        train_set, 
         batch_size=train_config['batch_size'], # Usa la config
         shuffle=True,
-        collate_fn=custom_collate_fn, 
+        collate_fn=train_collate_fn(train_config), 
         num_workers=2, 
         pin_memory=True
     )
-    print(f"Dataset caricato con {len(dataset)} campioni.")
+    val_loader = None
+    if len(val_set) > 0:
+        val_loader = DataLoader(
+            val_set,
+            batch_size=train_config.get('eval_batch_size', train_config['batch_size']),
+            shuffle=False,
+            collate_fn=custom_collate_fn,
+            num_workers=2,
+            pin_memory=True
+        )
+    print(f"Dataset caricato con {len(dataset)} campioni "
+          f"({len(train_set)} train / {len(val_set)} validazione).")
     
     print("Inizializzazione del modello TransformerDrafter...")
     # MODIFICA: Passa il dizionario di configurazione direttamente al modello.
@@ -50,16 +67,32 @@ def main():
     total_params = sum(p.numel() for p in model.parameters() if p.requires_grad)
     print(f"Modello creato. Parametri totali: {total_params:,}")
     
+    profiler = None
+    profiling_config = train_config.get('profiling', {})
+    if profiling_config.get('enabled'):
+        profiler = StepProfiler(
+            output_dir=SAVE_DIR,
+            device=device,
+            metrics_file=profiling_config.get('metrics_file', "step_metrics.jsonl"),
+            trace_start_step=profiling_config.get('trace_start_step', 10),
+            trace_num_steps=profiling_config.get('trace_num_steps', 0)
+        )
+        print(f"Profiling attivo: metriche per step in {profiler.metrics_path}")
+
     print("Inizializzazione del trainer...")
     trainer = Trainer(
         model=model, 
         train_loader=train_loader, 
         learning_rate=train_config['learning_rate'], # Usa la config
         device=device,
-        save_dir=SAVE_DIR # Correzione del typo da MODEL_SAVE_DIR a SAVE_DIR
+        save_dir=SAVE_DIR, # Correzione del typo da MODEL_SAVE_DIR a SAVE_DIR
+        val_loader=val_loader,
+        early_stopping_patience=train_config.get('early_stopping_patience'),
+        scheduler_config=train_config.get('lr_scheduler'),
+        profiler=profiler
     )
     
-    print(f"--- Inizio Addestramento per {train_config['num_epochs']} epoche ---")
+    print(f"--- Inizio Addestramento (massimo {train_config['num_epochs']} epoche) ---")
     trainer.train(num_epochs=train_config['num_epochs']) # Usa la config
     print("--- Addestramento Completato ---")
 
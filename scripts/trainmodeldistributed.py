@@ -0,0 +1,130 @@
+from pathlib import Path
+import sys
+import os
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, Subset
+from torch.utils.data.distributed import DistributedSampler
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.config_loader import CONFIG
+from src.utils.constants import FEATURE_SIZE
+from src.data.loaders import DraftLogDataset, custom_collate_fn, split_by_draft, train_collate_fn
+from src.models.transformerdrafter import TransformerDrafter
+from src.training.trainer import Trainer
+from src.training.profiler import StepProfiler
+
+# Uso:
+#   python scripts/trainmodeldistributed.py          - Avvia 'world_size' processi su questa macchina
+#   torchrun --nproc_per_node=N scripts/trainmodeldistributed.py
+#                                                    - Usa rank e world size forniti da torchrun
+
+def run_worker(rank: int, world_size: int):
+    """Addestra il modello in uno dei processi del gruppo distribuito (backend gloo, CPU)."""
+    paths_config = CONFIG['paths']
+    model_config = CONFIG['model']
+    train_config = CONFIG['training']
+    dist_config = train_config.get('distributed', {})
+
+    # Ogni processo usa solo i suoi thread, così N processi non si contendono tutti i core.
+    threads_per_process = dist_config.get('threads_per_process')
+    if not threads_per_process:
+        threads_per_process = max(1, (os.cpu_count() or 1) // world_size)
+    torch.set_num_threads(threads_per_process)
+
+    dist.init_process_group(backend=dist_config.get('backend', 'gloo'), rank=rank, world_size=world_size)
+    try:
+        LOGS_DIR = PROJECT_ROOT / paths_config['log_output_dir']
+        SAVE_DIR = PROJECT_ROOT / paths_config['model_save_dir']
+
+        if rank == 0:
+            print(f"Addestramento distribuito: {world_size} processi, {threads_per_process} thread ciascuno.")
+            print("Caricamento del dataset...")
+        dataset = DraftLogDataset(logs_dir=LOGS_DIR)
+        # Lo split è deterministico (stesso seme), quindi identico su tutti i rank.
+        train_set, val_set = split_by_draft(
+            dataset,
+            val_fraction=train_config.get('val_fraction', 0.0),
+            seed=train_config.get('split_seed', 42)
+        )
+
+        # 'batch_size' è per processo: il batch effettivo è batch_size * world_size.
+        train_loader = DataLoader(
+            train_set,
+            batch_size=train_config['batch_size'],
+            sampler=DistributedSampler(train_set, num_replicas=world_size, rank=rank, shuffle=True),
+            collate_fn=train_collate_fn(train_config),
+            num_workers=0
+        )
+        val_loader = None
+        if len(val_set) > 0:
+            # Niente DistributedSampler in validazione: riempirebbe gli shard con
+            # campioni duplicati. Ogni rank prende un campione ogni world_size e
+            # Trainer.validate somma loss e conteggi reali di tutti i rank.
+            val_loader = DataLoader(
+                Subset(dataset, val_set.indices[rank::world_size]),
+                batch_size=train_config.get('eval_batch_size', train_config['batch_size']),
+                shuffle=False,
+                collate_fn=custom_collate_fn,
+                num_workers=0
+            )
+        if rank == 0:
+            print(f"Dataset caricato con {len(dataset)} campioni "
+                  f"({len(train_set)} train / {len(val_set)} validazione).")
+
+        # Stesso seme su tutti i rank; DDP comunque sincronizza i pesi del rank 0 all'avvio.
+        torch.manual_seed(train_config.get('split_seed', 42))
+        model = TransformerDrafter(config=model_config, feature_size=FEATURE_SIZE)
+        ddp_model = DistributedDataParallel(model)
+
+        # Solo il rank 0 scrive le metriche per step, come per i checkpoint.
+        profiler = None
+        profiling_config = train_config.get('profiling', {})
+        if rank == 0 and profiling_config.get('enabled'):
+            profiler = StepProfiler(
+                output_dir=SAVE_DIR,
+                device="cpu",
+                metrics_file=profiling_config.get('metrics_file', "step_metrics.jsonl"),
+                trace_start_step=profiling_config.get('trace_start_step', 10),
+                trace_num_steps=profiling_config.get('trace_num_steps', 0)
+            )
+
+        trainer = Trainer(
+            model=ddp_model,
+            train_loader=train_loader,
+            learning_rate=train_config['learning_rate'],
+            device="cpu",
+            save_dir=SAVE_DIR,
+            val_loader=val_loader,
+            early_stopping_patience=train_config.get('early_stopping_patience'),
+            scheduler_config=train_config.get('lr_scheduler'),
+            rank=rank,
+            world_size=world_size,
+            profiler=profiler
+        )
+        trainer.train(num_epochs=train_config['num_epochs'])
+    finally:
+        dist.destroy_process_group()
+
+def main():
+    """Avvia l'addestramento data-parallel su più processi CPU."""
+    dist_config = CONFIG['training'].get('distributed', {})
+
+    # Se lanciato da torchrun, rank e world size arrivano dalle variabili d'ambiente.
+    if "RANK" in os.environ and "WORLD_SIZE" in os.environ:
+        run_worker(int(os.environ["RANK"]), int(os.environ["WORLD_SIZE"]))
+        return
+
+    world_size = dist_config.get('world_size') or 1
+    print(f"--- Avvio Addestramento Distribuito ({world_size} processi) ---")
+    os.environ.setdefault("MASTER_ADDR", dist_config.get('master_addr', '127.0.0.1'))
+    os.environ.setdefault("MASTER_PORT", str(dist_config.get('master_port', 29500)))
+    mp.spawn(run_worker, args=(world_size,), nprocs=world_size, join=True)
+    print("--- Addestramento Completato ---")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+from pathlib import Path
+import sys
+import time
+import torch
+from torch.utils.data import DataLoader
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.config_loader import CONFIG
+from src.utils.constants import FEATURE_SIZE
+from src.data.cuberesolver import resolve_cubes, load_cube_cards, report_unmatched
+from src.data.draftstream import DraftStream
+from src.data.loaders import StreamingDraftDataset, custom_collate_fn, train_collate_fn
+from src.models.transformerdrafter import TransformerDrafter
+from src.training.trainer import Trainer
+
+def main():
+    """
+    Genera i draft e addestra il modello nello stesso momento: i processi di
+    generazione passano i pick già codificati al trainer attraverso una coda in
+    memoria, senza scrivere i log JSON e senza attendere la fine della generazione.
+    """
+    print("--- Avvio Pipeline Generazione -> Addestramento in Memoria ---")
+
+    paths_config = CONFIG['paths']
+    sim_config = CONFIG['simulation']
+    model_config = CONFIG['model']
+    train_config = CONFIG['training']
+    stream_config = train_config.get('streaming', {})
+
+    SAVE_DIR = PROJECT_ROOT / paths_config['model_save_dir']
+    CARD_DB_PATH = PROJECT_ROOT / paths_config['card_db_path']
+
+    resolved_cubes = resolve_cubes(
+        (PROJECT_ROOT / paths_config['cube_lists_dir']).glob("*.json"),
+        CARD_DB_PATH,
+        PROJECT_ROOT / paths_config['cube_cache_dir']
+    )
+    report_unmatched(resolved_cubes)
+    cards_needed = sim_config['num_players'] * sim_config['pack_size'] * sim_config['num_packs']
+    cubes = {
+        name: cards for name, cards in load_cube_cards(resolved_cubes, CARD_DB_PATH).items()
+        if len(cards) >= cards_needed
+    }
+    if not cubes:
+        print("ERRORE: Nessun cubo con abbastanza carte per un draft.")
+        sys.exit(1)
+
+    stream = DraftStream(
+        cubes=cubes,
+        sim_config=sim_config,
+        drafts_per_cube=stream_config.get('drafts_per_cube', CONFIG['log_generation']['num_drafts_per_cube']),
+        num_workers=stream_config.get('num_workers', 2),
+        max_queued_drafts=stream_config.get('max_queued_drafts', 64),
+        seed=stream_config.get('seed', 0)
+    )
+    shard_dir = stream_config.get('shard_dir')
+    dataset = StreamingDraftDataset(
+        stream,
+        samples_per_epoch=stream_config.get('samples_per_epoch', 100_000),
+        buffer_size=stream_config.get('buffer_samples', 50_000),
+        min_buffer=stream_config.get('min_buffer_samples', 5_000),
+        val_fraction=train_config.get('val_fraction', 0.0),
+        val_max_samples=stream_config.get('val_max_samples', 20_000),
+        val_drafts=stream_config.get('val_drafts', 100),
+        shard_dir=PROJECT_ROOT / shard_dir if shard_dir else None,
+        shard_drafts=stream_config.get('shard_drafts', 500),
+        seed=train_config.get('split_seed', 42)
+    )
+
+    print(f"Generazione di {stream.total_drafts} draft da {len(cubes)} cubi su {stream.num_workers} processi...")
+    started = time.perf_counter()
+    stream.start()
+    try:
+        dataset.wait_ready()
+        print(f"Buffer pronto in {time.perf_counter() - started:.1f} s: {len(dataset.buffer)} campioni "
+              f"di addestramento, {len(dataset.val_samples)} di validazione.")
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        # num_workers=0: il dataset legge la coda dei generatori nel processo del trainer.
+        train_loader = DataLoader(dataset, batch_size=train_config['batch_size'], collate_fn=train_collate_fn(train_config))
+        val_loader = None
+        if train_config.get('val_fraction', 0.0) > 0:
+            val_loader = DataLoader(
+                dataset.validation_dataset,
+                batch_size=train_config.get('eval_batch_size', train_config['batch_size']),
+                shuffle=False,
+                collate_fn=custom_collate_fn
+            )
+
+        model = TransformerDrafter(config=model_config, feature_size=FEATURE_SIZE).to(device)
+        trainer = Trainer(
+            model=model,
+            train_loader=train_loader,
+            learning_rate=train_config['learning_rate'],
+            device=device,
+            save_dir=SAVE_DIR,
+            val_loader=val_loader,
+            early_stopping_patience=train_config.get('early_stopping_patience'),
+            scheduler_config=train_config.get('lr_scheduler')
+        )
+        print(f"--- Inizio Addestramento (massimo {train_config['num_epochs']} epoche da "
+              f"{len(dataset)} campioni) ---")
+        trainer.train(num_epochs=train_config['num_epochs'])
+    finally:
+        dataset.close()
+
+    status = "completa" if stream.finished else "interrotta alla fine dell'addestramento"
+    print(f"--- Pipeline Completata in {time.perf_counter() - started:.1f} s: {stream.received} draft ricevuti "
+          f"(generazione {status}), {dataset.samples_seen} campioni di addestramento visti ---")
+    if dataset.shards_written:
+        print(f"Shard salvati in {dataset.shard_dir}: {dataset.shards_written}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+from pathlib import Path
+import sys
+import os
+import json
+import time
+import yaml
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.config_loader import CONFIG
+from src.data.cuberesolver import resolve_cubes, load_cube_cards, report_unmatched
+from src.environment.opponents import load_scoring_weights
+from src.training.weighttuning import WeightTuner
+
+def main():
+    """
+    Ottimizza i pesi di ScoringBot con CMA-ES su draft paralleli a buste
+    condivise e, se battono quelli attuali in validazione, li salva nel file
+    indicato da scoring_bot.weights_path.
+    """
+    print("--- Tuning dei Pesi di ScoringBot (CMA-ES) ---")
+    paths_config = CONFIG['paths']
+    sim_config = CONFIG['simulation']
+    bot_config = CONFIG['scoring_bot']
+    tuning_config = dict(bot_config['tuning'])
+    tuning_config['num_workers'] = tuning_config.get('num_workers') or os.cpu_count()
+
+    resolved_cubes = resolve_cubes(
+        (PROJECT_ROOT / paths_config['cube_lists_dir']).glob("*.json"),
+        PROJECT_ROOT / paths_config['card_db_path'],
+        PROJECT_ROOT / paths_config['cube_cache_dir']
+    )
+    report_unmatched(resolved_cubes)
+    cards_needed = sim_config['num_players'] * sim_config['pack_size'] * sim_config['num_packs']
+    cubes = {
+        name: cards for name, cards in load_cube_cards(resolved_cubes, PROJECT_ROOT / paths_config['card_db_path']).items()
+        if len(cards) >= cards_needed
+    }
+    if not cubes:
+        print("ERRORE: Nessun cubo con abbastanza carte per un draft.")
+        sys.exit(1)
+
+    tuner = WeightTuner(cubes, sim_config, CONFIG['evaluation'], tuning_config, reference_weights=load_scoring_weights())
+    print(f"Fitness '{tuner.fitness_mode}' su {len(cubes)} cubi, {tuning_config['num_workers']} processi, "
+          f"{tuning_config.get('generations', 20)} generazioni da {tuning_config.get('drafts_per_candidate', 16)} draft per candidato.")
+
+    started = time.perf_counter()
+
+    def report(record):
+        print(f"Generazione {record['generation'] + 1:>3}: migliore {record['best_fitness']:+.3f}, "
+              f"media {record['mean_fitness']:+.3f}, sigma {record['sigma']:.3f} "
+              f"({time.perf_counter() - started:.0f} s)")
+
+    result = tuner.run(on_generation=report)
+
+    print("\n--- Validazione su draft nuovi ---")
+    for name, score in result['validation'].items():
+        print(f"{name:<12} {score:+.3f}")
+
+    history_path = PROJECT_ROOT / tuning_config['history_path']
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print(f"Storia del tuning salvata in {history_path}")
+
+    if result['best_name'] == "reference":
+        print("I pesi attuali restano i migliori in validazione: nessun file aggiornato.")
+        return
+    weights_path = PROJECT_ROOT / bot_config['weights_path']
+    weights_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(weights_path, 'w', encoding='utf-8') as f:
+        f.write(f"# Generato da tunescoringbot.py (fitness '{tuner.fitness_mode}', "
+                f"+{result['improvement']:.3f} sui pesi precedenti in validazione).\n")
+        yaml.safe_dump(result['best_weights'], f, sort_keys=False)
+    print(f"✅ Pesi '{result['best_name']}' salvati in {weights_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import json
+import sqlite3
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+
+# Dimensione dei blocchi letti dal file durante il parsing in streaming.
+READ_CHUNK_SIZE = 1 << 20
+# SQLite limita il numero di parametri per query: le ricerche per nome vanno a blocchi.
+QUERY_CHUNK_SIZE = 500
+# Separatore dei nomi delle carte a più facce su Scryfall ("Fronte // Retro").
+FACE_SEPARATOR = " // "
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS card_names (
+    name TEXT PRIMARY KEY,
+    card_id INTEGER NOT NULL REFERENCES cards(id)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def iter_json_array(stream: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict]:
+    """
+    Restituisce uno alla volta gli oggetti di un file JSON che contiene un array
+    di oggetti (come i bulk data di Scryfall), leggendo il file a blocchi: in
+    memoria c'è sempre al massimo un blocco più l'oggetto in corso di lettura.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        # Salta spazi, virgole e l'apertura dell'array.
+        while position < len(buffer) and (buffer[position].isspace() or buffer[position] == ','):
+            position += 1
+        if position < len(buffer) and not started:
+            if buffer[position] != '[':
+                raise ValueError("Il file non contiene un array JSON.")
+            started = True
+            position += 1
+            continue
+        if position < len(buffer) and buffer[position] == ']':
+            return
+
+        if position < len(buffer):
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Oggetto spezzato tra due blocchi: serve altro testo.
+                if eof:
+                    raise
+            else:
+                position = end
+                yield item
+                continue
+
+        if eof:
+            if started:
+                raise ValueError("Array JSON non terminato.")
+            return
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def rarity_filter(*rarities: str) -> Callable[[Dict], bool]:
+    """Predicato per ingest_card_file: tiene solo le stampe con una delle rarità indicate."""
+    wanted = set(rarities)
+    return lambda card: card.get('rarity') in wanted
+
+
+def face_names(name: str) -> List[str]:
+    """Nomi con cui si può cercare una carta: il nome completo e quelli delle singole facce."""
+    names = [name]
+    if FACE_SEPARATOR in name:
+        names.extend(face for face in name.split(FACE_SEPARATOR) if face)
+    return names
+
+
+def ingest_card_file(
+    source_path: Path,
+    db_path: Path,
+    predicate: Optional[Callable[[Dict], bool]] = None,
+    batch_size: int = 1000
+) -> int:
+    """
+    Legge in streaming un file JSON di carte (bulk data di Scryfall o il vecchio
+    scryfall_commons.json) e scrive un database SQLite indicizzato per nome.
+    Di ogni nome si tiene la prima stampa che soddisfa il predicato; i nomi delle
+    singole facce delle carte "A // B" vengono registrati come alias.
+    Restituisce il numero di carte salvate.
+    """
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    # Si scrive su un file temporaneo e lo si sostituisce solo alla fine, così
+    # chi legge il database non vede mai una versione a metà.
+    tmp_path = db_path.with_name(db_path.name + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    connection = sqlite3.connect(str(tmp_path))
+    try:
+        connection.executescript(_SCHEMA)
+        seen_names = set()
+        cards_batch, aliases_batch = [], []
+        num_cards = 0
+
+        def flush():
+            connection.executemany("INSERT INTO cards (id, name, data) VALUES (?, ?, ?)", cards_batch)
+            # Il nome completo ha la precedenza sugli alias delle facce: INSERT OR IGNORE
+            # tiene il primo inserito e i nomi completi vengono inseriti per primi.
+            connection.executemany("INSERT OR IGNORE INTO card_names (name, card_id) VALUES (?, ?)", aliases_batch)
+            cards_batch.clear()
+            aliases_batch.clear()
+
+        with open(source_path, 'r', encoding='utf-8') as f:
+            for card in iter_json_array(f):
+                name = card.get('name')
+                if not name or name in seen_names or (predicate and not predicate(card)):
+                    continue
+                seen_names.add(name)
+                card_id = num_cards
+                num_cards += 1
+                cards_batch.append((card_id, name, json.dumps(card, separators=(',', ':'))))
+                aliases_batch.append((name, card_id))
+                if len(cards_batch) >= batch_size:
+                    flush()
+        flush()
+
+        # Seconda passata sugli alias delle facce, dopo tutti i nomi completi.
+        connection.executemany(
+            "INSERT OR IGNORE INTO card_names (name, card_id) VALUES (?, ?)",
+            (
+                (face, card_id)
+                for card_id, name in connection.execute(
+                    "SELECT id, name FROM cards WHERE name LIKE ?", (f"%{FACE_SEPARATOR}%",)
+                ).fetchall()
+                for face in face_names(name)[1:]
+            )
+        )
+        connection.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+            ("source", str(source_path)),
+            ("num_cards", str(num_cards))
+        ])
+        connection.commit()
+    finally:
+        connection.close()
+
+    tmp_path.replace(db_path)
+    return num_cards
+
+
+class CardDatabase:
+    """
+    Accesso in sola lettura al database di carte creato da ingest_card_file.
+    Carica solo le carte richieste, invece di tutto il database.
+    """
+    def __init__(self, db_path: Path):
+        if not db_path.exists():
+            raise FileNotFoundError(f"Database di carte non trovato: {db_path}")
+        self.db_path = db_path
+        self.connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+    def __enter__(self) -> "CardDatabase":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+
+    def __contains__(self, name: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM card_names WHERE name = ?", (name,)).fetchone() is not None
+
+    def _lookup(self, names: List[str], columns: str) -> Dict[str, tuple]:
+        results = {}
+        for start in range(0, len(names), QUERY_CHUNK_SIZE):
+            chunk = names[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT card_names.name, {columns} FROM card_names "
+                f"JOIN cards ON cards.id = card_names.card_id WHERE card_names.name IN ({placeholders})",
+                chunk
+            )
+            for row in rows:
+                results[row[0]] = row[1:]
+        return results
+
+    def resolve_ids(self, names: Iterable[str]) -> Dict[str, int]:
+        """Id delle carte trovate, indicizzati con il nome richiesto."""
+        rows = self._lookup(list(dict.fromkeys(names)), "cards.id")
+        return {name: card_id for name, (card_id,) in rows.items()}
+
+    def get_by_ids(self, card_ids: Iterable[int]) -> Dict[int, Dict]:
+        """Dettagli delle carte con gli id indicati."""
+        card_ids = list(dict.fromkeys(int(card_id) for card_id in card_ids))
+        results = {}
+        for start in range(0, len(card_ids), QUERY_CHUNK_SIZE):
+            chunk = card_ids[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            for card_id, data in self.connection.execute(
+                f"SELECT id, data FROM cards WHERE id IN ({placeholders})", chunk
+            ):
+                results[card_id] = json.loads(data)
+        return results
+
+    def iter_cards(self) -> Iterator[tuple]:
+        """Tutte le carte del database come (id, nome, dettagli), in ordine di id."""
+        for card_id, name, data in self.connection.execute("SELECT id, name, data FROM cards ORDER BY id"):
+            yield card_id, name, json.loads(data)
+
+    def name_index(self) -> Dict[str, int]:
+        """Tutti i nomi ricercabili (compresi gli alias delle facce) con l'id della carta."""
+        return dict(self.connection.execute("SELECT name, card_id FROM card_names"))
+
+    def get(self, name: str) -> Optional[Dict]:
+        return self.get_many([name]).get(name)
+
+    def get_many(self, names: Iterable[str]) -> Dict[str, Dict]:
+        """Dettagli delle carte trovate, indicizzati con il nome richiesto (anche di una sola faccia)."""
+        rows = self._lookup(list(dict.fromkeys(names)), "cards.data")
+        return {name: json.loads(data) for name, (data,) in rows.items()}
+
+
+def database_version(db_path: Path) -> str:
+    """Versione del database per invalidare le cache: cambia a ogni nuova ingestione."""
+    stat = db_path.stat()
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
@@ -0,0 +1,240 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Cubo assegnato ai log scritti prima che DraftLogger registrasse il nome del cubo.
+UNKNOWN_CUBE = "<sconosciuto>"
+
+# Conteggi per (cubo, carta) accumulati da CardStatsAccumulator e salvati nella tabella.
+COUNT_FIELDS = ["seen", "picked", "taken_position_sum", "seen_first", "picked_first", "seen_wheel"]
+
+
+class CardStatsAccumulator:
+    """
+    Statistiche per (cubo, carta) calcolate in un solo passaggio sui log dei
+    draft: un log alla volta viene ridotto a poche colonne (carta, pick, presa
+    o no) che si accumulano in un buffer; ogni 'batch_rows' righe il buffer
+    diventa un group-by vettorizzato (np.bincount sulla chiave cubo * carte +
+    carta) e viene svuotato. La memoria dipende dal numero di carte e cubi
+    distinti e dal buffer, non dalla dimensione del corpus.
+    """
+    def __init__(self, batch_rows: int = 1_000_000):
+        self.batch_rows = batch_rows
+        self.cube_index: Dict[str, int] = {}
+        self.card_index: Dict[str, int] = {}
+        self.counts = {field: np.zeros((0, 0), dtype=np.int64) for field in COUNT_FIELDS}
+        self.drafts = 0
+        self.picks = 0
+        # Log senza nomi delle carte (scritti prima di 'pack_cards'): non utilizzabili.
+        self.skipped = 0
+        self._buffer: List[tuple] = []
+        self._buffered_rows = 0
+
+    @staticmethod
+    def _index(index: Dict[str, int], name: str) -> int:
+        value = index.get(name)
+        if value is None:
+            value = index[name] = len(index)
+        return value
+
+    def add_draft(self, log: Dict):
+        """Aggiunge un log di draft (formato di DraftLogger)."""
+        picks = log.get('picks') or []
+        if not picks or 'pack_cards' not in picks[0]:
+            self.skipped += 1
+            return
+        cube = self._index(self.cube_index, log.get('cube') or UNKNOWN_CUBE)
+        card_index = self.card_index
+
+        names = [name for pick in picks for name in pick['pack_cards']]
+        cards = np.fromiter((self._index(card_index, name) for name in names), dtype=np.int64, count=len(names))
+        lengths = np.fromiter((len(pick['pack_cards']) for pick in picks), dtype=np.int64, count=len(picks))
+        pick_nums = np.repeat(np.fromiter((pick['pick_num'] for pick in picks), dtype=np.int64, count=len(picks)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        taken = np.zeros(len(names), dtype=bool)
+        taken[starts + np.fromiter((pick['choice_index'] for pick in picks), dtype=np.int64, count=len(picks))] = True
+        # Una carta "gira" se è ancora nella busta dopo un giro del tavolo: al pick
+        # num_giocatori + 1 la busta è quella aperta al pick 1, meno le carte prese.
+        num_players = max(pick['player_id'] for pick in picks) + 1
+
+        self._buffer.append((cube, cards, pick_nums, taken, num_players + 1))
+        self._buffered_rows += len(names)
+        self.drafts += 1
+        self.picks += len(picks)
+        if self._buffered_rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """Group-by del buffer sui contatori [cubo, carta]."""
+        if not self._buffer:
+            return
+        num_cubes, num_cards = len(self.cube_index), len(self.card_index)
+        for field, counts in self.counts.items():
+            if counts.shape != (num_cubes, num_cards):
+                grown = np.zeros((num_cubes, num_cards), dtype=np.int64)
+                grown[:counts.shape[0], :counts.shape[1]] = counts
+                self.counts[field] = grown
+
+        cards = np.concatenate([entry[1] for entry in self._buffer])
+        pick_nums = np.concatenate([entry[2] for entry in self._buffer])
+        taken = np.concatenate([entry[3] for entry in self._buffer])
+        lengths = [len(entry[1]) for entry in self._buffer]
+        keys = np.repeat([entry[0] for entry in self._buffer], lengths) * num_cards + cards
+        wheel_picks = np.repeat([entry[4] for entry in self._buffer], lengths)
+        self._buffer, self._buffered_rows = [], 0
+
+        size = num_cubes * num_cards
+        first = pick_nums == 1
+
+        def group(mask: Optional[np.ndarray] = None, weights: Optional[np.ndarray] = None) -> np.ndarray:
+            selected = keys if mask is None else keys[mask]
+            if weights is not None and mask is not None:
+                weights = weights[mask]
+            return np.bincount(selected, weights=weights, minlength=size).astype(np.int64).reshape(num_cubes, num_cards)
+
+        self.counts["seen"] += group()
+        self.counts["picked"] += group(taken)
+        self.counts["taken_position_sum"] += group(taken, pick_nums)
+        self.counts["seen_first"] += group(first)
+        self.counts["picked_first"] += group(first & taken)
+        self.counts["seen_wheel"] += group(pick_nums == wheel_picks)
+
+    def table(self) -> "CardStatsTable":
+        self.flush()
+        return CardStatsTable(
+            cube_names=sorted(self.cube_index, key=self.cube_index.get),
+            card_names=sorted(self.card_index, key=self.card_index.get),
+            counts=self.counts,
+            drafts=self.drafts,
+            picks=self.picks
+        )
+
+
+class CardStatsTable:
+    """
+    Tabella compatta delle statistiche: contatori [cubo, carta] e nomi, salvati
+    in un unico .npz. Per un cubo (o per tutti i cubi insieme) fornisce:
+    - pick_rate: quota delle volte in cui la carta, vista in una busta, è stata presa;
+    - avg_pick: posizione media nella busta (numero di pick) a cui è stata presa;
+    - first_pick_rate: quota delle buste aperte in cui è stata la prima scelta;
+    - wheel_rate: quota delle buste aperte in cui è tornata dopo un giro del tavolo.
+    """
+    def __init__(self, cube_names: List[str], card_names: List[str], counts: Dict[str, np.ndarray], drafts: int, picks: int):
+        self.cube_names = list(cube_names)
+        self.card_names = list(card_names)
+        self.counts = counts
+        self.drafts = drafts
+        self.picks = picks
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path,
+            cube_names=np.array(self.cube_names, dtype=str),
+            card_names=np.array(self.card_names, dtype=str),
+            totals=np.array([self.drafts, self.picks], dtype=np.int64),
+            # int32: i contatori restano piccoli anche per milioni di draft per carta.
+            **{field: counts.astype(np.int32) for field, counts in self.counts.items()}
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "CardStatsTable":
+        with np.load(path) as data:
+            drafts, picks = data['totals'].tolist()
+            return cls(
+                cube_names=data['cube_names'].tolist(),
+                card_names=data['card_names'].tolist(),
+                counts={field: data[field].astype(np.int64) for field in COUNT_FIELDS},
+                drafts=drafts,
+                picks=picks
+            )
+
+    def statistics(self, cube: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """Statistiche per carta di un cubo, o di tutti i cubi sommati (cube=None)."""
+        if cube is None:
+            counts = {field: values.sum(axis=0) for field, values in self.counts.items()}
+        else:
+            row = self.cube_names.index(cube)
+            counts = {field: values[row] for field, values in self.counts.items()}
+
+        def ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+            return np.divide(numerator, denominator, out=np.full(len(numerator), np.nan), where=denominator > 0)
+
+        return {
+            "seen": counts["seen"],
+            "picked": counts["picked"],
+            "pick_rate": ratio(counts["picked"], counts["seen"]),
+            "avg_pick": ratio(counts["taken_position_sum"], counts["picked"]),
+            "first_pick_rate": ratio(counts["picked_first"], counts["seen_first"]),
+            "wheel_rate": ratio(counts["seen_wheel"], counts["seen_first"])
+        }
+
+    def prior_scores(self, cube: Optional[str] = None, min_seen: int = 20) -> Dict[str, float]:
+        """
+        Prior per carta: posizione media di presa standardizzata (z-score, più
+        alto = presa prima). Le carte viste meno di 'min_seen' volte sono escluse;
+        quelle viste ma mai prese contano come prese all'ultimo pick.
+        """
+        stats = self.statistics(cube)
+        known = stats["seen"] >= min_seen
+        if not known.any():
+            return {}
+        last_pick = np.nanmax(stats["avg_pick"]) if np.isfinite(stats["avg_pick"]).any() else 1.0
+        avg_pick = np.where(np.isnan(stats["avg_pick"]), last_pick, stats["avg_pick"])[known]
+        spread = avg_pick.std()
+        scores = (avg_pick.mean() - avg_pick) / spread if spread > 0 else np.zeros(len(avg_pick))
+        names = [name for name, is_known in zip(self.card_names, known) if is_known]
+        return dict(zip(names, scores.tolist()))
+
+
+# Campi che servono alle statistiche, cercati con un'unica scansione dei byte
+# dei log: evita di decodificare e parsare i vettori di feature, che sono quasi tutto il file.
+_STATS_FIELDS = re.compile(
+    rb'"(player_id|pick_num|choice_index)": (-?\d+)|"pack_cards": (\[.*?\])|"cube": ("(?:[^"\\]|\\.)*")',
+    re.DOTALL
+)
+
+
+def read_pick_fields(log_file: Path) -> Dict:
+    """
+    Solo i campi usati da CardStatsAccumulator ('cube' e, per ogni pick,
+    'pack_cards', 'player_id', 'pick_num', 'choice_index'), estratti dal testo
+    senza parsare i vettori. Se il testo non ha la forma attesa si ricade su
+    json.load dell'intero file.
+    """
+    data = log_file.read_bytes()
+    fields: Dict[str, list] = {"pack_cards": [], "player_id": [], "pick_num": [], "choice_index": []}
+    cube = None
+    try:
+        for int_field, int_value, pack_cards, cube_name in _STATS_FIELDS.findall(data):
+            if int_field:
+                fields[int_field.decode()].append(int(int_value))
+            elif pack_cards:
+                fields["pack_cards"].append(json.loads(pack_cards))
+            else:
+                cube = json.loads(cube_name)
+        parsed = len({len(values) for values in fields.values()}) == 1
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        parsed = False
+    if not parsed:
+        log = json.loads(data)
+        # Anche qui solo i campi delle statistiche: i vettori non restano in memoria.
+        picks = [{key: pick[key] for key in fields if key in pick} for pick in log.get("picks", [])]
+        return {"cube": log.get("cube"), "picks": picks}
+
+    picks = [
+        {"pack_cards": pack, "player_id": player_id, "pick_num": pick_num, "choice_index": choice_index}
+        for pack, player_id, pick_num, choice_index in zip(
+            fields["pack_cards"], fields["player_id"], fields["pick_num"], fields["choice_index"]
+        )
+    ]
+    return {"cube": cube, "picks": picks}
+
+
+def iter_draft_logs(log_files: Iterable[Path]) -> Iterable[Dict]:
+    """Un log di draft alla volta (solo i campi delle statistiche): in memoria c'è sempre un solo file."""
+    for log_file in log_files:
+        yield read_pick_fields(log_file)
@@ -1,7 +1,11 @@
 import requests
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import time
+from typing import Dict, Iterable
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # --- MODIFICA CHIAVE: USARE UN USER-AGENT DA BROWSER ---
 HEADERS = {
@@ -9,75 +13,182 @@ HEADERS = {
 }
 # --- FINE MODIFICA ---
 
-# La funzione download_scryfall_commons non cambia
-def download_scryfall_commons(output_path: Path):
-    # ... codice esistente ...
-    # (lascia invariata tutta la funzione di Scryfall)
-    if output_path.exists():
-        print(f"File {output_path.name} già esistente. Salto il download.")
-        return
-    print("Inizio download di tutte le carte comuni da Scryfall...")
-    all_cards = []
-    search_url = "https://api.scryfall.com/cards/search?q=r:common"
-    while search_url:
-        response = None
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = requests.get(search_url, headers=HEADERS)
-                response.raise_for_status()
-                print(f"  -> Pagina scaricata con successo (tentativo {attempt + 1})")
-                break 
-            except requests.RequestException as e:
-                print(f"ERRORE: Tentativo {attempt + 1}/{max_retries} fallito. Errore: {e}")
-                if attempt + 1 == max_retries:
-                    print("Massimo numero di tentativi raggiunto. Interruzione dello script.")
-                    return
-                wait_time = 5 * (attempt + 1)
-                print(f"Attendo {wait_time} secondi prima di riprovare...")
-                time.sleep(wait_time)
-        if not response:
-             return
-        data = response.json()
-        all_cards.extend(data['data'])
-        if data['has_more']:
-            search_url = data['next_page']
-            print(f"  -> Trovata un'altra pagina... (totale carte: {len(all_cards)})")
-        else:
-            search_url = None
-        time.sleep(0.1)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(all_cards, f, indent=2)
-    print(f"✅ Download completato. {len(all_cards)} carte comuni salvate in {output_path}")
-
+def download_scryfall_bulk(
+    output_path: Path,
+    bulk_type: str = "default_cards",
+    chunk_size: int = 1 << 20,
+    api_url: str = "https://api.scryfall.com"
+):
+    """
+    Scarica un file di bulk data di Scryfall (un unico JSON con tutte le carte)
+    scrivendolo su disco a blocchi, senza tenerlo in memoria. Il file viene poi
+    indicizzato da src.data.carddb.ingest_card_file.
 
-def download_cubecobra_list(cube_id: str, output_path: Path):
-    # Questa funzione rimane identica a quella che ti ho dato prima
-    # con i controlli, ma ora userà i NUOVI HEADERS definiti sopra.
-    if output_path.exists():
-        print(f"Cubo '{cube_id}' già esistente. Salto il download.")
-        return
-        
-    url = f"https://cubecobra.com/cube/api/cubelist/{cube_id}"
-    print(f"Inizio download del cubo '{cube_id}' da {url}...")
+    L'ultimo 'updated_at' del bulk viene salvato accanto al file: il download
+    si salta solo se Scryfall riporta ancora la stessa versione.
+    """
+    version_path = output_path.with_suffix(".meta.json")
+    local_version = None
+    if output_path.exists() and version_path.exists():
+        try:
+            with open(version_path, 'r', encoding='utf-8') as f:
+                local_version = json.load(f).get('updated_at')
+        except (OSError, json.JSONDecodeError):
+            pass
     try:
-        response = requests.get(url, headers=HEADERS) # Userà il nuovo header
+        response = requests.get(f"{api_url.rstrip('/')}/bulk-data/{bulk_type}", headers=HEADERS)
         response.raise_for_status()
+        bulk_info = response.json()
+        if local_version is not None and bulk_info.get('updated_at') == local_version:
+            print(f"File {output_path.name} già aggiornato ({local_version}). Salto il download.")
+            return
+        download_uri = bulk_info['download_uri']
+        print(f"Inizio download dei bulk data '{bulk_type}' da {download_uri}...")
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = output_path.with_name(output_path.name + ".part")
+        with requests.get(download_uri, headers=HEADERS, stream=True) as response:
+            response.raise_for_status()
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+        tmp_path.replace(output_path)
+        with open(version_path, 'w', encoding='utf-8') as f:
+            json.dump({"bulk_type": bulk_type, "updated_at": bulk_info.get('updated_at')}, f, indent=2)
+        print(f"✅ Bulk data salvati in {output_path}")
+    except requests.RequestException as e:
+        if output_path.exists():
+            print(f"ATTENZIONE: Impossibile controllare i bulk data '{bulk_type}', uso la copia locale. {e}")
+        else:
+            print(f"ERRORE: Download dei bulk data '{bulk_type}' fallito. {e}")
+
+
+class CubeDownloader:
+    """
+    Scarica le liste dei cubi da CubeCobra con una sessione HTTP condivisa
+    (connessioni riusate), più cubi in parallelo e richieste condizionali:
+    ETag e Last-Modified di ogni cubo vengono salvati in un file di metadati
+    accanto alle liste, così un cubo non modificato costa solo una risposta 304.
+    Il file non ha estensione .json, altrimenti verrebbe letto come un cubo.
+    """
+    METADATA_FILE = ".cube_metadata"
+    LEGACY_METADATA_FILE = ".cube_metadata.json"
+
+    def __init__(
+        self,
+        output_dir: Path,
+        base_url: str = "https://cubecobra.com",
+        max_workers: int = 4,
+        max_retries: int = 3,
+        backoff_factor: float = 1.0,
+        timeout: float = 30.0,
+        min_cards: int = 100
+    ):
+        self.output_dir = output_dir
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.min_cards = min_cards
+        self.metadata_path = output_dir / self.METADATA_FILE
+        self.legacy_metadata_path = output_dir / self.LEGACY_METADATA_FILE
+        self.metadata = self._load_metadata()
+        self._metadata_lock = threading.Lock()
+
+        # Retry con backoff esponenziale per errori temporanei e rate limit (rispetta Retry-After).
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __enter__(self) -> "CubeDownloader":
+        return self
+
+    def __exit__(self, *exc):
+        self.session.close()
+
+    def _load_metadata(self) -> Dict[str, Dict[str, str]]:
+        # I metadati delle versioni precedenti stavano in un file .json: li si rilegge una volta.
+        path = self.metadata_path if self.metadata_path.exists() else self.legacy_metadata_path
+        if not path.exists():
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_metadata(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.metadata_path.with_name(self.metadata_path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.metadata, f, indent=2)
+        tmp_path.replace(self.metadata_path)
+        self.legacy_metadata_path.unlink(missing_ok=True)
+
+    def download(self, cube_id: str) -> str:
+        """Scarica un cubo e restituisce l'esito: 'updated', 'not_modified' o 'error'."""
+        output_path = self.output_dir / f"{cube_id}.json"
+        url = f"{self.base_url}/cube/api/cubelist/{cube_id}"
+
+        # Gli header condizionali hanno senso solo se abbiamo ancora la copia locale.
+        headers = {}
+        cached = self.metadata.get(cube_id, {}) if output_path.exists() else {}
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                return "not_modified"
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"ERRORE: Download del cubo '{cube_id}' fallito. {e}")
+            return "error"
+
         if response.text.strip().startswith('<'):
             print(f"ERRORE: CubeCobra ha restituito una pagina HTML invece di una lista di carte per '{cube_id}'. Salto.")
-            return
+            return "error"
         card_names = response.text.strip().split('\n')
-        if len(card_names) < 100:
+        if len(card_names) < self.min_cards:
             print(f"ERRORE: Trovate solo {len(card_names)} carte per il cubo '{cube_id}'. Potrebbe essere un errore. Salto il salvataggio.")
-            print("Contenuto ricevuto:", response.text[:200])
-            return
-        cube_data = { "id": cube_id, "card_count": len(card_names), "cards": card_names }
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+            return "error"
+
+        cube_data = {"id": cube_id, "card_count": len(card_names), "cards": card_names}
+        self.output_dir.mkdir(parents=True, exist_ok=True)
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(cube_data, f, indent=2)
+        with self._metadata_lock:
+            self.metadata[cube_id] = {
+                key: value for key, value in (
+                    ('etag', response.headers.get('ETag')),
+                    ('last_modified', response.headers.get('Last-Modified'))
+                ) if value
+            }
         print(f"✅ Cubo '{cube_id}' ({len(card_names)} carte) salvato in {output_path}")
-    except requests.RequestException as e:
-        print(f"ERRORE: Download del cubo '{cube_id}' fallito. {e}")
+        return "updated"
+
+    def download_many(self, cube_ids: Iterable[str]) -> Dict[str, str]:
+        """Scarica più cubi in parallelo (al massimo max_workers richieste insieme)."""
+        cube_ids = list(dict.fromkeys(cube_ids))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = dict(zip(cube_ids, executor.map(self.download, cube_ids)))
+        self._save_metadata()
+        return results
 
 
+def download_cubecobra_list(cube_id: str, output_path: Path):
+    """Scarica un singolo cubo (con richiesta condizionale se è già presente in locale)."""
+    if output_path.name != f"{cube_id}.json":
+        raise ValueError(f"Il file di output del cubo '{cube_id}' deve chiamarsi {cube_id}.json")
+    with CubeDownloader(output_dir=output_path.parent, max_workers=1) as downloader:
+        downloader.download_many([cube_id])
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.data.carddb import CardDatabase, database_version
+from src.environment.draft import Card
+
+
+@dataclass
+class ResolvedCube:
+    """Lista di un cubo risolta sul database: id delle carte trovate e nomi mancanti."""
+    name: str
+    card_ids: np.ndarray
+    unmatched: List[str]
+
+    def __len__(self) -> int:
+        return len(self.card_ids)
+
+
+def _cache_key(cube_path: Path, db_version: str) -> str:
+    # Il contenuto del cubo (non la data del file) e la versione del database:
+    # se cambia uno dei due la risoluzione va rifatta.
+    digest = hashlib.sha1(cube_path.read_bytes())
+    digest.update(db_version.encode())
+    return digest.hexdigest()[:16]
+
+
+def _read_cached(path: Path, name: str) -> Optional[ResolvedCube]:
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as data:
+            return ResolvedCube(name=name, card_ids=data['card_ids'], unmatched=data['unmatched'].tolist())
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_cached(path: Path, resolved: ResolvedCube):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Le versioni precedenti dello stesso cubo non servono più. Il nome va confrontato
+    # per intero: "cubo-*.npz" includerebbe anche i file di un cubo "cubo-b".
+    stale_name = re.compile(rf"{re.escape(resolved.name)}-[0-9a-f]{{16}}")
+    for stale in path.parent.glob("*.npz"):
+        if stale != path and stale_name.fullmatch(stale.stem):
+            stale.unlink(missing_ok=True)
+    tmp_path = path.with_name(path.stem + ".tmp.npz")
+    np.savez(tmp_path, card_ids=resolved.card_ids, unmatched=np.array(resolved.unmatched, dtype=str))
+    tmp_path.replace(path)
+
+
+def resolve_cubes(cube_paths: Iterable[Path], card_db_path: Path, cache_dir: Path) -> Dict[str, ResolvedCube]:
+    """
+    Risolve i cubi in array di id del database di carte. Il risultato è salvato
+    in 'cache_dir' (un .npz per cubo) con una chiave che dipende dal contenuto
+    del cubo e dalla versione del database: le esecuzioni successive leggono solo
+    la cache e il database viene aperto solo per i cubi nuovi o modificati.
+    """
+    if card_db_path.suffix not in (".sqlite", ".db"):
+        raise ValueError(f"La risoluzione dei cubi richiede il database SQLite (vedi buildcarddb.py), non {card_db_path}")
+    db_version = database_version(card_db_path)
+
+    resolved: Dict[str, ResolvedCube] = {}
+    database: Optional[CardDatabase] = None
+    try:
+        for cube_path in sorted(cube_paths):
+            cache_path = cache_dir / f"{cube_path.stem}-{_cache_key(cube_path, db_version)}.npz"
+            cube = _read_cached(cache_path, cube_path.stem)
+            if cube is None:
+                if database is None:
+                    database = CardDatabase(card_db_path)
+                with open(cube_path, 'r', encoding='utf-8') as f:
+                    names = json.load(f).get('cards', [])
+                ids_by_name = database.resolve_ids(names)
+                cube = ResolvedCube(
+                    name=cube_path.stem,
+                    card_ids=np.array([ids_by_name[name] for name in names if name in ids_by_name], dtype=np.int32),
+                    unmatched=sorted({name for name in names if name not in ids_by_name})
+                )
+                _write_cached(cache_path, cube)
+            resolved[cube.name] = cube
+    finally:
+        if database is not None:
+            database.close()
+    return resolved
+
+
+def load_cube_cards(cubes: Dict[str, ResolvedCube], card_db_path: Path) -> Dict[str, List[Card]]:
+    """
+    Costruisce le liste di Card dei cubi leggendo dal database ogni carta una
+    sola volta, anche se compare in più cubi (i dettagli sono condivisi).
+    Le carte prendono il nome canonico del database.
+    """
+    all_ids = np.unique(np.concatenate([cube.card_ids for cube in cubes.values()])) if cubes else []
+    with CardDatabase(card_db_path) as database:
+        details_by_id = database.get_by_ids(all_ids.tolist() if len(all_ids) else [])
+    return {
+        name: [Card(name=details_by_id[card_id]['name'], details=details_by_id[card_id]) for card_id in cube.card_ids.tolist()]
+        for name, cube in cubes.items()
+    }
+
+
+def report_unmatched(cubes: Dict[str, ResolvedCube], max_names: int = 5):
+    """Stampa, per ogni cubo, quante carte non sono state trovate nel database."""
+    for cube in cubes.values():
+        if cube.unmatched:
+            examples = ", ".join(cube.unmatched[:max_names])
+            more = f" e altre {len(cube.unmatched) - max_names}" if len(cube.unmatched) > max_names else ""
+            print(f"AVVISO: {len(cube.unmatched)} carte del cubo '{cube.name}' non sono nel database: {examples}{more}")
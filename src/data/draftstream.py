@@ -0,0 +1,180 @@
+import queue
+import random
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.environment.draft import Card, Player
+from src.environment.draftsimulator import DraftSimulator
+from src.environment.opponents import ScoringBot
+from src.features.cardencoders import CardEncoder
+from src.training.logger import DraftLogger
+from src.utils.constants import FEATURE_SIZE
+
+# Messaggio con cui un worker segnala di aver finito i suoi draft.
+_WORKER_DONE = "__done__"
+
+
+def pack_draft_picks(picks: List[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Pick di un draft (formato di DraftLogger) negli array compatti di
+    PackedDraftDataset: righe di pack e pool concatenate più gli offset.
+    Sono array numpy, quindi passano tra processi come semplici byte.
+    """
+    def rows(key: str) -> Tuple[np.ndarray, np.ndarray]:
+        lengths = [len(pick[key]) for pick in picks]
+        offsets = np.zeros(len(picks) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        flat = [row for pick in picks for row in pick[key]]
+        features = np.asarray(flat, dtype=np.float32) if flat else np.empty((0, FEATURE_SIZE), dtype=np.float32)
+        return features, offsets
+
+    pack_features, pack_offsets = rows('pack')
+    pool_features, pool_offsets = rows('pool')
+    return {
+        'pack_features': pack_features,
+        'pack_offsets': pack_offsets,
+        'pool_features': pool_features,
+        'pool_offsets': pool_offsets,
+        'pick_nums': np.array([pick['pick_num'] for pick in picks], dtype=np.int64),
+        'pack_nums': np.array([pick['pack_num'] for pick in picks], dtype=np.int64),
+        'choices': np.array([pick['choice_index'] for pick in picks], dtype=np.int64)
+    }
+
+
+class StreamingDraftLogger(DraftLogger):
+    """
+    DraftLogger che non scrive file: a fine draft passa i pick già codificati
+    (vedi pack_draft_picks) a 'sink', ad esempio una coda verso il trainer.
+    """
+    def __init__(self, sink: Callable[[Any, Dict[str, np.ndarray]], None]):
+        # Nessuna cartella di log: solo encoder e dati dei draft in corso come in DraftLogger.
+        self.encoder = CardEncoder()
+        self._current_draft_data: Dict[Any, Dict] = {}
+        self.sink = sink
+
+    def save_draft_log(self, draft_id: Any):
+        data = self._current_draft_data.pop(draft_id, None)
+        if data and data["picks"]:
+            self.sink(draft_id, pack_draft_picks(data["picks"]))
+
+
+def _generation_worker(
+    worker_index: int,
+    num_workers: int,
+    cubes: Dict[str, List[Card]],
+    drafts_per_cube: int,
+    sim_config: Dict,
+    output_queue,
+    base_seed: int
+):
+    """Simula i draft assegnati al worker (uno ogni num_workers) e li mette in coda."""
+    logger = StreamingDraftLogger(lambda draft_id, arrays: output_queue.put((draft_id, arrays)))
+    num_players = sim_config['num_players']
+    cube_names = sorted(cubes)
+    # I cubi sono alternati come in evaluationengine.build_tasks: i primi draft
+    # che arrivano al trainer coprono già tutti i cubi.
+    draft_keys = [(cube_name, i) for i in range(drafts_per_cube) for cube_name in cube_names]
+    try:
+        for index in range(worker_index, len(draft_keys), num_workers):
+            cube_name, draft_index = draft_keys[index]
+            seed = base_seed * 1_000_003 + index
+            random.seed(seed)
+            bots = [ScoringBot(Player(player_id=j)) for j in range(num_players)]
+            DraftSimulator(
+                cube_list=cubes[cube_name],
+                bots=bots,
+                num_players=num_players,
+                pack_size=sim_config['pack_size'],
+                num_packs=sim_config['num_packs'],
+                draft_id=f"{cube_name}_{draft_index}",
+                logger=logger,
+                rng=random.Random(seed),
+                cube_name=cube_name
+            ).run_draft(verbose=False)
+    finally:
+        output_queue.put((_WORKER_DONE, worker_index))
+
+
+class DraftStream:
+    """
+    Draft generati da processi separati e consegnati in memoria attraverso una
+    coda limitata a 'max_queued_drafts': se chi consuma è più lento, i
+    generatori si fermano invece di riempire la memoria. Nessun file su disco.
+    """
+    def __init__(
+        self,
+        cubes: Dict[str, List[Card]],
+        sim_config: Dict,
+        drafts_per_cube: int,
+        num_workers: int = 1,
+        max_queued_drafts: int = 64,
+        seed: int = 0
+    ):
+        self.cubes = cubes
+        self.sim_config = sim_config
+        self.drafts_per_cube = drafts_per_cube
+        self.num_workers = max(1, num_workers)
+        self.max_queued_drafts = max_queued_drafts
+        self.seed = seed
+        self.total_drafts = drafts_per_cube * len(cubes)
+        self.received = 0
+        self._workers_done = 0
+        self._queue = None
+        self._processes = []
+
+    def start(self):
+        # 'spawn' come nella valutazione: i worker non ereditano lo stato di torch del trainer.
+        context = get_context('spawn')
+        self._queue = context.Queue(maxsize=self.max_queued_drafts)
+        self._processes = [
+            context.Process(
+                target=_generation_worker,
+                args=(i, self.num_workers, self.cubes, self.drafts_per_cube, self.sim_config, self._queue, self.seed),
+                daemon=True
+            )
+            for i in range(self.num_workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+    @property
+    def finished(self) -> bool:
+        """Tutti i worker hanno finito e tutti i draft sono stati ricevuti."""
+        return self._workers_done == self.num_workers
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[Any, Dict[str, np.ndarray]]]:
+        """
+        Il prossimo draft (id, array), oppure None se non ne arriva nessuno entro
+        'timeout' secondi (0 = non attendere) o se la generazione è finita.
+        """
+        while not self.finished:
+            try:
+                if timeout == 0:
+                    draft_id, payload = self._queue.get_nowait()
+                else:
+                    draft_id, payload = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._check_workers()
+                return None
+            if draft_id == _WORKER_DONE:
+                self._workers_done += 1
+                continue
+            self.received += 1
+            return draft_id, payload
+        return None
+
+    def _check_workers(self):
+        """Un worker terminato con errore non manderebbe mai il messaggio di fine."""
+        for process in self._processes:
+            if process.exitcode not in (None, 0):
+                self.close()
+                raise RuntimeError(f"Un processo di generazione è terminato con codice {process.exitcode}.")
+
+    def close(self):
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        self._processes = []
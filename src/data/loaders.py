@@ -1,15 +1,21 @@
 import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, IterableDataset, Subset
 # MODIFICA: Importa la funzione pad_sequence
 from torch.nn.utils.rnn import pad_sequence
 from pathlib import Path
+import hashlib
 import json
-from typing import List, Dict, Tuple
+import random
+import numpy as np
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
 
 # MODIFICA: Importa le costanti strutturali e la configurazione separatamente
 from src.utils.constants import FEATURE_SIZE
 from src.utils.config_loader import CONFIG
 
+if TYPE_CHECKING:
+    from src.data.draftstream import DraftStream
+
 # MODIFICA: Prendi le dimensioni massime dalla configurazione, non più da constants.py
 MAX_PACK_SIZE = CONFIG['model']['max_pack_size']
 MAX_POOL_SIZE = CONFIG['model']['max_pool_size']
@@ -24,10 +30,14 @@ class DraftLogDataset(Dataset):
             raise FileNotFoundError(f"Nessun file di log trovato in {logs_dir}")
         
         self.samples = []
-        for log_file in self.log_files:
+        # Indice del draft (cioè del file di log) da cui proviene ogni campione.
+        # Serve a dividere train/validazione senza spezzare un draft a metà.
+        self.sample_drafts: List[int] = []
+        for draft_idx, log_file in enumerate(self.log_files):
             with open(log_file, 'r') as f:
                 log_data = json.load(f)
                 for pick in log_data['picks']:
+                    self.sample_drafts.append(draft_idx)
                     self.samples.append({
                         "pack": pick['pack'],
                         "pool": pick['pool'],
@@ -43,13 +53,308 @@ class DraftLogDataset(Dataset):
         return self.samples[idx]
 
 
+def log_set_version(log_files: List[Path]) -> str:
+    """Versione di un insieme di log (nomi, dimensioni e date): cambia se i log vengono rigenerati."""
+    digest = hashlib.sha1()
+    for log_file in sorted(log_files):
+        stat = log_file.stat()
+        digest.update(f"{log_file.name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+class PackedDraftDataset(Dataset):
+    """
+    Versione compatta di DraftLogDataset: tutti i vettori di pack e pool sono
+    concatenati in due tensori float32 con gli offset di ogni campione.
+    Si salva in un unico file .pt che può essere riaperto in memory-map, così
+    più processi condividono lo stesso dataset senza riparsare i JSON.
+    Il file registra la versione dei log da cui è stato costruito
+    ('source_version'), così chi lo riusa può accorgersi che i log sono cambiati.
+    """
+    def __init__(self, tensors: Dict[str, torch.Tensor]):
+        self.pack_features = tensors['pack_features']
+        self.pack_offsets = tensors['pack_offsets']
+        self.pool_features = tensors['pool_features']
+        self.pool_offsets = tensors['pool_offsets']
+        self.pick_nums = tensors['pick_nums']
+        self.pack_nums = tensors['pack_nums']
+        self.choices = tensors['choices']
+        self.drafts = tensors['drafts']
+        self.source_version: Optional[str] = tensors.get('source_version')
+
+    @classmethod
+    def from_log_dataset(cls, dataset: DraftLogDataset) -> "PackedDraftDataset":
+        """Converte un DraftLogDataset già caricato nel formato compatto."""
+        def pack_rows(key: str) -> Tuple[torch.Tensor, torch.Tensor]:
+            lengths = torch.tensor([len(sample[key]) for sample in dataset.samples], dtype=torch.long)
+            offsets = torch.zeros(len(lengths) + 1, dtype=torch.long)
+            torch.cumsum(lengths, dim=0, out=offsets[1:])
+            rows = [row for sample in dataset.samples for row in sample[key]]
+            features = torch.tensor(rows, dtype=torch.float32) if rows else torch.empty(0, FEATURE_SIZE)
+            return features, offsets
+
+        pack_features, pack_offsets = pack_rows('pack')
+        pool_features, pool_offsets = pack_rows('pool')
+        return cls({
+            'pack_features': pack_features,
+            'pack_offsets': pack_offsets,
+            'pool_features': pool_features,
+            'pool_offsets': pool_offsets,
+            'pick_nums': torch.tensor([s['pick_num'] for s in dataset.samples], dtype=torch.long),
+            'pack_nums': torch.tensor([s['pack_num'] for s in dataset.samples], dtype=torch.long),
+            'choices': torch.tensor([s['choice_index'] for s in dataset.samples], dtype=torch.long),
+            'drafts': torch.tensor(dataset.sample_drafts, dtype=torch.long),
+            'source_version': log_set_version(dataset.log_files)
+        })
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        torch.save({
+            'pack_features': self.pack_features, 'pack_offsets': self.pack_offsets,
+            'pool_features': self.pool_features, 'pool_offsets': self.pool_offsets,
+            'pick_nums': self.pick_nums, 'pack_nums': self.pack_nums,
+            'choices': self.choices, 'drafts': self.drafts,
+            'source_version': self.source_version
+        }, str(path))
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "PackedDraftDataset":
+        """Carica il dataset; con mmap=True le pagine sono condivise tra i processi."""
+        return cls(torch.load(str(path), mmap=mmap, weights_only=True))
+
+    @classmethod
+    def is_current(cls, path: Path, logs_dir: Path) -> bool:
+        """True se il file esiste ed è stato costruito dai log attualmente in 'logs_dir'."""
+        if not path.exists():
+            return False
+        return cls.load(path, mmap=True).source_version == log_set_version(list(logs_dir.glob("*.json")))
+
+    @property
+    def sample_drafts(self) -> List[int]:
+        return self.drafts.tolist()
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+    def __getitem__(self, idx: int) -> Dict:
+        pack_start, pack_end = self.pack_offsets[idx].item(), self.pack_offsets[idx + 1].item()
+        pool_start, pool_end = self.pool_offsets[idx].item(), self.pool_offsets[idx + 1].item()
+        return {
+            "pack": self.pack_features[pack_start:pack_end],
+            "pool": self.pool_features[pool_start:pool_end],
+            "choice_index": self.choices[idx].item(),
+            "pack_num": self.pack_nums[idx].item(),
+            "pick_num": self.pick_nums[idx].item()
+        }
+
+
+class _SampleList(Dataset):
+    """Vista map-style su una lista di campioni."""
+    def __init__(self, samples: List[Dict]):
+        self.samples = samples
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def __getitem__(self, idx: int) -> Dict:
+        return self.samples[idx]
+
+
+class StreamingDraftDataset(IterableDataset):
+    """
+    Dataset alimentato in memoria da un DraftStream mentre la generazione è in
+    corso. I campioni ricevuti finiscono in un buffer limitato a 'buffer_size'
+    (oltre il limite sostituiscono campioni a caso, come un reservoir) e ogni
+    epoca estrae 'samples_per_epoch' campioni casuali dal buffer, quindi il
+    trainer parte appena il buffer ha 'min_buffer' campioni.
+
+    Prima dell'addestramento una frazione dei draft (interi, come in
+    split_by_draft) va al set di validazione, finché non raggiunge
+    'val_max_samples' campioni o 'val_drafts' draft; wait_ready lo congela e
+    da lì in poi ogni draft va al buffer di addestramento, così la loss di
+    validazione di ogni epoca è misurata sugli stessi campioni. Con 'shard_dir'
+    i draft ricevuti vengono anche salvati in shard di PackedDraftDataset.
+
+    Va usato con num_workers=0 nel DataLoader: la coda è letta dal processo del trainer.
+    """
+    def __init__(
+        self,
+        stream: "DraftStream",
+        samples_per_epoch: int,
+        buffer_size: int = 50_000,
+        min_buffer: int = 5_000,
+        val_fraction: float = 0.0,
+        val_max_samples: int = 20_000,
+        val_drafts: int = 100,
+        shard_dir: Optional[Path] = None,
+        shard_drafts: int = 500,
+        seed: int = 0,
+        poll_every: int = 64
+    ):
+        self.stream = stream
+        self.samples_per_epoch = samples_per_epoch
+        self.buffer_size = buffer_size
+        self.min_buffer = min_buffer
+        self.val_fraction = val_fraction
+        self.val_max_samples = val_max_samples
+        self.val_drafts = val_drafts
+        self.shard_dir = shard_dir
+        self.shard_drafts = shard_drafts
+        self.poll_every = poll_every
+        self.rng = random.Random(seed)
+
+        self.buffer: List[Dict] = []
+        self.val_samples: List[Dict] = []
+        self.val_drafts_seen = 0
+        self.val_frozen = val_fraction <= 0
+        self.samples_seen = 0
+        self._pending_shard: List[Dict] = []
+        self.shards_written = 0
+
+    def __len__(self) -> int:
+        return self.samples_per_epoch
+
+    @property
+    def validation_dataset(self) -> Dataset:
+        if not self.val_frozen:
+            raise RuntimeError("Il set di validazione non è ancora pronto: chiamare wait_ready().")
+        return _SampleList(self.val_samples)
+
+    def _val_complete(self) -> bool:
+        return len(self.val_samples) >= self.val_max_samples or self.val_drafts_seen >= self.val_drafts
+
+    def wait_ready(self):
+        """
+        Attende il riempimento minimo del buffer e, alla prima chiamata, quello
+        del set di validazione, che poi viene congelato.
+        """
+        while not self.stream.finished and (
+            len(self.buffer) < self.min_buffer or (not self.val_frozen and not self._val_complete())
+        ):
+            self._ingest(timeout=1.0)
+        if not self.val_frozen:
+            # Copia: la lista non può più cambiare tra un'epoca e l'altra.
+            self.val_samples = list(self.val_samples)
+            self.val_frozen = True
+        if not self.buffer:
+            raise RuntimeError("La generazione è terminata senza produrre campioni di addestramento.")
+
+    def __iter__(self):
+        for i in range(self.samples_per_epoch):
+            if i % self.poll_every == 0:
+                self._drain()
+            yield self.buffer[self.rng.randrange(len(self.buffer))]
+
+    def _drain(self):
+        """Prende tutti i draft già in coda, senza attendere; attende solo se il buffer è troppo vuoto."""
+        while self._ingest(timeout=0):
+            pass
+        if len(self.buffer) < self.min_buffer:
+            self.wait_ready()
+
+    def _ingest(self, timeout: float) -> bool:
+        item = self.stream.get(timeout=timeout)
+        if item is None:
+            return False
+        self._add_draft(item[1])
+        return True
+
+    def _add_draft(self, arrays: Dict):
+        tensors = {key: torch.from_numpy(value) for key, value in arrays.items()}
+        pack_offsets, pool_offsets = arrays['pack_offsets'], arrays['pool_offsets']
+        samples = [
+            {
+                "pack": tensors['pack_features'][pack_offsets[i]:pack_offsets[i + 1]],
+                "pool": tensors['pool_features'][pool_offsets[i]:pool_offsets[i + 1]],
+                "choice_index": int(arrays['choices'][i]),
+                "pack_num": int(arrays['pack_nums'][i]),
+                "pick_num": int(arrays['pick_nums'][i])
+            }
+            for i in range(len(arrays['choices']))
+        ]
+
+        if not self.val_frozen and not self._val_complete() and self.rng.random() < self.val_fraction:
+            self.val_samples.extend(samples)
+            self.val_drafts_seen += 1
+        else:
+            for sample in samples:
+                self.samples_seen += 1
+                if len(self.buffer) < self.buffer_size:
+                    self.buffer.append(sample)
+                else:
+                    # Reservoir sampling: il buffer resta un campione uniforme di tutto ciò che è arrivato.
+                    slot = self.rng.randrange(self.samples_seen)
+                    if slot < self.buffer_size:
+                        self.buffer[slot] = sample
+
+        if self.shard_dir is not None:
+            self._pending_shard.append(arrays)
+            if len(self._pending_shard) >= self.shard_drafts:
+                self.flush_shard()
+
+    def flush_shard(self):
+        """Salva i draft ricevuti dall'ultimo shard come PackedDraftDataset."""
+        if not self._pending_shard:
+            return
+        drafts = self._pending_shard
+        tensors = {}
+        for key, offsets_key in (('pack_features', 'pack_offsets'), ('pool_features', 'pool_offsets')):
+            tensors[key] = torch.from_numpy(np.concatenate([d[key] for d in drafts]))
+            # Offset globali: quelli di ogni draft spostati del numero di righe precedenti.
+            offsets, start = [np.zeros(1, dtype=np.int64)], 0
+            for d in drafts:
+                offsets.append(d[offsets_key][1:] + start)
+                start += d[offsets_key][-1]
+            tensors[offsets_key] = torch.from_numpy(np.concatenate(offsets))
+        for key in ('pick_nums', 'pack_nums', 'choices'):
+            tensors[key] = torch.from_numpy(np.concatenate([d[key] for d in drafts]))
+        tensors['drafts'] = torch.from_numpy(np.concatenate([
+            np.full(len(d['choices']), i, dtype=np.int64) for i, d in enumerate(drafts)
+        ]))
+        PackedDraftDataset(tensors).save(self.shard_dir / f"shard_{self.shards_written:05d}.pt")
+        self.shards_written += 1
+        self._pending_shard = []
+
+    def close(self):
+        """Salva l'ultimo shard parziale e ferma i generatori ancora attivi."""
+        if self.shard_dir is not None:
+            self.flush_shard()
+        self.stream.close()
+
+
+def split_by_draft(dataset: Dataset, val_fraction: float, seed: int = 42) -> Tuple[Subset, Subset]:
+    """
+    Divide il dataset in train e validazione a livello di draft: tutti i pick
+    di uno stesso draft finiscono dalla stessa parte, così la validazione
+    non vede stati quasi identici a quelli usati in addestramento.
+    """
+    if not 0.0 <= val_fraction < 1.0:
+        raise ValueError(f"val_fraction deve essere in [0, 1), ricevuto: {val_fraction}")
+
+    sample_drafts = dataset.sample_drafts
+    draft_ids = sorted(set(sample_drafts))
+    random.Random(seed).shuffle(draft_ids)
+    num_val_drafts = int(round(len(draft_ids) * val_fraction))
+    # Con almeno due draft e una frazione positiva teniamo sempre un draft in validazione.
+    if val_fraction > 0 and num_val_drafts == 0 and len(draft_ids) > 1:
+        num_val_drafts = 1
+    val_drafts = set(draft_ids[:num_val_drafts])
+
+    train_indices, val_indices = [], []
+    for idx, draft_idx in enumerate(sample_drafts):
+        (val_indices if draft_idx in val_drafts else train_indices).append(idx)
+
+    return Subset(dataset, train_indices), Subset(dataset, val_indices)
+
+
 def custom_collate_fn(batch: List[Dict]) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
     """
     Funzione personalizzata per il DataLoader che gestisce il padding.
     """
     # Padding per i pack. Un pack non dovrebbe mai essere vuoto durante un pick valido.
+    # as_tensor accetta sia liste (DraftLogDataset) sia tensori (PackedDraftDataset).
     packs_padded = pad_sequence(
-        [torch.tensor(item['pack'], dtype=torch.float32) for item in batch], 
+        [torch.as_tensor(item['pack'], dtype=torch.float32) for item in batch], 
         batch_first=True, 
         padding_value=0.0
     )
@@ -59,7 +364,7 @@ def custom_collate_fn(batch: List[Dict]) -> Tuple[torch.Tensor, torch.Tensor, to
     # torch.tensor([]) crea un tensore 1D, causando un errore di dimensione.
     # Creiamo esplicitamente un tensore 2D di forma [0, FEATURE_SIZE] per i pool vuoti.
     pools_list = [
-        torch.tensor(item['pool'], dtype=torch.float32) if item['pool'] 
+        torch.as_tensor(item['pool'], dtype=torch.float32) if len(item['pool']) > 0
         else torch.empty(0, FEATURE_SIZE, dtype=torch.float32) 
         for item in batch
     ]
@@ -72,3 +377,49 @@ def custom_collate_fn(batch: List[Dict]) -> Tuple[torch.Tensor, torch.Tensor, to
     choices = torch.tensor([item['choice_index'] for item in batch], dtype=torch.long)
     
     return packs_padded, pools_padded, pick_numbers, choices
+
+
+# Colonne dei colori WUBRG all'inizio del vettore di CardEncoder (l'incolore 'C' resta fuori).
+NUM_COLOR_FEATURES = 5
+
+
+def permute_colors(packs: torch.Tensor, pools: torch.Tensor, probability: float = 1.0) -> None:
+    """
+    Augmentation sul batch già paddato: per ogni campione scambia le colonne
+    dei cinque colori con una permutazione casuale, la stessa per pack e pool,
+    così un draft bianco-blu diventa ad esempio rosso-verde con le stesse scelte.
+    Ogni campione viene permutato con probabilità 'probability'. Modifica i
+    tensori sul posto. Le feature di testo che citano simboli di mana (es. i
+    rituali) non vengono toccate.
+    """
+    batch_size = packs.size(0)
+    permutations = torch.argsort(torch.rand(batch_size, NUM_COLOR_FEATURES), dim=1)
+    if probability < 1.0:
+        unchanged = torch.rand(batch_size) >= probability
+        permutations[unchanged] = torch.arange(NUM_COLOR_FEATURES)
+    for tensor in (packs, pools):
+        if tensor.size(1) == 0:
+            continue
+        index = permutations[:, None, :].expand(-1, tensor.size(1), -1)
+        tensor[:, :, :NUM_COLOR_FEATURES] = tensor[:, :, :NUM_COLOR_FEATURES].gather(2, index)
+
+
+class ColorPermutationCollate:
+    """
+    custom_collate_fn seguita da permute_colors. È una classe e non una closure
+    perché i worker del DataLoader devono poterla serializzare; ogni worker usa
+    il proprio seme di torch, quindi le permutazioni sono diverse tra worker.
+    """
+    def __init__(self, probability: float = 1.0):
+        self.probability = probability
+
+    def __call__(self, batch: List[Dict]) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        packs, pools, pick_numbers, choices = custom_collate_fn(batch)
+        permute_colors(packs, pools, self.probability)
+        return packs, pools, pick_numbers, choices
+
+
+def train_collate_fn(train_config: Dict):
+    """Collate per il set di addestramento secondo training.augmentation (la validazione usa sempre custom_collate_fn)."""
+    probability = train_config.get('augmentation', {}).get('color_permutation_prob', 0.0)
+    return ColorPermutationCollate(probability) if probability > 0 else custom_collate_fn
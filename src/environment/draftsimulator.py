@@ -1,7 +1,10 @@
 import random
+import time
 from typing import List, Dict, Optional, Any
 
 from src.environment.draft import Card, DraftPack, Player
+from src.environment.draftstate import DraftState, RolloutTable
+from src.environment.simmetrics import SimulationMetrics
 from src.training.logger import DraftLogger
 
 class DraftSimulator:
@@ -18,7 +21,11 @@ class DraftSimulator:
         pack_size: int,
         num_packs: int,
         draft_id: Any,
-        logger: Optional[DraftLogger] = None
+        logger: Optional[DraftLogger] = None,
+        rng: Optional[random.Random] = None,
+        pack_rounds: Optional[List[List[List[Card]]]] = None,
+        metrics: Optional[SimulationMetrics] = None,
+        cube_name: Optional[str] = None
     ):
         if len(bots) != num_players:
             raise ValueError("Il numero di bot deve corrispondere al numero di giocatori.")
@@ -30,49 +37,123 @@ class DraftSimulator:
         self.num_packs = num_packs
         self.draft_id = draft_id
         self.logger = logger
+        # Nome del cubo, registrato nel log del draft.
+        self.cube_name = cube_name
+        # RNG esplicito per il mescolamento: con un seme fisso il draft è riproducibile.
+        # Senza, si usa il generatore globale del modulo random come prima.
+        self.rng = rng if rng is not None else random
         
+        # Buste pre-generate (vedi generate_pack_rounds): se presenti il draft le
+        # rigioca invece di crearne di nuove, così più draft vedono le stesse buste.
+        self.pack_rounds = pack_rounds
+
+        # Metriche opzionali (tempi dei pick per classe di bot, creazione buste, log).
+        # Senza, il ciclo del draft non prende nessun tempo.
+        self.metrics = metrics
+
         # MODIFICA: Assegna direttamente la lista di carte, senza conversioni
         self.full_cube = cube_list
         self.remaining_cards = list(self.full_cube)
 
-    def _create_packs(self) -> List[DraftPack]:
+        # Posizione corrente del draft (buste in mano, round, pick, giocatore che
+        # sta scegliendo): serve a snapshot() mentre un bot è dentro pick().
+        self.current_packs: List[DraftPack] = []
+        self.current_pack_number = 0
+        self.current_pick_number = 0
+        self.current_seat = 0
+
+        for bot in self.bots:
+            bot.bind_simulator(self)
+
+    @staticmethod
+    def generate_pack_rounds(
+        cube_list: List[Card],
+        num_players: int,
+        pack_size: int,
+        num_packs: int,
+        rng: random.Random
+    ) -> List[List[List[Card]]]:
+        """
+        Genera in anticipo le buste di tutti i round ([round][giocatore] -> carte).
+        Con lo stesso RNG il risultato è identico a quello che creerebbe un
+        DraftSimulator con rng=rng, ma si può riusare per più draft.
+        """
+        remaining_cards = list(cube_list)
+        cards_needed = num_players * pack_size
+        pack_rounds = []
+        for _ in range(num_packs):
+            if len(remaining_cards) < cards_needed:
+                raise ValueError(f"Carte insufficienti nel cubo ({len(remaining_cards)}) per un altro round ({cards_needed} necessarie).")
+            rng.shuffle(remaining_cards)
+            pack_rounds.append([[remaining_cards.pop() for _ in range(pack_size)] for _ in range(num_players)])
+        return pack_rounds
+
+    def _create_packs(self, pack_number: int = 1) -> List[DraftPack]:
         """Crea i pacchetti per un singolo round di draft."""
+        if self.pack_rounds is not None:
+            # Copie delle liste: i pick modificano le buste, le originali restano riusabili.
+            return [DraftPack(cards=list(cards)) for cards in self.pack_rounds[pack_number - 1]]
+
         packs = []
         cards_needed = self.num_players * self.pack_size
         if len(self.remaining_cards) < cards_needed:
             raise ValueError(f"Carte insufficienti nel cubo ({len(self.remaining_cards)}) per un altro round ({cards_needed} necessarie).")
         
-        random.shuffle(self.remaining_cards)
+        self.rng.shuffle(self.remaining_cards)
         
         for i in range(self.num_players):
             pack_cards = [self.remaining_cards.pop() for _ in range(self.pack_size)]
             packs.append(DraftPack(cards=pack_cards))
         return packs
 
+    def snapshot(self, table: RolloutTable) -> DraftState:
+        """Stato corrente del draft in array (vedi DraftState), da chiamare durante un pick."""
+        return DraftState.from_simulator(self, table)
+
     def run_draft(self, verbose: bool = False) -> Dict[int, Player]:
         """Esegue l'intera simulazione del draft."""
+        metrics = self.metrics
+        if metrics is not None:
+            draft_start = time.perf_counter()
+            bot_classes = [type(bot).__name__ for bot in self.bots]
+
         if self.logger:
-            self.logger.start_draft(self.draft_id)
+            self.logger.start_draft(self.draft_id, cube_name=self.cube_name)
                 
         for pack_number in range(1, self.num_packs + 1):
             if verbose: print(f"\n--- Inizio Round {pack_number}/{self.num_packs} ---")
             
-            current_packs = self._create_packs()
+            if metrics is not None:
+                start = time.perf_counter()
+            current_packs = self._create_packs(pack_number)
+            if metrics is not None:
+                metrics.pack_creation_seconds += time.perf_counter() - start
             
             for pick_number in range(1, self.pack_size + 1):
                 next_packs = [None] * self.num_players
+                self.current_packs = current_packs
+                self.current_pack_number = pack_number
+                self.current_pick_number = pick_number
                 
                 for i, player in enumerate(self.players):
+                    self.current_seat = i
                     bot = self.bots[i]
                     pack_for_player = current_packs[i]
                     
                     pack_before_pick = DraftPack(list(pack_for_player.cards))
                     pool_before_pick = list(player.pool)
                     
-                    chosen_card = bot.pick(pack_for_player, pack_number, pick_number)
+                    if metrics is not None:
+                        start = time.perf_counter()
+                        chosen_card = bot.pick(pack_for_player, pack_number, pick_number)
+                        metrics.record_pick(bot_classes[i], time.perf_counter() - start)
+                    else:
+                        chosen_card = bot.pick(pack_for_player, pack_number, pick_number)
                     pack_for_player.remove_card(chosen_card)
                     
                     if self.logger:
+                        if metrics is not None:
+                            start = time.perf_counter()
                         self.logger.log_pick(
                             draft_id=self.draft_id, player_id=player.player_id,
                             pack_num=pack_number, pick_num=pick_number,
@@ -80,6 +161,8 @@ class DraftSimulator:
                             pool=pool_before_pick,
                             choice=chosen_card
                         )
+                        if metrics is not None:
+                            metrics.logging_seconds += time.perf_counter() - start
                     
                     player.add_to_pool(chosen_card)
                     
@@ -90,7 +173,13 @@ class DraftSimulator:
                 current_packs = next_packs
 
         if self.logger:
+            if metrics is not None:
+                start = time.perf_counter()
             self.logger.save_draft_log(self.draft_id)
+            if metrics is not None:
+                metrics.logging_seconds += time.perf_counter() - start
 
+        if metrics is not None:
+            metrics.record_draft(time.perf_counter() - draft_start)
         if verbose: print(f"\n--- FINE DRAFT #{self.draft_id} ---\n")
         return {p.player_id: p for p in self.players}
\ No newline at end of file
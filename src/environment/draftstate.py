@@ -0,0 +1,269 @@
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+import numpy as np
+
+from src.environment.draft import Card
+from src.evaluation.deckanalyzer import DeckFeatureTable, greedy_deck_scores
+
+if TYPE_CHECKING:
+    from src.environment.draftsimulator import DraftSimulator
+
+
+class RolloutTable:
+    """
+    Le carte di un cubo come indici interi, con gli attributi che servono ai
+    rollout: punteggio base della carta (quello di ScoringBot), bitmask e
+    presenza dei colori, più la DeckFeatureTable per valutare i mazzi finali.
+
+    L'indice 'empty' (una riga in più in fondo a ogni array) è lo slot vuoto
+    di buste e pool: ha punteggio -inf e nessun colore, così nessuna
+    operazione vettorizzata ha bisogno di maschere.
+    """
+    def __init__(self, cube: List[Card], base_score: Callable[[Card], float]):
+        self.deck_table = DeckFeatureTable(cube)
+        num_cards = len(self.deck_table.cards)
+        self.empty = num_cards
+        self.index_by_name = self.deck_table.index_by_name
+
+        self.base_score = np.full(num_cards + 1, -np.inf, dtype=np.float32)
+        self.base_score[:num_cards] = [base_score(card) for card in self.deck_table.cards]
+        self.color_mask = np.append(self.deck_table.color_mask, 0)
+        self.color_presence = np.vstack([
+            np.minimum(self.deck_table.color_presence, 1),
+            np.zeros((1, 5), dtype=np.int64)
+        ])
+        # Copie di ogni carta nel cubo: le carte non ancora viste sono queste meno quelle note.
+        self.cube_counts = np.bincount(self.deck_table.indices(cube), minlength=num_cards + 1)
+        self._rounds_source = None
+        self._rounds = None
+
+    def index_rows(self, rows: List[List[Card]], length: int) -> np.ndarray:
+        """Liste di carte in una matrice [riga, posizione] di indici, con 'empty' come padding."""
+        matrix = np.full((len(rows), length), self.empty, dtype=np.int64)
+        for i, cards in enumerate(rows):
+            matrix[i, :len(cards)] = [self.index_by_name[card.name] for card in cards]
+        return matrix
+
+    def round_indices(self, pack_rounds: List[List[List[Card]]]) -> np.ndarray:
+        """Buste pre-generate ([round, giocatore, slot]); convertite una volta per draft."""
+        if self._rounds_source is not pack_rounds:
+            pack_size = max(len(cards) for packs in pack_rounds for cards in packs)
+            self._rounds = np.stack([self.index_rows(packs, pack_size) for packs in pack_rounds])
+            self._rounds.setflags(write=False)
+            self._rounds_source = pack_rounds
+        return self._rounds
+
+    def pool_scores(self, pools: np.ndarray) -> np.ndarray:
+        """final_score di evaluate_deck per una matrice [pool, carta] di indici."""
+        return greedy_deck_scores(self.deck_table, np.where(pools == self.empty, -1, pools))
+
+
+@dataclass
+class DraftState:
+    """
+    Stato di un draft in array di indici di una RolloutTable: buste in mano a
+    ogni giocatore, pool, carte per colore nei pool (tutto lo stato dei bot
+    dei rollout) e chi ha già scelto nel pick corrente.
+
+    Gli array possono avere un asse iniziale di "corsie" (vedi expand): ogni
+    corsia è un draft indipendente e i rollout le fanno avanzare tutte insieme.
+    Le buste dei round futuri sono condivise in sola lettura tra le copie;
+    fork() copia solo gli array piccoli che i pick modificano, pochi µs.
+    """
+    packs: np.ndarray                    # [giocatore, slot]
+    pools: np.ndarray                    # [giocatore, pick]
+    pool_sizes: np.ndarray               # [giocatore]
+    color_counts: np.ndarray             # [giocatore, colore]
+    picked: np.ndarray                   # [giocatore], ha già scelto in questo pick
+    pack_number: int
+    pick_number: int
+    num_packs: int
+    future_rounds: Optional[np.ndarray]  # [round, giocatore, slot], None se ancora da distribuire
+    undealt: Optional[np.ndarray]        # carte da cui pescare i round futuri se future_rounds è None
+
+    @classmethod
+    def from_simulator(cls, simulator: "DraftSimulator", table: RolloutTable) -> "DraftState":
+        """
+        Istantanea del draft in corso, presa mentre simulator.current_seat sta
+        scegliendo: i giocatori prima di lui nel pick corrente hanno già scelto.
+        """
+        num_players = simulator.num_players
+        packs = table.index_rows([pack.cards for pack in simulator.current_packs], simulator.pack_size)
+        pools = table.index_rows([player.pool for player in simulator.players], simulator.num_packs * simulator.pack_size)
+        pack_number = simulator.current_pack_number
+
+        future_rounds, undealt = None, None
+        if simulator.pack_rounds is not None:
+            future_rounds = table.round_indices(simulator.pack_rounds)[pack_number:]
+        else:
+            # Le carte non distribuite sono tutte quelle che non stanno né in una busta né in un pool.
+            seen = np.bincount(np.concatenate([packs.ravel(), pools.ravel()]), minlength=len(table.cube_counts))
+            undealt_counts = np.maximum(table.cube_counts - seen, 0)
+            undealt_counts[table.empty] = 0
+            undealt = np.repeat(np.arange(len(undealt_counts)), undealt_counts)
+
+        return cls(
+            packs=packs,
+            pools=pools,
+            pool_sizes=np.array([len(player.pool) for player in simulator.players], dtype=np.int64),
+            color_counts=table.color_presence[pools].sum(axis=-2),
+            picked=np.arange(num_players) < simulator.current_seat,
+            pack_number=pack_number,
+            pick_number=simulator.current_pick_number,
+            num_packs=simulator.num_packs,
+            future_rounds=future_rounds,
+            undealt=undealt
+        )
+
+    def fork(self) -> "DraftState":
+        """Copia indipendente: i round futuri restano condivisi (non vengono mai modificati)."""
+        return replace(
+            self,
+            packs=self.packs.copy(),
+            pools=self.pools.copy(),
+            pool_sizes=self.pool_sizes.copy(),
+            color_counts=self.color_counts.copy()
+        )
+
+    def expand(self, num_lanes: int, table: RolloutTable, rng: np.random.Generator, observer: Optional[int] = None) -> "DraftState":
+        """
+        'num_lanes' copie dello stato (uno stato senza asse delle corsie) in un
+        unico stato a corsie. I round futuri ancora da distribuire vengono pescati
+        a caso, indipendentemente per ogni corsia.
+
+        Con 'observer' ogni corsia vede solo quello che quel giocatore conosce:
+        la sua busta e il suo pool. Le buste e i pool degli altri e i round futuri
+        vengono ripescati (con le stesse dimensioni) dalle carte che non vede.
+        """
+        def lanes(array: np.ndarray) -> np.ndarray:
+            return np.repeat(array[None], num_lanes, axis=0)
+
+        packs, pools = lanes(self.packs), lanes(self.pools)
+        num_players, pack_size = self.packs.shape
+        rounds_left = self.num_packs - self.pack_number
+        future_shape = (num_lanes, rounds_left, num_players, pack_size)
+
+        if observer is None and self.future_rounds is not None:
+            future_rounds = np.broadcast_to(self.future_rounds, future_shape)
+        else:
+            if observer is None:
+                unseen = self.undealt
+                hidden_packs = np.zeros(self.packs.shape, dtype=bool)
+                hidden_pools = np.zeros(self.pools.shape, dtype=bool)
+            else:
+                known = np.concatenate([self.packs[observer], self.pools[observer]])
+                unknown_counts = np.maximum(table.cube_counts - np.bincount(known, minlength=len(table.cube_counts)), 0)
+                unknown_counts[table.empty] = 0
+                unseen = np.repeat(np.arange(len(unknown_counts)), unknown_counts)
+                others = np.arange(num_players) != observer
+                hidden_packs = (self.packs != table.empty) & others[:, None]
+                hidden_pools = (self.pools != table.empty) & others[:, None]
+
+            num_hidden_packs, num_hidden_pools = int(hidden_packs.sum()), int(hidden_pools.sum())
+            needed = num_hidden_packs + num_hidden_pools + rounds_left * num_players * pack_size
+            if len(unseen) < needed:
+                raise ValueError(f"Carte insufficienti ({len(unseen)}) per completare il draft ({needed} necessarie).")
+            drawn = rng.permuted(np.broadcast_to(unseen, (num_lanes, len(unseen))), axis=1)[:, :needed]
+            packs[:, hidden_packs] = drawn[:, :num_hidden_packs]
+            pools[:, hidden_pools] = drawn[:, num_hidden_packs:num_hidden_packs + num_hidden_pools]
+            future_rounds = drawn[:, num_hidden_packs + num_hidden_pools:].reshape(future_shape)
+
+        return replace(
+            self,
+            packs=packs,
+            pools=pools,
+            pool_sizes=lanes(self.pool_sizes),
+            color_counts=table.color_presence[pools].sum(axis=-2),
+            picked=lanes(self.picked),
+            future_rounds=future_rounds,
+            undealt=None
+        )
+
+
+class RolloutPolicy:
+    """
+    Avversari economici dei rollout: il punteggio base di ScoringBot più il
+    bonus/penalità di colore sui due colori principali del pool (dopo 5 carte),
+    senza curva né segnali. 'temperature' aggiunge rumore di Gumbel ai
+    punteggi, così rollout diversi seguono draft diversi.
+    """
+    def __init__(self, color_commitment: float = 3.0, splash_penalty: float = -5.0, temperature: float = 1.0):
+        self.temperature = temperature
+        # Bonus di colore per ogni coppia (bitmask colori principali, bitmask carta),
+        # appiattita in [principali * 32 + carta]: un solo gather per pick.
+        self.color_bonus = np.zeros(32 * 32, dtype=np.float32)
+        for main_mask in range(1, 32):
+            for card_mask in range(32):
+                if card_mask & ~main_mask == 0:
+                    self.color_bonus[main_mask * 32 + card_mask] = color_commitment
+                elif card_mask & main_mask == 0 and bin(main_mask).count("1") >= 2:
+                    self.color_bonus[main_mask * 32 + card_mask] = splash_penalty
+
+    def choices(self, state: DraftState, table: RolloutTable, rng: np.random.Generator) -> np.ndarray:
+        """Slot scelto da ogni giocatore di ogni corsia: [corsia, giocatore]."""
+        packs = state.packs
+
+        top_colors = np.argsort(-state.color_counts, axis=-1, kind='stable')[..., :2]
+        present = np.take_along_axis(state.color_counts, top_colors, axis=-1) > 0
+        main_mask = ((1 << top_colors) * present).sum(axis=-1) * (state.pool_sizes > 5)
+
+        scores = table.base_score[packs] + self.color_bonus[main_mask[..., None] * 32 + table.color_mask[packs]]
+        if self.temperature > 0:
+            # Gumbel(0, 1) = -log(-log(U)) con U in (0, 1).
+            uniform = rng.random(scores.shape, dtype=np.float32) + np.finfo(np.float32).tiny
+            scores -= self.temperature * np.log(-np.log(uniform))
+        return scores.argmax(axis=-1)
+
+
+def _apply_picks(state: DraftState, table: RolloutTable, slots: np.ndarray, active: np.ndarray):
+    """Ogni giocatore attivo prende la carta nel suo slot: dalla busta al pool."""
+    # Corsie e giocatori appiattiti in righe: due indici invece di tre.
+    rows = np.flatnonzero(active)
+    packs = state.packs.reshape(-1, state.packs.shape[-1])
+    pools = state.pools.reshape(-1, state.pools.shape[-1])
+    pool_sizes = state.pool_sizes.reshape(-1)
+    slot = slots.reshape(-1)[rows]
+    cards = packs[rows, slot]
+    packs[rows, slot] = table.empty
+    pools[rows, pool_sizes[rows]] = cards
+    pool_sizes[rows] += 1
+    state.color_counts.reshape(-1, 5)[rows] += table.color_presence[cards]
+
+
+def rollout_scores(
+    state: DraftState,
+    table: RolloutTable,
+    seat: int,
+    first_slots: np.ndarray,
+    policy: RolloutPolicy,
+    rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Porta a termine tutte le corsie di 'state' (modificandolo): nel pick
+    corrente 'seat' prende la carta in first_slots[corsia], poi tutti i
+    giocatori, 'seat' compreso, scelgono con 'policy'. Restituisce il
+    final_score di evaluate_deck del pool finale di 'seat' in ogni corsia.
+    """
+    num_lanes, num_players, pack_size = state.packs.shape
+    all_players = np.ones((num_lanes, num_players), dtype=bool)
+
+    for pack_number in range(state.pack_number, state.num_packs + 1):
+        first_pick = 1
+        if pack_number == state.pack_number:
+            first_pick = state.pick_number
+        else:
+            state.packs = state.future_rounds[:, pack_number - state.pack_number - 1].copy()
+        pass_direction = 1 if pack_number % 2 != 0 else -1
+
+        for pick_number in range(first_pick, pack_size + 1):
+            slots = policy.choices(state, table, rng)
+            active = all_players
+            if pack_number == state.pack_number and pick_number == first_pick:
+                slots[:, seat] = first_slots
+                active = ~state.picked
+            _apply_picks(state, table, slots, active)
+            # Il giocatore i passa al giocatore i - direzione, come in DraftSimulator.
+            state.packs = np.roll(state.packs, -pass_direction, axis=1)
+
+    return table.pool_scores(state.pools[:, seat])
@@ -1,14 +1,25 @@
 import random
-from typing import List, Dict
-import torch
+import time
+from typing import List, Dict, Optional, TYPE_CHECKING
 from pathlib import Path
 from collections import Counter # MODIFICA: Aggiunto l'import necessario per Counter
+import numpy as np
+import yaml
 
 # Importiamo i moduli interni
 from src.environment.draft import Card, DraftPack, Player
+from src.environment.draftstate import RolloutPolicy, RolloutTable, rollout_scores
 from src.features.cardencoders import CardEncoder
-from src.models.transformerdrafter import TransformerDrafter 
 from src.utils.config_loader import CONFIG
+from src.utils.lazyimport import lazy_import
+
+# torch e il modello servono solo ad AIBot: vengono importati al primo uso, così
+# chi simula draft con soli ScoringBot (es. la generazione dei log) non li carica.
+torch = lazy_import("torch")
+if TYPE_CHECKING:
+    from src.environment.draftsimulator import DraftSimulator
+    from src.models.pickcache import PickCache
+    from src.models.transformerdrafter import TransformerDrafter
 
 # Importa le costanti necessarie
 from src.utils.constants import (
@@ -19,6 +30,9 @@ from src.utils.constants import (
 class BaseBot:
     def __init__(self, player: Player):
         self.player = player
+    def bind_simulator(self, simulator: "DraftSimulator"):
+        """Chiamato da DraftSimulator prima del draft; i bot che ne leggono lo stato lo ridefiniscono."""
+        pass
     def pick(self, pack: DraftPack, pack_number: int, pick_number: int) -> Card:
         raise NotImplementedError("Il metodo 'pick' deve essere implementato da una sottoclasse.")
 
@@ -31,14 +45,82 @@ class RandomBot(BaseBot):
         return chosen_card
 
 
+# Pesi salvati dal tuning, letti al primo ScoringBot del processo.
+_SAVED_WEIGHTS: Optional[Dict[str, Dict[str, float]]] = None
+
+
+def load_scoring_weights() -> Dict[str, Dict[str, float]]:
+    """
+    Pesi di ScoringBot salvati dal tuning (scoring_bot.weights_path) se il file
+    esiste, altrimenti {} (i pesi scritti a mano). Letti una volta per processo.
+    """
+    global _SAVED_WEIGHTS
+    if _SAVED_WEIGHTS is None:
+        _SAVED_WEIGHTS = {}
+        weights_path = CONFIG.get('scoring_bot', {}).get('weights_path')
+        if weights_path:
+            path = Path(__file__).parent.parent.parent / weights_path
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    _SAVED_WEIGHTS = yaml.safe_load(f) or {}
+    return _SAVED_WEIGHTS
+
+
+# Prior per carta (nome -> prior già moltiplicato per il peso), letti al primo ScoringBot.
+_CARD_PRIORS: Optional[Dict[str, float]] = None
+
+
+def load_card_priors() -> Dict[str, float]:
+    """
+    Prior delle carte dalle statistiche dei log (scoring_bot.priors_path, vedi
+    buildcardstats.py) moltiplicati per scoring_bot.prior_weight; {} se
+    disattivati o se il file non esiste.
+    """
+    global _CARD_PRIORS
+    if _CARD_PRIORS is None:
+        _CARD_PRIORS = {}
+        bot_config = CONFIG.get('scoring_bot', {})
+        priors_path, prior_weight = bot_config.get('priors_path'), bot_config.get('prior_weight', 0.0)
+        if priors_path and prior_weight:
+            path = Path(__file__).parent.parent.parent / priors_path
+            if path.exists():
+                from src.data.cardstats import CardStatsTable
+                priors = CardStatsTable.load(path).prior_scores(min_seen=bot_config.get('priors_min_seen', 20))
+                _CARD_PRIORS = {name: prior_weight * prior for name, prior in priors.items()}
+    return _CARD_PRIORS
+
+
 class ScoringBot(BaseBot):
     """
     Versione "Maestro" evoluta. Valuta le carte considerando il segnale,
     la curva di mana e le sinergie del mazzo in costruzione.
+
+    Con le statistiche dei log attive (load_card_priors) al punteggio base si
+    somma il prior della carta.
+
+    I pesi sono quelli di DEFAULT_*_WEIGHTS, sovrascritti da quelli salvati dal
+    tuning (load_scoring_weights) o da 'weights' se passati. 'feature_cache'
+    (nome -> vettore di feature) si può condividere tra bot dello stesso
+    processo per non ricodificare le stesse carte a ogni pick.
     """
-    def __init__(self, player: Player):
+    DEFAULT_BASE_WEIGHTS = {
+        "removal": 2.5, "card_advantage": 2.2, "evasion": 1.5, "mana_advantage": 1.8,
+        "board_wipe": 3.0, "synergy_engine": 1.6, "combat_trick": 1.2, "recursion": 1.2
+    }
+    DEFAULT_CONTEXT_WEIGHTS = {
+        "color_commitment": 3.0, "splash_penalty": -5.0,
+        "curve_bonus": 1.5, "signal_bonus": 4.0
+    }
+
+    def __init__(
+        self,
+        player: Player,
+        weights: Optional[Dict[str, Dict[str, float]]] = None,
+        feature_cache: Optional[Dict[str, List[float]]] = None
+    ):
         super().__init__(player)
         self.encoder = CardEncoder()
+        self.feature_cache = feature_cache
 
         # Dizionari per accedere agli indici delle feature
         self.keyword_indices = {name.lower(): i for i, name in enumerate(KEYWORD_LIST)}
@@ -47,20 +129,25 @@ class ScoringBot(BaseBot):
         self.ability_offset = BASE_FEATURE_SIZE + len(KEYWORD_LIST)
 
         # Pesi per la valutazione
-        self.base_weights = {
-            "removal": 2.5, "card_advantage": 2.2, "evasion": 1.5, "mana_advantage": 1.8,
-            "board_wipe": 3.0, "synergy_engine": 1.6, "combat_trick": 1.2, "recursion": 1.2
-        }
-        self.context_weights = {
-            "color_commitment": 3.0, "splash_penalty": -5.0,
-            "curve_bonus": 1.5, "signal_bonus": 4.0
-        }
+        if weights is None:
+            weights = load_scoring_weights()
+        self.base_weights = {**self.DEFAULT_BASE_WEIGHTS, **weights.get('base_weights', {})}
+        self.context_weights = {**self.DEFAULT_CONTEXT_WEIGHTS, **weights.get('context_weights', {})}
+        self.card_priors = load_card_priors()
         
         # Stato interno del bot, correttamente inizializzato
         self.main_colors = set()
         self.color_commitment = Counter()
         self.mana_curve = Counter()
 
+    def _encode(self, card: Card) -> List[float]:
+        if self.feature_cache is None:
+            return self.encoder.encode_card(card.details)
+        features = self.feature_cache.get(card.name)
+        if features is None:
+            features = self.feature_cache[card.name] = self.encoder.encode_card(card.details)
+        return features
+
     def _get_feature(self, vec: List[float], f_type: str, f_name: str) -> int:
         """Helper robusto per ottenere il valore di una feature dal vettore."""
         try:
@@ -136,8 +223,10 @@ class ScoringBot(BaseBot):
         best_card, best_score = None, -999.0
 
         for card in pack.cards:
-            features = self.encoder.encode_card(card.details)
+            features = self._encode(card)
             base_score = self._calculate_base_score(features)
+            if self.card_priors:
+                base_score += self.card_priors.get(card.name, 0.0)
             context_bonus = self._calculate_contextual_bonuses(card, features, pick_number)
             final_score = base_score + context_bonus
 
@@ -148,24 +237,130 @@ class ScoringBot(BaseBot):
         return best_card
 
 
+class RolloutBot(BaseBot):
+    """
+    Bot con lookahead: per ogni carta della busta gioca molti rollout del resto
+    del draft (tutti i giocatori, lui compreso, scelgono con una RolloutPolicy
+    economica) e prende la carta con il punteggio medio di evaluate_deck più
+    alto sul pool finale.
+
+    I rollout partono da un'istantanea del simulatore (DraftSimulator.snapshot)
+    e girano come corsie vettorizzate: ogni lotto copre tutte le carte
+    candidate in parti uguali, e si lanciano lotti finché c'è tempo nel budget
+    del pick o si raggiungono 'max_rollouts' per carta. Con
+    perfect_information=False (default) ogni corsia ripesca a caso le buste e
+    i pool degli altri e i round futuri, come li conosce un giocatore vero;
+    con True i rollout vedono tutto, comprese le buste pre-generate.
+
+    Fuori da un DraftSimulator sceglie come ScoringBot.
+    """
+    def __init__(self, player: Player, rollout_config: Optional[Dict] = None, seed: Optional[int] = None):
+        super().__init__(player)
+        config = rollout_config if rollout_config is not None else CONFIG.get('rollout_bot', {})
+        self.scorer = ScoringBot(player)
+        self.policy = RolloutPolicy(
+            color_commitment=self.scorer.context_weights['color_commitment'],
+            splash_penalty=self.scorer.context_weights['splash_penalty'],
+            temperature=config.get('temperature', 1.0)
+        )
+        self.time_budget = config.get('time_budget_ms', 50) / 1000
+        self.lanes_per_batch = config.get('lanes_per_batch', 256)
+        self.min_rollouts = config.get('min_rollouts', 8)
+        self.max_rollouts = config.get('max_rollouts', 256)
+        self.perfect_information = config.get('perfect_information', False)
+        self.rng = np.random.default_rng(seed if seed is not None else config.get('seed'))
+        self.simulator = None
+        self.table = None
+        self._table_cube = None
+        # Rollout giocati per carta nell'ultimo pick e in tutti i pick con più
+        # candidate (per statistiche e benchmark).
+        self.last_rollouts = 0
+        self.rollout_history: List[int] = []
+
+    def bind_simulator(self, simulator: "DraftSimulator"):
+        self.simulator = simulator
+        # La tabella del cubo si ricostruisce solo se cambia il cubo.
+        if self._table_cube is not simulator.full_cube:
+            self.table = RolloutTable(simulator.full_cube, self._card_base_score)
+            self._table_cube = simulator.full_cube
+
+    def _card_base_score(self, card: Card) -> float:
+        base_score = self.scorer._calculate_base_score(self.scorer.encoder.encode_card(card.details))
+        return base_score + self.scorer.card_priors.get(card.name, 0.0)
+
+    def pick(self, pack: DraftPack, pack_number: int, pick_number: int) -> Card:
+        if self.simulator is None:
+            return self.scorer.pick(pack, pack_number, pick_number)
+
+        seat = self.simulator.current_seat
+        state = self.simulator.snapshot(self.table)
+        # Una sola candidata per carta distinta: le copie della stessa carta valgono uguale.
+        _, candidate_slots = np.unique(state.packs[seat][:len(pack.cards)], return_index=True)
+        if len(candidate_slots) == 1:
+            return pack.cards[candidate_slots[0]]
+
+        lanes_per_candidate = max(1, self.lanes_per_batch // len(candidate_slots))
+        first_slots = np.repeat(candidate_slots, lanes_per_candidate)
+        observer = None if self.perfect_information else seat
+        totals = np.zeros(len(candidate_slots))
+        rollouts = 0
+        deadline = time.perf_counter() + self.time_budget
+        while True:
+            lanes = state.expand(len(first_slots), self.table, self.rng, observer=observer)
+            scores = rollout_scores(lanes, self.table, seat, first_slots, self.policy, self.rng)
+            totals += scores.reshape(len(candidate_slots), lanes_per_candidate).sum(axis=1)
+            rollouts += lanes_per_candidate
+            if rollouts >= self.max_rollouts:
+                break
+            if rollouts >= self.min_rollouts and time.perf_counter() >= deadline:
+                break
+
+        self.last_rollouts = rollouts
+        self.rollout_history.append(rollouts)
+        return pack.cards[candidate_slots[np.argmax(totals)]]
+
+
+def load_drafter_model(model_path: Path, device: str) -> "TransformerDrafter":
+    """Carica un TransformerDrafter addestrato, pronto per l'inferenza."""
+    from src.models.transformerdrafter import TransformerDrafter
+    model = TransformerDrafter(
+        config=CONFIG['model'],
+        feature_size=FEATURE_SIZE
+    )
+    model.load_state_dict(torch.load(model_path, map_location=device))
+    model.to(device)
+    model.eval()
+    return model
+
+
 class AIBot(BaseBot):
-    """Un bot che usa il modello Transformer addestrato per fare le sue scelte."""
-    def __init__(self, player: Player, model_path: Path):
+    """
+    Un bot che usa il modello Transformer addestrato per fare le sue scelte.
+    Con una PickCache (legata allo stesso modello) gli stati già visti, anche con
+    le carte in un altro ordine, non richiedono una nuova forward.
+    """
+    def __init__(
+        self,
+        player: Player,
+        model_path: Optional[Path] = None,
+        model: Optional["TransformerDrafter"] = None,
+        cache: Optional["PickCache"] = None
+    ):
         super().__init__(player)
+        self.cache = cache
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         
         model_config = CONFIG['model']
         
-        # MODIFICA: Inizializza il modello usando il dizionario di configurazione,
-        # allineandosi con la versione più recente di TransformerDrafter.
-        self.model = TransformerDrafter(
-            config=model_config,
-            feature_size=FEATURE_SIZE
-        )
-        
-        self.model.load_state_dict(torch.load(model_path, map_location=self.device))
-        self.model.to(self.device)
-        self.model.eval()
+        # Si può passare un modello già caricato, così chi simula molti draft
+        # (es. i worker di valutazione) legge i pesi dal disco una volta sola.
+        if model is not None:
+            self.model = model
+            self.device = next(model.parameters()).device
+        elif model_path is not None:
+            self.model = load_drafter_model(model_path, self.device)
+        else:
+            raise ValueError("AIBot richiede 'model_path' oppure un 'model' già caricato.")
 
         self.encoder = CardEncoder()
         self.max_pool_size = model_config['max_pool_size']
@@ -199,6 +394,13 @@ class AIBot(BaseBot):
         if not pack.cards:
             raise ValueError("Il pacchetto è vuoto, impossibile fare una scelta.")
 
+        if self.cache is not None:
+            pack_names = [c.name for c in pack.cards]
+            pool_names = [c.name for c in self.player.pool]
+            cached_idx = self.cache.get_choice(pack_names, pool_names, pick_number)
+            if cached_idx is not None:
+                return pack.cards[cached_idx]
+
         pack_tensor, pool_tensor, pick_tensor = self._prepare_tensors(pack, pick_number)
 
         with torch.no_grad():
@@ -211,5 +413,7 @@ class AIBot(BaseBot):
         scores[num_real_cards:] = -float('inf')
 
         best_card_idx = torch.argmax(scores).item()
-            
+        if self.cache is not None:
+            self.cache.put(pack_names, pool_names, pick_number, scores[:num_real_cards].tolist())
+
         return pack.cards[best_card_idx]
\ No newline at end of file
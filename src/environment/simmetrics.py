@@ -0,0 +1,205 @@
+import json
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Limiti superiori (in secondi) dei bucket degli istogrammi di latenza, in scala
+# logaritmica da 10 µs a 10 s. Sono fissi, così gli istogrammi di processi
+# diversi si sommano bucket per bucket.
+LATENCY_BUCKETS = [
+    scale * 10.0 ** exponent
+    for exponent in range(-5, 1)
+    for scale in (1.0, 2.5, 5.0)
+] + [10.0]
+
+
+class LatencyHistogram:
+    """Istogramma delle latenze con bucket fissi (LATENCY_BUCKETS) più somma e conteggio."""
+    def __init__(self):
+        # Un bucket in più per i valori oltre l'ultimo limite.
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def merge(self, other: "LatencyHistogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.count += other.count
+
+    def quantile(self, fraction: float) -> float:
+        """Stima del quantile: il limite superiore del bucket che lo contiene."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        cumulative = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS + [float('inf')], self.counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+    def to_dict(self) -> Dict:
+        return {"counts": list(self.counts), "total": self.total, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = list(data["counts"])
+        histogram.total = data["total"]
+        histogram.count = data["count"]
+        return histogram
+
+
+class SimulationMetrics:
+    """
+    Metriche di simulazione raccolte da DraftSimulator quando gliene si passa
+    un'istanza: draft e pick eseguiti, tempo totale dei draft, tempo speso a
+    creare le buste e a registrare i log, e un istogramma delle latenze di
+    pick() per ogni classe di bot.
+
+    Le metriche di più processi si uniscono con merge() (to_dict/from_dict per
+    passarle tra processi) e si esportano come JSON o testo Prometheus.
+    """
+    def __init__(self):
+        self.drafts = 0
+        self.picks = 0
+        self.draft_seconds = 0.0
+        self.pack_creation_seconds = 0.0
+        self.logging_seconds = 0.0
+        self.pick_latency: Dict[str, LatencyHistogram] = {}
+
+    def record_pick(self, bot_class: str, seconds: float):
+        histogram = self.pick_latency.get(bot_class)
+        if histogram is None:
+            histogram = self.pick_latency[bot_class] = LatencyHistogram()
+        histogram.observe(seconds)
+        self.picks += 1
+
+    def record_draft(self, seconds: float):
+        self.drafts += 1
+        self.draft_seconds += seconds
+
+    def merge(self, other: "SimulationMetrics") -> "SimulationMetrics":
+        self.drafts += other.drafts
+        self.picks += other.picks
+        self.draft_seconds += other.draft_seconds
+        self.pack_creation_seconds += other.pack_creation_seconds
+        self.logging_seconds += other.logging_seconds
+        for bot_class, histogram in other.pick_latency.items():
+            self.pick_latency.setdefault(bot_class, LatencyHistogram()).merge(histogram)
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            "drafts": self.drafts,
+            "picks": self.picks,
+            "draft_seconds": self.draft_seconds,
+            "pack_creation_seconds": self.pack_creation_seconds,
+            "logging_seconds": self.logging_seconds,
+            "pick_latency": {name: histogram.to_dict() for name, histogram in self.pick_latency.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SimulationMetrics":
+        metrics = cls()
+        for key in ("drafts", "picks", "draft_seconds", "pack_creation_seconds", "logging_seconds"):
+            setattr(metrics, key, data[key])
+        metrics.pick_latency = {name: LatencyHistogram.from_dict(h) for name, h in data["pick_latency"].items()}
+        return metrics
+
+    def summary(self, wall_seconds: Optional[float] = None) -> Dict:
+        """
+        Riepilogo leggibile. Picks/s e draft/s sono per processo (sul tempo
+        passato nei draft); con 'wall_seconds' si aggiunge il throughput
+        complessivo di tutti i processi.
+        """
+        def rate(count: float, seconds: float) -> float:
+            return count / seconds if seconds > 0 else 0.0
+
+        pick_seconds = sum(h.total for h in self.pick_latency.values())
+        summary = {
+            "drafts": self.drafts,
+            "picks": self.picks,
+            "drafts_per_sec": rate(self.drafts, self.draft_seconds),
+            "picks_per_sec": rate(self.picks, self.draft_seconds),
+            "draft_seconds": self.draft_seconds,
+            "pack_creation_seconds": self.pack_creation_seconds,
+            "logging_seconds": self.logging_seconds,
+            "bots": {
+                name: {
+                    "picks": h.count,
+                    "mean_ms": h.total / h.count * 1000 if h.count else 0.0,
+                    "p50_ms": h.quantile(0.50) * 1000,
+                    "p95_ms": h.quantile(0.95) * 1000,
+                    "p99_ms": h.quantile(0.99) * 1000,
+                    # Quota del tempo dei pick spesa da questa classe di bot.
+                    "share_of_pick_time": h.total / pick_seconds if pick_seconds > 0 else 0.0
+                }
+                for name, h in sorted(self.pick_latency.items())
+            }
+        }
+        if wall_seconds:
+            summary.update(
+                wall_seconds=wall_seconds,
+                wall_drafts_per_sec=rate(self.drafts, wall_seconds),
+                wall_picks_per_sec=rate(self.picks, wall_seconds)
+            )
+        return summary
+
+    def prometheus_text(self, prefix: str = "draft_sim") -> str:
+        """Metriche nel formato testuale di Prometheus (per node_exporter textfile o pushgateway)."""
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, value: float):
+            lines.extend([f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} {kind}",
+                          f"{prefix}_{name} {value}"])
+
+        metric("drafts_total", "counter", "Draft simulati.", self.drafts)
+        metric("picks_total", "counter", "Pick eseguiti.", self.picks)
+        metric("draft_seconds_total", "counter", "Tempo totale passato nei draft.", self.draft_seconds)
+        metric("pack_creation_seconds_total", "counter", "Tempo speso a creare le buste.", self.pack_creation_seconds)
+        metric("logging_seconds_total", "counter", "Tempo speso a registrare e salvare i log.", self.logging_seconds)
+
+        name = f"{prefix}_pick_seconds"
+        lines.extend([f"# HELP {name} Latenza di pick() per classe di bot.", f"# TYPE {name} histogram"])
+        for bot_class, histogram in sorted(self.pick_latency.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{bot="{bot_class}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{bot="{bot_class}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{bot="{bot_class}"}} {histogram.total}')
+            lines.append(f'{name}_count{{bot="{bot_class}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: Path, wall_seconds: Optional[float] = None):
+        """Salva le metriche: testo Prometheus se il file finisce in .prom, altrimenti JSON."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == ".prom":
+            path.write_text(self.prometheus_text(), encoding='utf-8')
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"summary": self.summary(wall_seconds), "raw": self.to_dict()}, f, indent=2)
+
+
+def format_metrics_report(summary: Dict) -> str:
+    """Tabella testuale del riepilogo di SimulationMetrics.summary()."""
+    lines = [
+        f"Draft: {summary['drafts']} ({summary['drafts_per_sec']:.2f}/s per processo), "
+        f"pick: {summary['picks']} ({summary['picks_per_sec']:.1f}/s per processo)"
+    ]
+    if 'wall_seconds' in summary:
+        lines.append(f"Throughput complessivo: {summary['wall_drafts_per_sec']:.2f} draft/s, "
+                     f"{summary['wall_picks_per_sec']:.1f} pick/s")
+    lines.append(f"Creazione buste: {summary['pack_creation_seconds']:.2f} s, "
+                 f"log: {summary['logging_seconds']:.2f} s su {summary['draft_seconds']:.2f} s di draft")
+    lines.append(f"{'Bot':<14} | {'Pick':>8} | {'Media (ms)':>10} | {'p50 (ms)':>8} | {'p95 (ms)':>8} | {'Quota':>6}")
+    for name, bot in summary['bots'].items():
+        lines.append(f"{name:<14} | {bot['picks']:>8} | {bot['mean_ms']:>10.3f} | {bot['p50_ms']:>8.3f} | "
+                     f"{bot['p95_ms']:>8.3f} | {bot['share_of_pick_time']:>6.1%}")
+    return "\n".join(lines)
@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from collections import Counter
 import numpy as np
 
@@ -6,18 +6,27 @@ from src.environment.draft import Card
 from src.features.cardencoders import CardEncoder
 from src.utils.constants import KEYWORD_LIST, ABILITY_PATTERNS, BASE_FEATURE_SIZE
 
+# Indici delle feature calcolati una volta sola (prima venivano ricostruiti a ogni lookup).
+_KEYWORD_INDICES = {name.lower(): i for i, name in enumerate(KEYWORD_LIST)}
+_ABILITY_INDICES = {name: i for i, name in enumerate(ABILITY_PATTERNS.keys())}
+_KEYWORD_OFFSET = BASE_FEATURE_SIZE
+_ABILITY_OFFSET = BASE_FEATURE_SIZE + len(KEYWORD_LIST)
+
+# Abilità che fanno contare una carta come "risposta" nel mazzo.
+ANSWER_ABILITIES = ['destroy_creature', 'exile_permanent', 'board_wipe_damage', 'counter_spell_hard']
+DECK_SIZE = 23
+COLOR_ORDER = "WUBRG"
+
+_ENCODER = CardEncoder()
+
 # Helper per decodificare le feature all'interno di questo modulo,
 # replicando la logica di ScoringBot per coerenza.
 def _get_feature_from_vec(vec: List[float], f_type: str, f_name: str) -> int:
-    keyword_indices = {name.lower(): i for i, name in enumerate(KEYWORD_LIST)}
-    ability_indices = {name: i for i, name in enumerate(ABILITY_PATTERNS.keys())}
-    keyword_offset = BASE_FEATURE_SIZE
-    ability_offset = BASE_FEATURE_SIZE + len(KEYWORD_LIST)
     try:
         if f_type == 'keyword':
-            idx = keyword_offset + keyword_indices[f_name.lower()]
+            idx = _KEYWORD_OFFSET + _KEYWORD_INDICES[f_name.lower()]
         elif f_type == 'ability':
-            idx = ability_offset + ability_indices[f_name]
+            idx = _ABILITY_OFFSET + _ABILITY_INDICES[f_name]
         else: return 0
         if 0 <= idx < len(vec): return int(vec[idx])
         return 0
@@ -44,7 +53,7 @@ def evaluate_deck(card_pool: List[Card]) -> Dict[str, float]:
         return {"final_score": 0, "avg_cmc": 99, "creature_count": 0, "threat_density": 0, "answer_density": 0, "mana_consistency": 0}
 
     # FASE 2: Calcolare le metriche sul mazzo costruito
-    encoder = CardEncoder()
+    encoder = _ENCODER
     creature_count = sum(1 for c in deck_cards if "Creature" in c.details.get('type_line', ''))
     threat_density = (creature_count / 23) * 100
 
@@ -73,4 +82,332 @@ def evaluate_deck(card_pool: List[Card]) -> Dict[str, float]:
         "final_score": round(final_score, 2), "avg_cmc": round(avg_cmc, 2),
         "creature_count": int(creature_count), "threat_density": round(threat_density, 2),
         "answer_density": round(answer_density, 2), "mana_consistency": round(mana_consistency * 100, 2)
-    }
\ No newline at end of file
+    }
+
+
+def _empty_deck_metrics() -> Dict[str, float]:
+    return {"final_score": 0, "avg_cmc": 99, "creature_count": 0, "threat_density": 0, "answer_density": 0, "mana_consistency": 0}
+
+
+class DeckFeatureTable:
+    """
+    Attributi precalcolati delle carte (un array per attributo, una riga per nome)
+    usati da evaluate_decks_batch e build_best_decks. Si costruisce una volta per
+    cubo e si riusa per tutti i pool, invece di ricodificare ogni carta a ogni valutazione.
+    """
+    def __init__(self, cards: List[Card]):
+        self.index_by_name: Dict[str, int] = {}
+        self.cards: List[Card] = []
+        for card in cards:
+            if card.name not in self.index_by_name:
+                self.index_by_name[card.name] = len(self.cards)
+                self.cards.append(card)
+
+        num_cards = len(self.cards)
+        # Presenza di ogni colore in 'colors' e posizione del colore nella lista:
+        # serve per replicare lo spareggio di Counter.most_common (ordine di inserimento).
+        self.color_presence = np.zeros((num_cards, 5), dtype=np.int64)
+        self.color_position = np.full((num_cards, 5), 99, dtype=np.int64)
+        # Bitmask dei colori (bit c = COLOR_ORDER[c]): "giocabile in X" diventa mask & ~X == 0.
+        self.color_mask = np.zeros(num_cards, dtype=np.int64)
+        # Carte con colori fuori da WUBRG non sono mai giocabili (come set.issubset).
+        self.has_foreign_color = np.zeros(num_cards, dtype=bool)
+        self.num_colors = np.zeros(num_cards, dtype=np.int64)
+        self.sort_cmc = np.zeros(num_cards, dtype=np.float64)
+        self.cmc = np.zeros(num_cards, dtype=np.float64)
+        self.is_creature = np.zeros(num_cards, dtype=np.int64)
+        self.is_answer = np.zeros(num_cards, dtype=np.int64)
+        self.mana_symbols = np.zeros((num_cards, 5), dtype=np.int64)
+
+        for i, card in enumerate(self.cards):
+            details = card.details
+            colors = details.get('colors') or []
+            for position, color in enumerate(colors):
+                if color in COLOR_ORDER:
+                    c = COLOR_ORDER.index(color)
+                    self.color_presence[i, c] += 1
+                    self.color_position[i, c] = min(self.color_position[i, c], position)
+                    self.color_mask[i] |= 1 << c
+                else:
+                    self.has_foreign_color[i] = True
+            self.num_colors[i] = len(details.get('colors', []))
+            self.sort_cmc[i] = details.get('cmc', 99)
+            self.cmc[i] = details.get('cmc', 0)
+            self.is_creature[i] = "Creature" in details.get('type_line', '')
+            features = _ENCODER.encode_card(details)
+            self.is_answer[i] = any(_get_feature_from_vec(features, 'ability', name) > 0 for name in ANSWER_ABILITIES)
+            mana_cost = details.get('mana_cost', '')
+            for c, color in enumerate(COLOR_ORDER):
+                self.mana_symbols[i, c] = mana_cost.count(color)
+
+        # Valore approssimato di ogni carta per la scelta delle 23 (usato da build_best_decks):
+        # il contributo lineare della carta alle componenti del punteggio finale.
+        self.card_value = (
+            self.is_creature * (0.3 * 100 / DECK_SIZE)
+            + self.is_answer * (0.5 * 100 / DECK_SIZE)
+            - self.cmc * (2 / DECK_SIZE)
+        )
+
+    def indices(self, pool: List[Card]) -> List[int]:
+        return [self.index_by_name[card.name] for card in pool]
+
+    def index_matrix(self, pools: List[List[Card]]) -> np.ndarray:
+        """Matrice [pool, posizione] degli indici delle carte, con -1 come padding."""
+        max_len = max((len(pool) for pool in pools), default=0)
+        idx = np.full((len(pools), max_len), -1, dtype=np.int64)
+        for row, pool in enumerate(pools):
+            idx[row, :len(pool)] = self.indices(pool)
+        return idx
+
+
+def _score_decks(table: DeckFeatureTable, deck_idx: np.ndarray, in_deck: np.ndarray, main_mask: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Calcola le metriche di evaluate_deck (FASE 2 e 3) per molti mazzi insieme.
+    deck_idx/in_deck: [mazzo, slot]; main_mask: bitmask dei colori principali per mazzo.
+    """
+    creature_counts = (table.is_creature[deck_idx] * in_deck).sum(axis=1)
+    answer_counts = (table.is_answer[deck_idx] * in_deck).sum(axis=1)
+    symbols = (table.mana_symbols[deck_idx] * in_deck[..., None]).sum(axis=1)
+    total_symbols = symbols.sum(axis=1)
+    main_colors = (main_mask[:, None] >> np.arange(5)) & 1
+    main_symbols = (symbols * main_colors).sum(axis=1)
+
+    deck_cmc = table.cmc[deck_idx]
+    has_cmc = in_deck & (deck_cmc > 0)
+    # Media e deviazione standard raggruppando i mazzi per numero di carte con cmc > 0:
+    # su righe della stessa lunghezza numpy somma nello stesso ordine di evaluate_deck.
+    cmc_counts = has_cmc.sum(axis=1)
+    avg_cmc = np.zeros(len(deck_idx))
+    cmc_std = np.zeros(len(deck_idx))
+    for n in np.unique(cmc_counts):
+        if n == 0:
+            continue
+        group = np.nonzero(cmc_counts == n)[0]
+        group_values = deck_cmc[group][has_cmc[group]].reshape(len(group), n)
+        avg_cmc[group] = np.mean(group_values, axis=1)
+        cmc_std[group] = np.std(group_values, axis=1)
+
+    threat_density = (creature_counts / DECK_SIZE) * 100
+    answer_density = (answer_counts / DECK_SIZE) * 100
+    mana_consistency = np.divide(main_symbols, total_symbols, out=np.zeros(len(deck_idx)), where=total_symbols > 0)
+    curve_consistency = np.where(cmc_counts > 0, 1 / (1 + cmc_std), 0)
+    final_score = ((threat_density * 0.3) + (answer_density * 0.5) + (curve_consistency * 15) + (mana_consistency * 25) - (avg_cmc * 2))
+    # Un mazzo senza carte vale 0, come in evaluate_deck.
+    final_score = np.where(in_deck.any(axis=1), final_score, 0)
+
+    return {
+        "creature_counts": creature_counts, "answer_counts": answer_counts,
+        "total_symbols": total_symbols, "main_symbols": main_symbols,
+        "cmc_counts": cmc_counts, "avg_cmc": avg_cmc, "cmc_std": cmc_std,
+        "final_score": final_score
+    }
+
+
+def _format_deck_metrics(metrics: Dict[str, np.ndarray], row: int) -> Dict[str, float]:
+    """Costruisce il dizionario di evaluate_deck per un mazzo, con gli stessi tipi e arrotondamenti."""
+    creature_count = int(metrics['creature_counts'][row])
+    threat_density = (creature_count / DECK_SIZE) * 100
+    answer_density = (int(metrics['answer_counts'][row]) / DECK_SIZE) * 100
+    total = int(metrics['total_symbols'][row])
+    mana_consistency = int(metrics['main_symbols'][row]) / total if total > 0 else 0
+    if metrics['cmc_counts'][row] > 0:
+        # Come in evaluate_deck, media e curva sono np.float64 e si arrotondano con numpy.
+        avg_cmc = np.float64(metrics['avg_cmc'][row])
+        curve_consistency = 1 / (1 + np.float64(metrics['cmc_std'][row]))
+    else:
+        avg_cmc, curve_consistency = 0, 0
+
+    final_score = ((threat_density * 0.3) + (answer_density * 0.5) + (curve_consistency * 15) + (mana_consistency * 25) - (avg_cmc * 2))
+    return {
+        "final_score": round(final_score, 2), "avg_cmc": round(avg_cmc, 2),
+        "creature_count": creature_count, "threat_density": round(threat_density, 2),
+        "answer_density": round(answer_density, 2), "mana_consistency": round(mana_consistency * 100, 2)
+    }
+
+
+def _build_greedy_decks(table: DeckFeatureTable, idx: np.ndarray):
+    """
+    Costruzione dei mazzi di evaluate_deck su una matrice di indici di 'table'
+    (una riga per pool, -1 = nessuna carta): indici delle 23 carte, carte
+    effettivamente nel mazzo e bitmask dei due colori principali.
+    """
+    valid = idx >= 0
+    safe_idx = np.where(valid, idx, 0)
+    positions = np.arange(idx.shape[1])
+
+    # FASE 1: i due colori principali, con lo stesso spareggio di Counter.most_common(2).
+    presence = table.color_presence[safe_idx] * valid[..., None]
+    color_counts = presence.sum(axis=1)
+    first_seen_key = np.where(presence > 0, positions[None, :, None] * 100 + table.color_position[safe_idx], np.iinfo(np.int64).max)
+    first_seen = first_seen_key.min(axis=1)
+    color_rank = np.lexsort((first_seen, -color_counts), axis=1)[:, :2]
+    is_main = np.take_along_axis(color_counts, color_rank, axis=1) > 0
+    main_mask = ((1 << color_rank) * is_main).sum(axis=1)
+
+    playable = valid & ((table.color_mask[safe_idx] & ~main_mask[:, None]) == 0) & ~table.has_foreign_color[safe_idx]
+
+    # Ordinamento stabile come playables.sort(key=(-num_colori, cmc)), poi le prime 23.
+    order = np.lexsort((
+        np.broadcast_to(positions, idx.shape),
+        table.sort_cmc[safe_idx],
+        -table.num_colors[safe_idx],
+        ~playable
+    ), axis=1)[:, :DECK_SIZE]
+    deck_idx = np.take_along_axis(safe_idx, order, axis=1)
+    in_deck = np.take_along_axis(playable, order, axis=1)
+
+    return deck_idx, in_deck, main_mask
+
+
+def evaluate_decks_batch(pools: List[List[Card]], table: Optional[DeckFeatureTable] = None) -> List[Dict[str, float]]:
+    """
+    Versione vettorizzata di evaluate_deck per molti pool in una volta (es. gli 8
+    giocatori di un draft). Restituisce esattamente gli stessi valori di
+    evaluate_deck, pool per pool, usando conteggi su array precalcolati.
+    """
+    if table is None:
+        table = DeckFeatureTable([card for pool in pools for card in pool])
+
+    results: List[Optional[Dict[str, float]]] = [None] * len(pools)
+    active = []
+    for i, pool in enumerate(pools):
+        if pool and len(pool) >= DECK_SIZE:
+            active.append(i)
+        else:
+            results[i] = _empty_deck_metrics()
+    if not active:
+        return results
+
+    deck_idx, in_deck, main_mask = _build_greedy_decks(table, table.index_matrix([pools[i] for i in active]))
+
+    # FASE 2 e 3: metriche sul mazzo costruito.
+    metrics = _score_decks(table, deck_idx, in_deck, main_mask)
+    for row, i in enumerate(active):
+        if not in_deck[row].any():
+            results[i] = _empty_deck_metrics()
+        else:
+            results[i] = _format_deck_metrics(metrics, row)
+    return results
+
+
+def greedy_deck_scores(table: DeckFeatureTable, idx: np.ndarray) -> np.ndarray:
+    """
+    Solo il final_score di evaluate_deck (non arrotondato) per pool già espressi
+    come indici di 'table' (-1 = nessuna carta): serve a chi valuta migliaia di
+    pool senza passare da liste di Card, come i rollout di RolloutBot.
+    """
+    scores = np.zeros(len(idx))
+    active = (idx >= 0).sum(axis=1) >= DECK_SIZE
+    if active.any():
+        deck_idx, in_deck, main_mask = _build_greedy_decks(table, idx[active])
+        scores[active] = _score_decks(table, deck_idx, in_deck, main_mask)['final_score']
+    return scores
+
+
+# Coppie di colori (come bitmask) considerate dal costruttore di mazzi esaustivo.
+COLOR_PAIRS = [(1 << a) | (1 << b) for a in range(5) for b in range(a + 1, 5)]
+
+
+def _deck_configurations(allow_splash: bool) -> List[tuple]:
+    """Configurazioni (bitmask coppia, bitmask splash): 10 coppie, più 30 splash opzionali."""
+    configurations = [(pair, 0) for pair in COLOR_PAIRS]
+    if allow_splash:
+        configurations += [(pair, 1 << c) for pair in COLOR_PAIRS for c in range(5) if not pair & (1 << c)]
+    return configurations
+
+
+def build_best_decks(
+    pools: List[List[Card]],
+    table: Optional[DeckFeatureTable] = None,
+    allow_splash: bool = True,
+    max_splash_cards: int = 3
+) -> List[Dict]:
+    """
+    Costruttore di mazzi esaustivo: per ogni pool prova tutte le coppie di colori
+    (e, se richiesto, ogni coppia con lo splash di un terzo colore limitato a
+    'max_splash_cards' carte), sceglie le 23 carte migliori di ogni configurazione
+    con un top-k vettorizzato sul valore precalcolato delle carte, valuta ogni
+    mazzo con le metriche di evaluate_deck e tiene la configurazione migliore.
+
+    Restituisce per ogni pool le metriche (stesse chiavi di evaluate_deck) più
+    'main_colors', 'splash_color' e 'deck' (le carte scelte).
+    """
+    if table is None:
+        table = DeckFeatureTable([card for pool in pools for card in pool])
+
+    results: List[Optional[Dict]] = [None] * len(pools)
+    active = []
+    for i, pool in enumerate(pools):
+        if pool and len(pool) >= DECK_SIZE:
+            active.append(i)
+        else:
+            results[i] = {**_empty_deck_metrics(), "main_colors": "", "splash_color": "", "deck": []}
+    if not active:
+        return results
+
+    idx = table.index_matrix([pools[i] for i in active])
+    safe_idx = np.where(idx >= 0, idx, 0)
+    valid = (idx >= 0) & ~table.has_foreign_color[safe_idx]
+    num_pools, pool_len = idx.shape
+
+    # Le carte di ogni pool vengono ordinate una sola volta per valore decrescente
+    # (a parità: cmc più basso, poi ordine nel pool); tutte le configurazioni
+    # condividono questo ordine e il top-k diventa un cumsum.
+    positions = np.broadcast_to(np.arange(pool_len), idx.shape)
+    order = np.lexsort((positions, table.sort_cmc[safe_idx], -table.card_value[safe_idx], ~valid), axis=1)
+    sorted_idx = np.take_along_axis(safe_idx, order, axis=1)
+    sorted_valid = np.take_along_axis(valid, order, axis=1)
+    sorted_masks = table.color_mask[sorted_idx]
+
+    configurations = _deck_configurations(allow_splash)
+    pair_masks = np.array([pair for pair, _ in configurations], dtype=np.int64)
+    splash_masks = np.array([splash for _, splash in configurations], dtype=np.int64)
+
+    # [pool, configurazione, carta]
+    card_masks = sorted_masks[:, None, :]
+    on_pair = (card_masks & ~pair_masks[None, :, None]) == 0
+    is_splash = ~on_pair & (splash_masks[None, :, None] > 0) & ((card_masks & ~(pair_masks | splash_masks)[None, :, None]) == 0)
+    splash_rank = np.cumsum(is_splash, axis=2)
+    eligible = sorted_valid[:, None, :] & (on_pair | (is_splash & (splash_rank <= max_splash_cards)))
+    taken = eligible & (np.cumsum(eligible, axis=2) <= DECK_SIZE)
+
+    # Compatta le carte prese in matrici [pool * configurazione, 23].
+    num_configs = len(configurations)
+    taken_flat = taken.reshape(num_pools * num_configs, pool_len)
+    slots = np.argsort(~taken_flat, axis=1, kind='stable')[:, :DECK_SIZE]
+    deck_idx = np.take_along_axis(np.repeat(sorted_idx, num_configs, axis=0), slots, axis=1)
+    in_deck = np.take_along_axis(taken_flat, slots, axis=1)
+    main_masks = np.tile(pair_masks, num_pools)
+
+    metrics = _score_decks(table, deck_idx, in_deck, main_masks)
+    scores = np.where(in_deck.any(axis=1), metrics['final_score'], -np.inf).reshape(num_pools, num_configs)
+    best = scores.argmax(axis=1)
+
+    for row, i in enumerate(active):
+        flat_row = row * num_configs + best[row]
+        if not in_deck[flat_row].any():
+            results[i] = {**_empty_deck_metrics(), "main_colors": "", "splash_color": "", "deck": []}
+            continue
+        pair, splash = configurations[best[row]]
+        results[i] = {
+            **_format_deck_metrics(metrics, flat_row),
+            "main_colors": "".join(c for b, c in enumerate(COLOR_ORDER) if pair & (1 << b)),
+            "splash_color": "".join(c for b, c in enumerate(COLOR_ORDER) if splash & (1 << b)),
+            "deck": [table.cards[j] for j in deck_idx[flat_row][in_deck[flat_row]]]
+        }
+    return results
+
+
+def score_pools(pools: List[List[Card]], table: Optional[DeckFeatureTable] = None, deck_config: Optional[Dict] = None) -> List[Dict]:
+    """
+    Valuta i pool con il costruttore scelto in configurazione:
+    'greedy' (la costruzione storica di evaluate_deck) o 'exhaustive' (build_best_decks).
+    """
+    deck_config = deck_config or {}
+    if deck_config.get('deck_builder', 'greedy') == 'exhaustive':
+        return build_best_decks(
+            pools, table,
+            allow_splash=deck_config.get('allow_splash', True),
+            max_splash_cards=deck_config.get('max_splash_cards', 3)
+        )
+    return evaluate_decks_batch(pools, table)
@@ -0,0 +1,380 @@
+import random
+import zlib
+from dataclasses import dataclass
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from src.environment.draft import Card, Player
+from src.environment.draftsimulator import DraftSimulator
+from src.environment.simmetrics import SimulationMetrics
+from src.environment.opponents import AIBot, ScoringBot, load_drafter_model
+from src.evaluation.deckanalyzer import DeckFeatureTable, score_pools
+from src.models.pickcache import PickCache
+from src.utils.lazyimport import lazy_import
+
+# torch viene importato solo quando un worker carica davvero un modello.
+torch = lazy_import("torch")
+
+# Stato per-processo: modello e cubi vengono caricati una sola volta
+# dall'initializer e riusati per tutti i draft assegnati al worker.
+_WORKER_STATE: Dict = {}
+
+
+@dataclass
+class DraftTask:
+    """Un singolo draft di valutazione da eseguire."""
+    cube_name: str
+    draft_index: int
+    seed: int
+
+
+@dataclass
+class DraftResult:
+    """Punteggi di un draft di valutazione (IA al posto 0, ScoringBot negli altri)."""
+    cube_name: str
+    draft_index: int
+    ai_score: float
+    bot_scores: List[float]
+    # Nomi delle carte dei pool dell'IA e del primo ScoringBot, per il confronto finale.
+    ai_pool: List[str]
+    bot_pool: List[str]
+    # Metriche di simulazione del task (SimulationMetrics.to_dict), se richieste.
+    metrics: Optional[Dict] = None
+
+
+@dataclass
+class RotationTask:
+    """Un set di buste (un seme) da giocare con l'IA a rotazione in ogni posto."""
+    cube_name: str
+    seed_index: int
+    seed: int
+
+
+@dataclass
+class RotationResult:
+    """
+    Punteggi appaiati per un set di buste: ai_scores[k] è il punteggio dell'IA
+    seduta al posto k, baseline_scores[k] quello dello ScoringBot allo stesso
+    posto nel draft di soli ScoringBot con le stesse buste.
+    """
+    cube_name: str
+    seed_index: int
+    ai_scores: List[float]
+    baseline_scores: List[float]
+    # Pool dell'IA al posto 0 e dello ScoringBot al posto 0 con le stesse buste.
+    ai_pool: List[str]
+    bot_pool: List[str]
+    metrics: Optional[Dict] = None
+
+    @property
+    def paired_difference(self) -> float:
+        """Differenza media IA - ScoringBot sullo stesso posto e sulle stesse buste."""
+        return sum(a - b for a, b in zip(self.ai_scores, self.baseline_scores)) / len(self.ai_scores)
+
+
+@dataclass
+class CheckpointTask:
+    """Un set di buste (un seme) da giocare con ciascun checkpoint al posto 0."""
+    cube_name: str
+    seed_index: int
+    seed: int
+
+
+@dataclass
+class CheckpointResult:
+    """
+    Punteggi di più checkpoint sulle stesse buste: checkpoint_scores[nome] è il
+    punteggio dell'IA con quel checkpoint al posto 0, baseline_score quello dello
+    ScoringBot al posto 0 nel draft di soli ScoringBot con le stesse buste.
+    """
+    cube_name: str
+    seed_index: int
+    checkpoint_scores: Dict[str, float]
+    baseline_score: float
+    metrics: Optional[Dict] = None
+
+
+def draft_seed(base_seed: int, cube_name: str, draft_index: int) -> int:
+    """Seme deterministico per un draft, indipendente dall'ordine di esecuzione."""
+    return (base_seed * 1_000_003 + zlib.crc32(f"{cube_name}:{draft_index}".encode())) % (2 ** 32)
+
+
+def build_tasks(cube_names: Iterable[str], drafts_per_cube: int, base_seed: int) -> List[DraftTask]:
+    # I cubi sono alternati (draft 0 di ogni cubo, poi draft 1, ...): se la valutazione
+    # si ferma prima (test sequenziale) il campione resta bilanciato tra i cubi.
+    cube_names = list(cube_names)
+    return [
+        DraftTask(cube_name, i, draft_seed(base_seed, cube_name, i))
+        for i in range(drafts_per_cube)
+        for cube_name in cube_names
+    ]
+
+
+def build_rotation_tasks(cube_names: Iterable[str], seeds_per_cube: int, base_seed: int) -> List[RotationTask]:
+    cube_names = list(cube_names)
+    return [
+        RotationTask(cube_name, i, draft_seed(base_seed, cube_name, i))
+        for i in range(seeds_per_cube)
+        for cube_name in cube_names
+    ]
+
+
+def build_checkpoint_tasks(cube_names: Iterable[str], seeds_per_cube: int, base_seed: int) -> List[CheckpointTask]:
+    cube_names = list(cube_names)
+    return [
+        CheckpointTask(cube_name, i, draft_seed(base_seed, cube_name, i))
+        for i in range(seeds_per_cube)
+        for cube_name in cube_names
+    ]
+
+
+def _init_worker(
+    cubes: Dict[str, List[Card]],
+    model_path: Optional[str],
+    sim_config: Dict,
+    threads_per_worker: int,
+    deck_config: Optional[Dict] = None,
+    checkpoint_paths: Optional[Dict[str, str]] = None,
+    pick_cache_size: int = 0,
+    collect_metrics: bool = False
+):
+    """Initializer del pool: un thread per worker, modelli caricati una volta sola."""
+    torch.set_num_threads(threads_per_worker)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    # Una cache dei pick per modello (None = modello principale), creata con i
+    # modelli del worker: resta valida tra i task assegnati allo stesso worker.
+    model_files = {None: model_path} if model_path else {}
+    model_files.update(checkpoint_paths or {})
+    caches = {}
+    if pick_cache_size > 0:
+        caches = {name: PickCache(pick_cache_size, store_scores=False) for name in model_files}
+
+    _WORKER_STATE.update(
+        cubes=cubes,
+        deck_tables={cube_name: DeckFeatureTable(cards) for cube_name, cards in cubes.items()},
+        model=load_drafter_model(Path(model_path), device) if model_path else None,
+        # Per il confronto tra checkpoint: tutti i modelli restano in memoria nel worker.
+        checkpoints={name: load_drafter_model(Path(path), device) for name, path in (checkpoint_paths or {}).items()},
+        caches=caches,
+        collect_metrics=collect_metrics,
+        metrics=None,
+        sim_config=sim_config,
+        deck_config=deck_config
+    )
+
+
+def run_evaluation_draft(task: DraftTask) -> DraftResult:
+    """Esegue un draft IA vs 7 ScoringBot con RNG proprio e valuta i mazzi finali."""
+    sim_config = _WORKER_STATE['sim_config']
+    num_players = sim_config['num_players']
+
+    # Anche il generatore globale viene riseminato: i bot lo usano per i casi di parità.
+    random.seed(task.seed)
+    players = [Player(player_id=j) for j in range(num_players)]
+    bots = [AIBot(players[0], model=_WORKER_STATE['model'], cache=_WORKER_STATE['caches'].get(None))]
+    bots += [ScoringBot(p) for p in players[1:]]
+
+    simulator = DraftSimulator(
+        cube_list=_WORKER_STATE['cubes'][task.cube_name],
+        bots=bots,
+        num_players=num_players,
+        pack_size=sim_config['pack_size'],
+        num_packs=sim_config['num_packs'],
+        draft_id=f"eval_{task.cube_name}_{task.draft_index}",
+        rng=random.Random(task.seed),
+        metrics=_WORKER_STATE['metrics']
+    )
+    final_players = simulator.run_draft(verbose=False)
+
+    # Tutti i pool del draft valutati in un'unica chiamata vettorizzata.
+    deck_metrics = score_pools(
+        [final_players[i].pool for i in range(num_players)],
+        _WORKER_STATE['deck_tables'][task.cube_name],
+        _WORKER_STATE['deck_config']
+    )
+
+    return DraftResult(
+        cube_name=task.cube_name,
+        draft_index=task.draft_index,
+        ai_score=deck_metrics[0]['final_score'],
+        bot_scores=[metrics['final_score'] for metrics in deck_metrics[1:]],
+        ai_pool=[card.name for card in final_players[0].pool],
+        bot_pool=[card.name for card in final_players[1].pool]
+    )
+
+
+def _generate_task_packs(task) -> List:
+    """Buste del task, generate una volta sola dal suo seme e rigiocate in ogni draft."""
+    sim_config = _WORKER_STATE['sim_config']
+    return DraftSimulator.generate_pack_rounds(
+        _WORKER_STATE['cubes'][task.cube_name],
+        sim_config['num_players'], sim_config['pack_size'], sim_config['num_packs'],
+        random.Random(task.seed)
+    )
+
+
+def _play_seated_draft(task, pack_rounds: List, ai_seat: Optional[int], checkpoint: Optional[str] = None,
+                       draft_id: Optional[str] = None) -> List:
+    """
+    Gioca un draft sulle buste date, con l'IA al posto 'ai_seat' (None = solo
+    ScoringBot). Senza 'checkpoint' si usa il modello principale del worker.
+    """
+    sim_config = _WORKER_STATE['sim_config']
+    num_players = sim_config['num_players']
+    model = _WORKER_STATE['checkpoints'][checkpoint] if checkpoint is not None else _WORKER_STATE['model']
+    cache = _WORKER_STATE['caches'].get(checkpoint)
+
+    random.seed(task.seed)
+    players = [Player(player_id=j) for j in range(num_players)]
+    bots = [
+        AIBot(p, model=model, cache=cache) if p.player_id == ai_seat else ScoringBot(p)
+        for p in players
+    ]
+    simulator = DraftSimulator(
+        cube_list=_WORKER_STATE['cubes'][task.cube_name],
+        bots=bots,
+        num_players=num_players,
+        pack_size=sim_config['pack_size'],
+        num_packs=sim_config['num_packs'],
+        draft_id=draft_id or f"rot_{task.cube_name}_{task.seed_index}_{ai_seat}",
+        pack_rounds=pack_rounds,
+        metrics=_WORKER_STATE['metrics']
+    )
+    final_players = simulator.run_draft(verbose=False)
+    return [final_players[i].pool for i in range(num_players)]
+
+
+def run_rotation(task: RotationTask) -> RotationResult:
+    """
+    Common random numbers: genera un solo set di buste dal seme, gioca il draft
+    di riferimento con 8 ScoringBot e poi lo rigioca con l'IA a rotazione in
+    ogni posto. Le differenze per posto sono appaiate: stesse buste, stesso posto.
+    """
+    num_players = _WORKER_STATE['sim_config']['num_players']
+    table = _WORKER_STATE['deck_tables'][task.cube_name]
+    deck_config = _WORKER_STATE['deck_config']
+
+    pack_rounds = _generate_task_packs(task)
+
+    baseline_pools = _play_seated_draft(task, pack_rounds, ai_seat=None)
+    baseline_scores = [metrics['final_score'] for metrics in score_pools(baseline_pools, table, deck_config)]
+
+    # Servono solo i pool dell'IA: li valutiamo tutti insieme alla fine.
+    ai_pools = [_play_seated_draft(task, pack_rounds, ai_seat=seat)[seat] for seat in range(num_players)]
+    ai_scores = [metrics['final_score'] for metrics in score_pools(ai_pools, table, deck_config)]
+
+    return RotationResult(
+        cube_name=task.cube_name,
+        seed_index=task.seed_index,
+        ai_scores=ai_scores,
+        baseline_scores=baseline_scores,
+        ai_pool=[card.name for card in ai_pools[0]],
+        bot_pool=[card.name for card in baseline_pools[0]]
+    )
+
+
+def run_checkpoint_comparison(task: CheckpointTask) -> CheckpointResult:
+    """
+    Gioca le stesse buste con ogni checkpoint al posto 0 e con soli ScoringBot:
+    tutti i checkpoint vedono esattamente gli stessi draft, quindi le differenze
+    tra epoche non dipendono dalla fortuna delle buste.
+    """
+    table = _WORKER_STATE['deck_tables'][task.cube_name]
+    pack_rounds = _generate_task_packs(task)
+
+    baseline_pool = _play_seated_draft(task, pack_rounds, ai_seat=None)[0]
+    names = list(_WORKER_STATE['checkpoints'])
+    ai_pools = [
+        _play_seated_draft(task, pack_rounds, ai_seat=0, checkpoint=name,
+                           draft_id=f"ckpt_{name}_{task.cube_name}_{task.seed_index}")[0]
+        for name in names
+    ]
+    # Il mazzo di riferimento e quelli di tutti i checkpoint in un'unica chiamata vettorizzata.
+    deck_metrics = score_pools([baseline_pool] + ai_pools, table, _WORKER_STATE['deck_config'])
+
+    return CheckpointResult(
+        cube_name=task.cube_name,
+        seed_index=task.seed_index,
+        checkpoint_scores={name: metrics['final_score'] for name, metrics in zip(names, deck_metrics[1:])},
+        baseline_score=deck_metrics[0]['final_score']
+    )
+
+
+def _run_task(task):
+    """Punto d'ingresso dei worker: esegue il tipo di valutazione richiesto dal task."""
+    # Metriche nuove per ogni task: viaggiano con il risultato e il processo
+    # principale le somma, qualunque sia il worker che ha eseguito il task.
+    if _WORKER_STATE['collect_metrics']:
+        _WORKER_STATE['metrics'] = SimulationMetrics()
+    if isinstance(task, RotationTask):
+        result = run_rotation(task)
+    elif isinstance(task, CheckpointTask):
+        result = run_checkpoint_comparison(task)
+    else:
+        result = run_evaluation_draft(task)
+    if _WORKER_STATE['metrics'] is not None:
+        result.metrics = _WORKER_STATE['metrics'].to_dict()
+    return result
+
+
+class ParallelEvaluator:
+    """
+    Distribuisce i draft di valutazione su un pool di processi. Ogni worker
+    carica modello e carte una volta; i risultati vengono restituiti man mano
+    che i draft finiscono, così il processo principale può aggregarli subito.
+    """
+    def __init__(
+        self,
+        cubes: Dict[str, List[Card]],
+        model_path: Optional[Path],
+        sim_config: Dict,
+        num_workers: Optional[int] = None,
+        threads_per_worker: int = 1,
+        deck_config: Optional[Dict] = None,
+        checkpoint_paths: Optional[Dict[str, Path]] = None,
+        pick_cache_size: int = 0,
+        collect_metrics: bool = False
+    ):
+        self.cubes = cubes
+        self.model_path = model_path
+        self.sim_config = sim_config
+        self.num_workers = num_workers if num_workers else 1
+        self.threads_per_worker = threads_per_worker
+        # Opzioni del costruttore di mazzi (vedi deckanalyzer.score_pools).
+        self.deck_config = deck_config
+        # Checkpoint da confrontare (nome -> percorso), usati dai CheckpointTask.
+        self.checkpoint_paths = checkpoint_paths or {}
+        # Stati (pack, pool, pick) memorizzati per modello in ogni worker; 0 = nessuna cache.
+        self.pick_cache_size = pick_cache_size
+        # Con collect_metrics ogni risultato porta le metriche di simulazione del suo task.
+        self.collect_metrics = collect_metrics
+
+    def run(self, tasks: List, ordered: bool = False) -> Iterator:
+        """
+        Restituisce i risultati man mano che arrivano. Con ordered=True arrivano
+        nell'ordine dei task, così le decisioni prese durante lo streaming (es. il
+        test sequenziale) non dipendono dal numero di worker. Interrompere
+        l'iterazione termina i worker ancora attivi.
+        """
+        initargs = (
+            self.cubes, str(self.model_path) if self.model_path else None, self.sim_config,
+            self.threads_per_worker, self.deck_config,
+            {name: str(path) for name, path in self.checkpoint_paths.items()},
+            self.pick_cache_size, self.collect_metrics
+        )
+
+        # Con un solo worker si resta nel processo corrente (utile per il debug).
+        if self.num_workers <= 1:
+            _init_worker(*initargs)
+            for task in tasks:
+                yield _run_task(task)
+            return
+
+        # 'spawn' evita di ereditare lo stato dei thread di torch dal processo padre.
+        context = get_context('spawn')
+        with context.Pool(processes=self.num_workers, initializer=_init_worker, initargs=initargs) as pool:
+            chunksize = max(1, len(tasks) // (self.num_workers * 8))
+            imap = pool.imap if ordered else pool.imap_unordered
+            yield from imap(_run_task, tasks, chunksize=chunksize)
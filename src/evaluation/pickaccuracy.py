@@ -0,0 +1,141 @@
+import math
+from typing import Dict, List, Optional, Sequence
+
+import torch
+
+from src.data.loaders import PackedDraftDataset
+
+
+class PickAccuracyEvaluator:
+    """
+    Valutazione offline di un modello sui pick dei log (tipicamente i draft di
+    validazione): nessuna simulazione, solo forward in batch grandi senza gradienti.
+    Riporta accuratezza top-1/top-3, log-likelihood media della scelta reale e
+    accuratezza top-1 per numero di pack e di pick.
+
+    I batch vengono costruiti direttamente dai tensori compatti del
+    PackedDraftDataset (anche in memory-map), senza passare dal DataLoader.
+    Lo stesso evaluator può essere riusato per molti checkpoint.
+    """
+    def __init__(
+        self,
+        dataset: PackedDraftDataset,
+        indices: Optional[Sequence[int]] = None,
+        batch_size: int = 1024,
+        max_pack_size: int = 15,
+        max_pool_size: int = 50,
+        fixed_padding: bool = True
+    ):
+        self.dataset = dataset
+        indices = torch.as_tensor(list(indices) if indices is not None else range(len(dataset)), dtype=torch.long)
+        self.batch_size = batch_size
+        self.max_pack_size = max_pack_size
+        self.max_pool_size = max_pool_size
+        # Con fixed_padding pack e pool vengono riempiti fino alle dimensioni massime come
+        # fa AIBot durante i draft, quindi i punteggi sono quelli che il modello darebbe
+        # giocando. Senza, i campioni vengono ordinati per lunghezza del pool e ogni
+        # batch ha pochissimo padding: più veloce, ma il modello (che non maschera il
+        # padding) può dare punteggi leggermente diversi.
+        self.fixed_padding = fixed_padding
+        if not fixed_padding and len(indices) > 0:
+            pool_lengths = dataset.pool_offsets[indices + 1] - dataset.pool_offsets[indices]
+            indices = indices[torch.argsort(pool_lengths, stable=True)]
+        self.indices = indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    @staticmethod
+    def _gather_rows(features: torch.Tensor, offsets: torch.Tensor, idx: torch.Tensor, width: int):
+        """Copia le righe dei campioni 'idx' in un tensore [batch, width, F] riempito di zeri."""
+        starts = offsets[idx]
+        lengths = offsets[idx + 1] - starts
+        positions = torch.arange(width)
+        valid = positions.unsqueeze(0) < lengths.unsqueeze(1)
+        batch = torch.zeros(len(idx), width, features.shape[1], dtype=torch.float32)
+        batch[valid] = features[(starts.unsqueeze(1) + positions.unsqueeze(0))[valid]]
+        return batch, lengths
+
+    def _batches(self):
+        data = self.dataset
+        for start in range(0, len(self.indices), self.batch_size):
+            idx = self.indices[start:start + self.batch_size]
+            pack_lengths = data.pack_offsets[idx + 1] - data.pack_offsets[idx]
+            pool_lengths = data.pool_offsets[idx + 1] - data.pool_offsets[idx]
+            pack_width = int(pack_lengths.max())
+            pool_width = int(pool_lengths.max())
+            if self.fixed_padding:
+                pack_width = max(pack_width, self.max_pack_size)
+                pool_width = max(pool_width, self.max_pool_size)
+            packs, pack_lengths = self._gather_rows(data.pack_features, data.pack_offsets, idx, pack_width)
+            pools, _ = self._gather_rows(data.pool_features, data.pool_offsets, idx, pool_width)
+            yield idx, packs, pools, pack_lengths
+
+    def evaluate(self, model: torch.nn.Module, device: str = "cpu") -> Dict:
+        """Restituisce le metriche aggregate del modello su tutti i campioni dell'evaluator."""
+        model.eval()
+        data = self.dataset
+        max_pick = int(data.pick_nums.max()) if len(data.pick_nums) else 0
+        max_pack = int(data.pack_nums.max()) if len(data.pack_nums) else 0
+        top1_by_pick = torch.zeros(max_pick + 1, dtype=torch.float64)
+        count_by_pick = torch.zeros(max_pick + 1, dtype=torch.float64)
+        top1_by_pack = torch.zeros(max_pack + 1, dtype=torch.float64)
+        count_by_pack = torch.zeros(max_pack + 1, dtype=torch.float64)
+        top1 = top3 = 0
+        log_likelihood = 0.0
+        # Accuratezza attesa scegliendo a caso, come riferimento.
+        random_top1 = 0.0
+
+        with torch.no_grad():
+            for idx, packs, pools, pack_lengths in self._batches():
+                pick_nums = data.pick_nums[idx]
+                pack_nums = data.pack_nums[idx]
+                choices = data.choices[idx]
+
+                scores = model(packs.to(device), pools.to(device), pick_nums.unsqueeze(1).to(device)).cpu()
+                padding_mask = torch.arange(scores.shape[1]).unsqueeze(0) >= pack_lengths.unsqueeze(1)
+                scores = scores.masked_fill(padding_mask, -float('inf'))
+
+                hits = (scores.argmax(dim=1) == choices).double()
+                top_k = scores.topk(min(3, scores.shape[1]), dim=1).indices
+                top1 += int(hits.sum())
+                top3 += int((top_k == choices.unsqueeze(1)).any(dim=1).sum())
+                log_likelihood += float(torch.log_softmax(scores, dim=1).gather(1, choices.unsqueeze(1)).sum())
+                random_top1 += float((1.0 / pack_lengths.double()).sum())
+
+                top1_by_pick += torch.bincount(pick_nums, weights=hits, minlength=max_pick + 1)
+                count_by_pick += torch.bincount(pick_nums, minlength=max_pick + 1).double()
+                top1_by_pack += torch.bincount(pack_nums, weights=hits, minlength=max_pack + 1)
+                count_by_pack += torch.bincount(pack_nums, minlength=max_pack + 1).double()
+
+        total = len(self.indices)
+        if total == 0:
+            return {"picks": 0, "top1_accuracy": 0.0, "top3_accuracy": 0.0,
+                    "mean_log_likelihood": -math.inf, "random_top1_accuracy": 0.0,
+                    "top1_by_pack": {}, "top1_by_pick": {}}
+
+        def by_position(hits: torch.Tensor, counts: torch.Tensor) -> Dict[int, float]:
+            return {i: float(hits[i] / counts[i]) for i in range(len(counts)) if counts[i] > 0}
+
+        return {
+            "picks": total,
+            "top1_accuracy": top1 / total,
+            "top3_accuracy": top3 / total,
+            "mean_log_likelihood": log_likelihood / total,
+            "random_top1_accuracy": random_top1 / total,
+            "top1_by_pack": by_position(top1_by_pack, count_by_pack),
+            "top1_by_pick": by_position(top1_by_pick, count_by_pick)
+        }
+
+
+def format_pick_report(metrics: Dict) -> List[str]:
+    """Righe di testo leggibili con le metriche restituite da PickAccuracyEvaluator.evaluate."""
+    lines = [
+        f"Pick valutati: {metrics['picks']}",
+        f"Accuratezza top-1: {metrics['top1_accuracy']:.2%} (scelta casuale: {metrics['random_top1_accuracy']:.2%})",
+        f"Accuratezza top-3: {metrics['top3_accuracy']:.2%}",
+        f"Log-likelihood media della scelta: {metrics['mean_log_likelihood']:.4f}",
+        "Top-1 per pack: " + ", ".join(f"{pack}: {acc:.1%}" for pack, acc in metrics['top1_by_pack'].items()),
+        "Top-1 per pick: " + ", ".join(f"{pick}: {acc:.1%}" for pick, acc in metrics['top1_by_pick'].items())
+    ]
+    return lines
@@ -0,0 +1,68 @@
+import math
+from typing import Optional, Tuple
+
+# Esiti possibili del test sequenziale.
+BETTER = "better"
+WORSE = "worse"
+EQUIVALENT = "equivalent"
+
+
+class SequentialTest:
+    """
+    Test sequenziale sulla media delle differenze appaiate (punteggio IA meno
+    media degli ScoringBot nello stesso draft), basato su una confidence sequence
+    asintotica a mistura gaussiana (Waudby-Smith et al., 2021).
+
+    L'intervallo resta valido con probabilità 1 - alpha per tutti gli istanti
+    contemporaneamente, quindi lo si può controllare dopo ogni draft e fermarsi
+    appena esclude lo zero, senza gonfiare l'errore di primo tipo come farebbe
+    un t-test ripetuto.
+    """
+    def __init__(self, alpha: float = 0.05, min_samples: int = 10, optimize_at: int = 100, margin: float = 0.0):
+        if not 0.0 < alpha < 1.0:
+            raise ValueError(f"alpha deve essere in (0, 1), ricevuto: {alpha}")
+        self.alpha = alpha
+        self.min_samples = min_samples
+        # Margine di indifferenza: se l'intervallo sta tutto in (-margin, margin)
+        # la differenza è trascurabile e si può smettere (0 = disattivato).
+        self.margin = margin
+        # rho ottimizza l'ampiezza dell'intervallo intorno a 'optimize_at' campioni.
+        log_term = -2 * math.log(alpha)
+        self.rho = math.sqrt((log_term + math.log(log_term + 1)) / optimize_at)
+
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value: float) -> Optional[str]:
+        """Aggiunge un'osservazione (algoritmo di Welford) e restituisce l'esito, se deciso."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        return self.decision()
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def interval(self) -> Tuple[float, float]:
+        """Confidence sequence corrente per la media."""
+        if self.count < 2:
+            return -math.inf, math.inf
+        t = self.count
+        scaled = t * self.variance * self.rho ** 2 + 1
+        radius = math.sqrt(2 * scaled / (t ** 2 * self.rho ** 2) * math.log(math.sqrt(scaled) / self.alpha))
+        return self.mean - radius, self.mean + radius
+
+    def decision(self) -> Optional[str]:
+        if self.count < self.min_samples:
+            return None
+        low, high = self.interval()
+        if low > 0:
+            return BETTER
+        if high < 0:
+            return WORSE
+        if self.margin > 0 and -self.margin < low and high < self.margin:
+            return EQUIVALENT
+        return None
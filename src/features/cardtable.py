@@ -0,0 +1,55 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import torch
+
+from src.data.carddb import CardDatabase
+from src.features.cardencoders import CardEncoder
+from src.utils.constants import FEATURE_SIZE
+
+
+class CardFeatureTable:
+    """
+    Vettori di feature di tutte le carte del database, calcolati una volta sola
+    con CardEncoder e tenuti in un unico tensore [num_carte, FEATURE_SIZE]
+    indicizzato per id. Le richieste possono indicare le carte per nome
+    (anche di una sola faccia) o per id.
+    """
+    def __init__(self, names: List[str], name_index: Dict[str, int], features: torch.Tensor):
+        self.names = names
+        self.name_index = name_index
+        self.features = features
+
+    @classmethod
+    def from_database(cls, db_path: Path, encoder: Optional[CardEncoder] = None) -> "CardFeatureTable":
+        encoder = encoder or CardEncoder()
+        with CardDatabase(db_path) as database:
+            names, rows = [], []
+            for card_id, name, details in database.iter_cards():
+                # Gli id sono assegnati in sequenza dall'ingestione: la riga coincide con l'id.
+                if card_id != len(names):
+                    raise ValueError(f"Id delle carte non contigui nel database {db_path}")
+                names.append(name)
+                rows.append(encoder.encode_card(details))
+            name_index = database.name_index()
+        features = torch.tensor(rows, dtype=torch.float32) if rows else torch.empty(0, FEATURE_SIZE)
+        return cls(names, name_index, features)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def resolve(self, cards: Sequence[Union[str, int]]) -> List[int]:
+        """Converte nomi o id in id; solleva KeyError con l'elenco delle carte sconosciute."""
+        ids, unknown = [], []
+        for card in cards:
+            if isinstance(card, bool):
+                unknown.append(card)
+            elif isinstance(card, int):
+                (ids if 0 <= card < len(self.names) else unknown).append(card)
+            elif card in self.name_index:
+                ids.append(self.name_index[card])
+            else:
+                unknown.append(card)
+        if unknown:
+            raise KeyError(unknown)
+        return ids
@@ -0,0 +1,93 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+# Il TransformerDrafter non ha codifiche posizionali: il punteggio di ogni carta
+# non dipende dall'ordine delle carte nel pack né da quello del pool (a meno di
+# arrotondamenti). Per questo lo stato si può ridurre a una forma canonica
+# (multinsiemi ordinati di pack e pool più il numero del pick) e riusare i
+# punteggi per tutte le permutazioni dello stesso stato.
+
+CacheKey = Tuple[Tuple[Hashable, ...], Tuple[Hashable, ...], int]
+
+
+class PickCache:
+    """
+    Cache LRU delle raccomandazioni del modello, indicizzata per forma canonica
+    dello stato. Le carte sono identificate da qualunque valore hashable e
+    ordinabile (nomi nel simulatore, id nel servizio). Con store_scores=True
+    salva i punteggi di tutte le carte del pack, altrimenti solo la carta scelta.
+
+    Ogni istanza è legata a un solo modello caricato: va creata insieme al
+    modello e scartata con lui. La cache non controlla da quale checkpoint
+    vengono i punteggi, quindi non va riusata dopo aver ricaricato i pesi.
+    """
+    def __init__(self, max_entries: int = 20_000, store_scores: bool = True):
+        self.max_entries = max_entries
+        self.store_scores = store_scores
+        self._entries: "OrderedDict[CacheKey, Union[Dict[Hashable, float], Hashable]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    @staticmethod
+    def key(pack: Sequence[Hashable], pool: Sequence[Hashable], pick_number: int) -> CacheKey:
+        return tuple(sorted(pack)), tuple(sorted(pool)), int(pick_number)
+
+    def get_scores(self, pack: Sequence[Hashable], pool: Sequence[Hashable], pick_number: int) -> Optional[List[float]]:
+        """Punteggi nell'ordine del pack richiesto, oppure None se lo stato non è in cache."""
+        entry = self._lookup(pack, pool, pick_number)
+        if entry is None:
+            return None
+        if not self.store_scores:
+            raise ValueError("La cache salva solo le scelte: usare get_choice().")
+        return [entry[card] for card in pack]
+
+    def get_choice(self, pack: Sequence[Hashable], pool: Sequence[Hashable], pick_number: int) -> Optional[int]:
+        """Indice nel pack richiesto della carta con il punteggio più alto, oppure None."""
+        entry = self._lookup(pack, pool, pick_number)
+        if entry is None:
+            return None
+        if self.store_scores:
+            scores = [entry[card] for card in pack]
+            return max(range(len(pack)), key=scores.__getitem__)
+        return list(pack).index(entry)
+
+    def put(self, pack: Sequence[Hashable], pool: Sequence[Hashable], pick_number: int, scores: Sequence[float]):
+        """Salva i punteggi calcolati per le carte del pack (nello stesso ordine)."""
+        if self.max_entries <= 0:
+            return
+        key = self.key(pack, pool, pick_number)
+        if self.store_scores:
+            # Copie della stessa carta hanno lo stesso punteggio: basta una voce per carta.
+            entry = {card: float(score) for card, score in zip(pack, scores)}
+        else:
+            entry = pack[max(range(len(pack)), key=lambda i: scores[i])]
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _lookup(self, pack, pool, pick_number):
+        key = self.key(pack, pool, pick_number)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -1,6 +1,6 @@
 import json
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import time
 
 from src.environment.draft import Card
@@ -17,13 +17,16 @@ class DraftLogger:
         self.encoder = CardEncoder()
         self._current_draft_data: Dict[Any, Dict] = {}
 
-    def start_draft(self, draft_id: Any):
+    def start_draft(self, draft_id: Any, cube_name: Optional[str] = None):
         """Inizializza la struttura dati per un nuovo log di draft."""
         if draft_id not in self._current_draft_data:
             self._current_draft_data[draft_id] = {
                 "draft_id": draft_id,
                 "picks": []  # <-- Ecco la chiave che mancava!
             }
+            # Il cubo serve alle statistiche per carta (vedi cardstats.py).
+            if cube_name is not None:
+                self._current_draft_data[draft_id]["cube"] = cube_name
 
     def log_pick(self, draft_id: Any, player_id: int, pack_num: int, pick_num: int, pack: List[Card], pool: List[Card], choice: Card):
         """Registra un singolo evento di pick, convertendo le carte in vettori."""
@@ -46,6 +49,8 @@ class DraftLogger:
             "pick_num": pick_num,
             "pack": pack_vectors,
             "pool": pool_vectors,
+            # Nomi delle carte della busta (stesso ordine di 'pack'), per le statistiche per carta.
+            "pack_cards": [c.name for c in pack],
             "choice_index": choice_index
         }
         self._current_draft_data[draft_id]["picks"].append(pick_data)
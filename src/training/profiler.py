@@ -0,0 +1,152 @@
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import torch
+
+try:
+    import resource
+except ImportError:  # Non disponibile su Windows
+    resource = None
+
+# Ordine delle fasi di uno step di training, come vengono marcate dal Trainer.
+STEP_PHASES = ("data_wait", "h2d", "forward", "backward", "optimizer")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Picco di memoria residente del processo in MB (None se non misurabile)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux restituisce KB, macOS byte.
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 2)
+
+
+class StepProfiler:
+    """
+    Strumentazione opzionale del ciclo di training. Misura per ogni step il tempo
+    di attesa del DataLoader, il trasferimento host->device, forward, backward e
+    optimizer, più throughput e picco di RSS, e scrive tutto come JSON lines.
+    Può anche catturare una traccia torch.profiler per una finestra di step.
+    """
+    def __init__(
+        self,
+        output_dir: Path,
+        device: str = 'cpu',
+        metrics_file: str = "step_metrics.jsonl",
+        trace_start_step: int = 10,
+        trace_num_steps: int = 0
+    ):
+        self.output_dir = output_dir
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.metrics_path = self.output_dir / metrics_file
+        self.use_cuda = str(device).startswith('cuda')
+        self.trace_start_step = trace_start_step
+        self.trace_num_steps = trace_num_steps
+
+        self.global_step = 0
+        self._epoch = 0
+        self._last_mark = 0.0
+        self._step_start = 0.0
+        self._phases: Dict[str, float] = {}
+        self._epoch_totals: Dict[str, float] = {}
+        self._epoch_samples = 0
+        self._epoch_start = 0.0
+        self._torch_profiler = None
+        self._metrics_file = open(self.metrics_path, 'a', encoding='utf-8')
+
+    def _now(self) -> float:
+        # Sulla GPU i kernel sono asincroni: senza sincronizzare misureremmo solo il lancio.
+        if self.use_cuda:
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def _write(self, record: Dict):
+        self._metrics_file.write(json.dumps(record) + "\n")
+
+    def start_epoch(self, epoch: int):
+        """Da chiamare prima di iterare sul DataLoader."""
+        self._epoch = epoch
+        self._epoch_totals = {phase: 0.0 for phase in STEP_PHASES}
+        self._epoch_samples = 0
+        self._epoch_start = self._last_mark = self._step_start = self._now()
+        self._phases = {}
+        # Una finestra che parte dallo step 0 va aperta prima del primo step:
+        # end_step controlla la finestra solo dopo aver incrementato il contatore.
+        self._update_trace()
+
+    def mark(self, phase: str):
+        """Chiude la fase corrente: il tempo dall'ultimo mark viene attribuito a 'phase'."""
+        now = self._now()
+        self._phases[phase] = now - self._last_mark
+        self._last_mark = now
+
+    def end_step(self, batch_size: int):
+        """Registra lo step appena concluso e gestisce la finestra di tracing."""
+        now = self._last_mark
+        step_time = now - self._step_start
+        record = {
+            "event": "step",
+            "epoch": self._epoch,
+            "step": self.global_step,
+            "batch_size": batch_size,
+            **{f"{phase}_s": round(self._phases.get(phase, 0.0), 6) for phase in STEP_PHASES},
+            "step_s": round(step_time, 6),
+            "samples_per_sec": round(batch_size / step_time, 2) if step_time > 0 else None,
+            "peak_rss_mb": peak_rss_mb()
+        }
+        if self.use_cuda:
+            record["peak_cuda_mb"] = round(torch.cuda.max_memory_allocated() / (1024 * 1024), 2)
+        self._write(record)
+
+        for phase in STEP_PHASES:
+            self._epoch_totals[phase] += self._phases.get(phase, 0.0)
+        self._epoch_samples += batch_size
+        self._phases = {}
+        self._step_start = now
+        self.global_step += 1
+        self._update_trace()
+
+    def end_epoch(self):
+        """Scrive un riepilogo dell'epoca: tempo totale per fase e throughput medio."""
+        elapsed = self._now() - self._epoch_start
+        self._write({
+            "event": "epoch",
+            "epoch": self._epoch,
+            "samples": self._epoch_samples,
+            "epoch_s": round(elapsed, 4),
+            **{f"total_{phase}_s": round(total, 4) for phase, total in self._epoch_totals.items()},
+            "samples_per_sec": round(self._epoch_samples / elapsed, 2) if elapsed > 0 else None,
+            "peak_rss_mb": peak_rss_mb()
+        })
+        self._metrics_file.flush()
+
+    def _update_trace(self):
+        """Avvia/ferma torch.profiler in modo che copra gli step [start, start + N)."""
+        if self.trace_num_steps <= 0:
+            return
+        if self._torch_profiler is None and self.global_step == self.trace_start_step:
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if self.use_cuda:
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self._torch_profiler = torch.profiler.profile(activities=activities, record_shapes=True)
+            self._torch_profiler.start()
+        elif self._torch_profiler is not None and self.global_step == self.trace_start_step + self.trace_num_steps:
+            self._stop_trace()
+
+    def _stop_trace(self):
+        self._torch_profiler.stop()
+        last_step = self.global_step - 1
+        trace_path = self.output_dir / f"trace_steps_{self.trace_start_step}_{last_step}.json"
+        self._torch_profiler.export_chrome_trace(str(trace_path))
+        print(f"Traccia torch.profiler salvata in: {trace_path}")
+        self._torch_profiler = None
+
+    def close(self):
+        """Chiude il file delle metriche (e una traccia rimasta aperta, se l'addestramento finisce prima)."""
+        if self._torch_profiler is not None:
+            self._stop_trace()
+        self._metrics_file.close()
@@ -0,0 +1,250 @@
+import copy
+import hashlib
+import itertools
+import json
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import torch
+import torch.multiprocessing as mp
+from torch.utils.data import DataLoader
+
+from src.data.loaders import PackedDraftDataset, custom_collate_fn, split_by_draft, train_collate_fn
+from src.models.transformerdrafter import TransformerDrafter
+from src.training.trainer import Trainer
+from src.utils.constants import FEATURE_SIZE
+
+# Stato per-processo dei worker: il dataset viene aperto una sola volta (in mmap)
+# dall'initializer e riusato da tutti i trial assegnati a quel worker.
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def expand_grid(space: Dict[str, List]) -> List[Dict[str, Any]]:
+    """Tutte le combinazioni di uno spazio {'sezione.chiave': [valori]}."""
+    for key, values in space.items():
+        if not isinstance(values, list):
+            raise ValueError(f"La ricerca a griglia richiede una lista di valori per '{key}'.")
+    keys = list(space.keys())
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(space[k] for k in keys))]
+
+
+def sample_random(space: Dict[str, Any], num_samples: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Campiona 'num_samples' configurazioni. Ogni voce dello spazio può essere una lista
+    (scelta uniforme) o un dizionario {'uniform'|'log_uniform'|'int_uniform': [min, max]}.
+    """
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(num_samples):
+        params = {}
+        for key, spec in space.items():
+            if isinstance(spec, list):
+                params[key] = rng.choice(spec)
+            elif 'uniform' in spec:
+                low, high = spec['uniform']
+                params[key] = rng.uniform(low, high)
+            elif 'log_uniform' in spec:
+                low, high = spec['log_uniform']
+                params[key] = math.exp(rng.uniform(math.log(low), math.log(high)))
+            elif 'int_uniform' in spec:
+                low, high = spec['int_uniform']
+                params[key] = rng.randint(low, high)
+            else:
+                raise ValueError(f"Specifica di ricerca non riconosciuta per '{key}': {spec}")
+        samples.append(params)
+    return samples
+
+
+def apply_overrides(base_config: Dict, params: Dict[str, Any]) -> Dict:
+    """Applica override con chiavi puntate ('model.d_model') a una copia della configurazione."""
+    config = copy.deepcopy(base_config)
+    for dotted_key, value in params.items():
+        section, key = dotted_key.split('.', 1)
+        config[section][key] = value
+    return config
+
+
+def _is_valid(config: Dict) -> bool:
+    # nn.Transformer richiede che d_model sia divisibile per nhead.
+    return config['model']['d_model'] % config['model']['nhead'] == 0
+
+
+def _init_worker(dataset_path: str, threads_per_worker: int, val_fraction: float, split_seed: int):
+    """Initializer del pool: fissa i thread e apre il dataset condiviso una volta sola."""
+    torch.set_num_threads(threads_per_worker)
+    dataset = PackedDraftDataset.load(Path(dataset_path), mmap=True)
+    train_set, val_set = split_by_draft(dataset, val_fraction=val_fraction, seed=split_seed)
+    _WORKER_STATE.update(train_set=train_set, val_set=val_set)
+
+
+def _run_trial(trial_id: int, config: Dict, target_epochs: int, checkpoint_path: str, seed: int) -> Dict[str, Any]:
+    """
+    Addestra un trial fino a 'target_epochs' epoche totali, riprendendo dal suo
+    checkpoint solo se è stato salvato con la stessa configurazione, e
+    restituisce le metriche di validazione.
+    """
+    train_config = config['training']
+    torch.manual_seed(seed + trial_id)
+    train_loader = DataLoader(
+        _WORKER_STATE['train_set'],
+        batch_size=train_config['batch_size'],
+        shuffle=True,
+        collate_fn=train_collate_fn(train_config)
+    )
+    val_loader = DataLoader(
+        _WORKER_STATE['val_set'],
+        batch_size=train_config.get('eval_batch_size', train_config['batch_size']),
+        shuffle=False,
+        collate_fn=custom_collate_fn
+    )
+    model = TransformerDrafter(config=config['model'], feature_size=FEATURE_SIZE)
+    checkpoint_path = Path(checkpoint_path)
+    trainer = Trainer(
+        model=model,
+        train_loader=train_loader,
+        learning_rate=train_config['learning_rate'],
+        device="cpu",
+        save_dir=checkpoint_path.parent,
+        val_loader=val_loader,
+        verbose=False
+    )
+
+    epochs_done = 0
+    config_key = json.dumps(config, sort_keys=True, default=str)
+    if checkpoint_path.exists():
+        checkpoint = torch.load(str(checkpoint_path), weights_only=True)
+        # Un checkpoint di un'altra configurazione (stesso id, sweep diverso) viene ignorato.
+        if checkpoint.get('config') == config_key:
+            model.load_state_dict(checkpoint['model'])
+            trainer.optimizer.load_state_dict(checkpoint['optimizer'])
+            epochs_done = checkpoint['epochs_done']
+
+    start = time.perf_counter()
+    train_loss = float('nan')
+    for epoch in range(epochs_done + 1, target_epochs + 1):
+        train_loss = trainer.train_epoch(epoch)
+    val_metrics = trainer.validate()
+
+    torch.save({
+        'model': model.state_dict(),
+        'optimizer': trainer.optimizer.state_dict(),
+        'epochs_done': max(epochs_done, target_epochs),
+        'config': config_key
+    }, str(checkpoint_path))
+
+    return {
+        "trial_id": trial_id,
+        "epochs": target_epochs,
+        "train_loss": train_loss,
+        "val_loss": val_metrics['loss'],
+        "val_top1_accuracy": val_metrics['top1_accuracy'],
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+
+
+class SweepRunner:
+    """
+    Esegue una ricerca di iperparametri (griglia o casuale) con successive halving:
+    tutti i trial partono con 'min_epochs', a ogni round sopravvive solo la frazione
+    1/eta migliore (per val loss) e il budget di epoche viene moltiplicato per eta.
+    I trial di un round girano in parallelo in processi separati che condividono
+    lo stesso dataset compatto aperto in memory-map.
+
+    Ogni sweep ha una cartella propria ('run_<hash>') identificata dalla
+    configurazione base, dallo sweep e dalla versione del dataset: rilanciare
+    lo stesso sweep riprende i checkpoint dei trial, cambiarlo ne crea una nuova.
+    """
+    def __init__(self, base_config: Dict, sweep_config: Dict, dataset_path: Path, output_dir: Path):
+        self.base_config = base_config
+        self.sweep_config = sweep_config
+        self.dataset_path = dataset_path
+        self.run_id = self.compute_run_id(base_config, sweep_config, PackedDraftDataset.load(dataset_path).source_version)
+        self.output_dir = output_dir / f"run_{self.run_id}"
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.results_path = self.output_dir / "sweep_results.jsonl"
+
+    @staticmethod
+    def compute_run_id(base_config: Dict, sweep_config: Dict, data_version: Optional[str] = None) -> str:
+        # Le voci che non cambiano i trial (cartella, numero di worker/thread) non entrano nell'hash.
+        ignored = {'output_dir', 'num_workers', 'threads_per_worker'}
+        key = {
+            "model": base_config['model'],
+            "training": base_config['training'],
+            "sweep": {k: v for k, v in sweep_config.items() if k not in ignored},
+            "data": data_version
+        }
+        return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+    def build_trials(self) -> List[Dict[str, Any]]:
+        space = self.sweep_config['space']
+        if self.sweep_config.get('search', 'grid') == 'grid':
+            candidates = expand_grid(space)
+        else:
+            candidates = sample_random(space, self.sweep_config.get('num_samples', 8), self.sweep_config.get('seed', 0))
+
+        trials = []
+        for params in candidates:
+            config = apply_overrides(self.base_config, params)
+            if not _is_valid(config):
+                print(f"Configurazione scartata (d_model non divisibile per nhead): {params}")
+                continue
+            trials.append({"trial_id": len(trials), "params": params, "config": config})
+        return trials
+
+    def run(self) -> Optional[Dict[str, Any]]:
+        trials = self.build_trials()
+        if not trials:
+            print("Nessuna configurazione valida da provare.")
+            return None
+
+        eta = self.sweep_config.get('eta', 3)
+        max_epochs = self.sweep_config.get('max_epochs', 27)
+        rung_epochs = min(self.sweep_config.get('min_epochs', 1), max_epochs)
+        num_workers = self.sweep_config.get('num_workers', 2)
+        train_config = self.base_config['training']
+        seed = self.sweep_config.get('seed', 0)
+
+        print(f"Sweep {self.run_id} con {len(trials)} trial, {num_workers} worker, successive halving (eta={eta}).")
+        survivors = trials
+        latest: Dict[int, Dict[str, Any]] = {}
+
+        context = mp.get_context('spawn')
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(str(self.dataset_path), self.sweep_config.get('threads_per_worker', 1),
+                      train_config.get('val_fraction', 0.1), train_config.get('split_seed', 42))
+        ) as executor, open(self.results_path, 'w', encoding='utf-8') as results_file:
+            while True:
+                print(f"\n--- Round: {len(survivors)} trial a {rung_epochs} epoche ---")
+                futures = {
+                    executor.submit(
+                        _run_trial, trial['trial_id'], trial['config'], rung_epochs,
+                        str(self.output_dir / f"trial_{trial['trial_id']}.pt"), seed
+                    ): trial
+                    for trial in survivors
+                }
+                for future in as_completed(futures):
+                    trial = futures[future]
+                    result = {**future.result(), "params": trial['params']}
+                    latest[trial['trial_id']] = result
+                    results_file.write(json.dumps(result) + "\n")
+                    results_file.flush()
+                    print(f"Trial {result['trial_id']} ({result['epochs']} epoche): "
+                          f"val loss {result['val_loss']:.4f}, top-1 {result['val_top1_accuracy']:.2%} - {trial['params']}")
+
+                if len(survivors) <= 1 or rung_epochs >= max_epochs:
+                    break
+                survivors = sorted(survivors, key=lambda t: latest[t['trial_id']]['val_loss'])
+                survivors = survivors[:max(1, len(survivors) // eta)]
+                rung_epochs = min(rung_epochs * eta, max_epochs)
+
+        best = min((latest[t['trial_id']] for t in survivors), key=lambda r: r['val_loss'])
+        with open(self.output_dir / "best_trial.json", 'w', encoding='utf-8') as f:
+            json.dump(best, f, indent=2)
+        return best
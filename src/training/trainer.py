@@ -1,12 +1,20 @@
+import copy
 import torch
+import torch.distributed as dist
 import torch.nn as nn
+from torch.nn.parallel import DistributedDataParallel
 from torch.utils.data import DataLoader
 from pathlib import Path
+from typing import Dict, List, Optional
 from tqdm import tqdm
 
+from src.training.profiler import StepProfiler
+
 class Trainer:
     """
     Gestisce il ciclo di addestramento e salvataggio del modello.
+    In modalità distribuita (modello avvolto in DistributedDataParallel) ogni
+    processo addestra sul proprio shard, ma solo il rank 0 stampa e salva.
     """
     def __init__(
         self,
@@ -14,31 +22,88 @@ class Trainer:
         train_loader: DataLoader,
         learning_rate: float = 1e-4,
         device: str = 'cpu',
-        save_dir: Path = Path("models/experiments") # Rinominato per chiarezza
+        save_dir: Path = Path("models/experiments"), # Rinominato per chiarezza
+        val_loader: Optional[DataLoader] = None,
+        early_stopping_patience: Optional[int] = None,
+        scheduler_config: Optional[Dict] = None,
+        rank: int = 0,
+        world_size: int = 1,
+        profiler: Optional[StepProfiler] = None,
+        verbose: bool = True
     ):
         self.model = model
+        self.rank = rank
+        self.world_size = world_size
+        self.is_main_process = rank == 0
+        # verbose=False silenzia stampe e barre di avanzamento (es. trial di una sweep).
+        self.verbose = verbose and self.is_main_process
+        # Strumentazione opzionale per step; None = nessun overhead.
+        self.profiler = profiler
         self.train_loader = train_loader
+        self.val_loader = val_loader
         self.optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
         self.criterion = nn.CrossEntropyLoss() # Adatto per problemi di classificazione (scegliere una carta tra N)
         self.device = device
         self.save_dir = save_dir # MODIFICA: Assicurati che venga salvato
-        self.save_dir.mkdir(parents=True, exist_ok=True) # Crea la cartella se non esiste
+        if self.is_main_process:
+            self.save_dir.mkdir(parents=True, exist_ok=True) # Crea la cartella se non esiste
+
+        # L'early stopping e lo scheduler hanno senso solo con un set di validazione.
+        self.early_stopping_patience = early_stopping_patience if val_loader is not None else None
+        self.scheduler = None
+        if val_loader is not None and scheduler_config:
+            self.scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(
+                self.optimizer,
+                mode='min',
+                factor=scheduler_config.get('factor', 0.5),
+                patience=scheduler_config.get('patience', 2),
+                min_lr=scheduler_config.get('min_lr', 0.0)
+            )
+
+        self._log(f"Trainer inizializzato. Modelli verranno salvati in: '{self.save_dir}'.")
+
+    def _log(self, message: str):
+        """Stampa solo dal processo principale, per non duplicare l'output."""
+        if self.verbose:
+            print(message)
 
-        print(f"Trainer inizializzato. Modelli verranno salvati in: '{self.save_dir}'.")
+    def _unwrapped_model(self) -> nn.Module:
+        """Restituisce il modello sottostante, senza il wrapper DDP."""
+        return self.model.module if isinstance(self.model, DistributedDataParallel) else self.model
+
+    def _all_reduce_sum(self, values: List[float]) -> List[float]:
+        """Somma dei valori su tutti i processi (identità se non distribuito)."""
+        if self.world_size <= 1:
+            return values
+        tensor = torch.tensor(values, dtype=torch.float64)
+        dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+        return tensor.tolist()
 
     def train_epoch(self, epoch_num: int) -> float:
         """Esegue una singola epoca di addestramento."""
         self.model.train()
         total_loss = 0.0
-        progress_bar = tqdm(self.train_loader, desc=f"Epoch {epoch_num}", leave=False)
+        # Il DistributedSampler deve conoscere l'epoca per rimescolare in modo diverso ogni volta.
+        sampler = getattr(self.train_loader, 'sampler', None)
+        if hasattr(sampler, 'set_epoch'):
+            sampler.set_epoch(epoch_num)
+        progress_bar = tqdm(self.train_loader, desc=f"Epoch {epoch_num}", leave=False, disable=not self.verbose)
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start_epoch(epoch_num)
         
         # MODIFICA: Unpack corretto dei 4 tensori restituiti dal DataLoader
         for packs, pools, pick_numbers, choices in progress_bar:
+            if profiler is not None:
+                profiler.mark("data_wait")
+
             # Sposta tutti i tensori sul dispositivo corretto
             packs = packs.to(self.device)
             pools = pools.to(self.device)
             pick_numbers = pick_numbers.to(self.device)
             choices = choices.to(self.device) # Questo è il target (y)
+            if profiler is not None:
+                profiler.mark("h2d")
 
             self.optimizer.zero_grad()
             
@@ -47,34 +112,121 @@ class Trainer:
             
             # Calcola la loss tra i punteggi predetti e la scelta reale (l'indice della carta scelta)
             loss = self.criterion(scores, choices)
+            if profiler is not None:
+                profiler.mark("forward")
             loss.backward()
+            if profiler is not None:
+                profiler.mark("backward")
             self.optimizer.step()
 
-            total_loss += loss.item()
-            progress_bar.set_postfix(loss=loss.item())
-            
-        return total_loss / len(self.train_loader)
+            loss_value = loss.item()
+            if profiler is not None:
+                profiler.mark("optimizer")
+                profiler.end_step(choices.size(0))
+
+            total_loss += loss_value
+            progress_bar.set_postfix(loss=loss_value)
+
+        if profiler is not None:
+            profiler.end_epoch()
+
+        # In modalità distribuita la loss riportata è la media su tutti i processi.
+        total_loss, num_batches = self._all_reduce_sum([total_loss, len(self.train_loader)])
+        return total_loss / num_batches
+
+    @torch.no_grad()
+    def validate(self) -> Dict[str, float]:
+        """Calcola loss media e accuratezza top-1 sul set di validazione."""
+        self.model.eval()
+        total_loss, correct, total = 0.0, 0, 0
+
+        for packs, pools, pick_numbers, choices in self.val_loader:
+            packs = packs.to(self.device)
+            pools = pools.to(self.device)
+            pick_numbers = pick_numbers.to(self.device)
+            choices = choices.to(self.device)
+
+            scores = self.model(packs, pools, pick_numbers)
+            # Somma pesata per il numero di campioni: l'ultimo batch può essere più piccolo.
+            total_loss += self.criterion(scores, choices).item() * choices.size(0)
+
+            # Come in AIBot, le posizioni di padding del pack non sono scelte valide.
+            padding_mask = packs.abs().sum(dim=2) == 0
+            predictions = scores.masked_fill(padding_mask, -float('inf')).argmax(dim=1)
+            correct += (predictions == choices).sum().item()
+            total += choices.size(0)
+
+        # Ogni processo valida il suo shard: sommiamo i contatori così tutti i rank
+        # vedono le stesse metriche e prendono le stesse decisioni (scheduler, early stopping).
+        total_loss, correct, total = self._all_reduce_sum([total_loss, correct, total])
+
+        if total == 0:
+            return {"loss": float('inf'), "top1_accuracy": 0.0}
+        return {"loss": total_loss / total, "top1_accuracy": correct / total}
 
     def train(self, num_epochs: int):
-        """Esegue il ciclo di addestramento completo per N epoche."""
-        print(f"\n--- Inizio Addestramento per {num_epochs} epoche ---")
+        """
+        Esegue il ciclo di addestramento completo per al massimo N epoche.
+        Con un set di validazione si ferma quando la loss di validazione non
+        migliora per 'early_stopping_patience' epoche e salva come modello
+        finale i pesi migliori.
+        """
+        self._log(f"\n--- Inizio Addestramento per {num_epochs} epoche ---")
+
+        best_val_loss = float('inf')
+        best_state, best_epoch = None, 0
+        epochs_without_improvement = 0
         
         for epoch in range(1, num_epochs + 1):
             avg_epoch_loss = self.train_epoch(epoch)
-            print(f"Epoch {epoch}/{num_epochs} - Loss media: {avg_epoch_loss:.4f}")
+
+            if self.val_loader is None:
+                self._log(f"Epoch {epoch}/{num_epochs} - Loss media: {avg_epoch_loss:.4f}")
+            else:
+                val_metrics = self.validate()
+                current_lr = self.optimizer.param_groups[0]['lr']
+                self._log(f"Epoch {epoch}/{num_epochs} - Loss media: {avg_epoch_loss:.4f} - "
+                      f"Val loss: {val_metrics['loss']:.4f} - "
+                      f"Val top-1: {val_metrics['top1_accuracy']:.2%} - LR: {current_lr:.2e}")
+
+                if self.scheduler is not None:
+                    self.scheduler.step(val_metrics['loss'])
+
+                if val_metrics['loss'] < best_val_loss:
+                    best_val_loss = val_metrics['loss']
+                    best_state = copy.deepcopy(self._unwrapped_model().state_dict())
+                    best_epoch = epoch
+                    epochs_without_improvement = 0
+                else:
+                    epochs_without_improvement += 1
             
             # Salva il modello alla fine di ogni epoca
             self.save_model(epoch)
 
-        print("\n--- Addestramento Completato ---")
+            if self.early_stopping_patience is not None and epochs_without_improvement >= self.early_stopping_patience:
+                self._log(f"Early stopping: nessun miglioramento della val loss da {epochs_without_improvement} epoche.")
+                break
+
+        if self.profiler is not None:
+            self.profiler.close()
+            self._log(f"Metriche per step salvate in: {self.profiler.metrics_path}")
+
+        self._log("\n--- Addestramento Completato ---")
+
+        if best_state is not None:
+            self._unwrapped_model().load_state_dict(best_state)
+            self._log(f"Ripristinati i pesi dell'epoca {best_epoch} (val loss: {best_val_loss:.4f}).")
         
         # Salviamo il modello finale come un file, non una cartella
-        final_model_path = self.save_dir / "model_final.pth"
-        torch.save(self.model.state_dict(), str(final_model_path))
-        print(f"Modello finale salvato in: {final_model_path}")
+        if self.is_main_process:
+            final_model_path = self.save_dir / "model_final.pth"
+            torch.save(self._unwrapped_model().state_dict(), str(final_model_path))
+            print(f"Modello finale salvato in: {final_model_path}")
 
     def save_model(self, epoch: int):
-        """Salva lo stato del modello."""
+        """Salva lo stato del modello (solo dal rank 0, senza il prefisso 'module.' di DDP)."""
+        if not self.is_main_process:
+            return
         save_path = self.save_dir / f"transformer_drafter_epoch_{epoch}.pth"
-        torch.save(self.model.state_dict(), save_path)
-        print(f"Modello salvato in: {save_path}")
\ No newline at end of file
+        torch.save(self._unwrapped_model().state_dict(), save_path)
+        print(f"Modello salvato in: {save_path}")
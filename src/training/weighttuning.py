@@ -0,0 +1,266 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.environment.draft import Card, Player
+from src.environment.draftsimulator import DraftSimulator
+from src.environment.opponents import ScoringBot
+from src.evaluation.deckanalyzer import DeckFeatureTable, score_pools
+from src.evaluation.evaluationengine import draft_seed
+
+# Ordine dei pesi nel vettore dei parametri: prima i base_weights, poi i context_weights.
+WEIGHT_KEYS: List[Tuple[str, str]] = (
+    [('base_weights', name) for name in ScoringBot.DEFAULT_BASE_WEIGHTS]
+    + [('context_weights', name) for name in ScoringBot.DEFAULT_CONTEXT_WEIGHTS]
+)
+
+# Stato per-processo dei worker: cubi, tabelle dei mazzi e feature delle carte
+# condivise da tutti i ScoringBot del worker.
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def weights_to_vector(weights: Dict[str, Dict[str, float]]) -> np.ndarray:
+    """Pesi di ScoringBot (mancanti = valori di default) nel vettore dei parametri."""
+    defaults = {'base_weights': ScoringBot.DEFAULT_BASE_WEIGHTS, 'context_weights': ScoringBot.DEFAULT_CONTEXT_WEIGHTS}
+    return np.array([weights.get(group, {}).get(name, defaults[group][name]) for group, name in WEIGHT_KEYS])
+
+
+def vector_to_weights(vector: np.ndarray) -> Dict[str, Dict[str, float]]:
+    weights: Dict[str, Dict[str, float]] = {'base_weights': {}, 'context_weights': {}}
+    for (group, name), value in zip(WEIGHT_KEYS, vector):
+        weights[group][name] = round(float(value), 4)
+    return weights
+
+
+class CMAES:
+    """
+    CMA-ES (mu/mu_w, lambda) per massimizzare una funzione rumorosa: ask()
+    restituisce la popolazione della generazione, tell() la aggiorna con i
+    punteggi. Parametri di default di Hansen, "The CMA Evolution Strategy: A Tutorial".
+    """
+    def __init__(self, mean: np.ndarray, sigma: float, population_size: Optional[int] = None, seed: Optional[int] = None):
+        n = len(mean)
+        self.dim = n
+        self.mean = np.array(mean, dtype=np.float64)
+        self.sigma = sigma
+        self.population_size = population_size or 4 + int(3 * np.log(n))
+        self.rng = np.random.default_rng(seed)
+
+        mu = self.population_size // 2
+        weights = np.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+        self.weights = weights / weights.sum()
+        self.mu_eff = 1 / np.sum(self.weights ** 2)
+
+        self.c_sigma = (self.mu_eff + 2) / (n + self.mu_eff + 5)
+        self.d_sigma = 1 + 2 * max(0.0, np.sqrt((self.mu_eff - 1) / (n + 1)) - 1) + self.c_sigma
+        self.c_c = (4 + self.mu_eff / n) / (n + 4 + 2 * self.mu_eff / n)
+        self.c_1 = 2 / ((n + 1.3) ** 2 + self.mu_eff)
+        self.c_mu = min(1 - self.c_1, 2 * (self.mu_eff - 2 + 1 / self.mu_eff) / ((n + 2) ** 2 + self.mu_eff))
+        self.chi_n = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+        self.p_sigma = np.zeros(n)
+        self.p_c = np.zeros(n)
+        self.C = np.eye(n)
+        self.generation = 0
+        self._B, self._D = np.eye(n), np.ones(n)
+
+    def ask(self) -> np.ndarray:
+        """Popolazione [population_size, dim] campionata da N(mean, sigma^2 C)."""
+        eigenvalues, self._B = np.linalg.eigh(self.C)
+        self._D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+        z = self.rng.standard_normal((self.population_size, self.dim))
+        return self.mean + self.sigma * (z * self._D) @ self._B.T
+
+    def tell(self, solutions: np.ndarray, fitness: np.ndarray):
+        """Aggiorna media, covarianza e passo con i punteggi (più alto = migliore)."""
+        mu = len(self.weights)
+        best = np.argsort(-np.asarray(fitness))[:mu]
+        y = (solutions[best] - self.mean) / self.sigma
+        y_w = self.weights @ y
+        self.mean = self.mean + self.sigma * y_w
+
+        c_inv_sqrt = self._B @ np.diag(1 / self._D) @ self._B.T
+        self.p_sigma = (1 - self.c_sigma) * self.p_sigma + np.sqrt(self.c_sigma * (2 - self.c_sigma) * self.mu_eff) * (c_inv_sqrt @ y_w)
+        norm_p_sigma = np.linalg.norm(self.p_sigma)
+        h_sigma = norm_p_sigma / np.sqrt(1 - (1 - self.c_sigma) ** (2 * (self.generation + 1))) < (1.4 + 2 / (self.dim + 1)) * self.chi_n
+        self.p_c = (1 - self.c_c) * self.p_c + h_sigma * np.sqrt(self.c_c * (2 - self.c_c) * self.mu_eff) * y_w
+
+        rank_mu = (self.weights[:, None] * y).T @ y
+        self.C = (
+            (1 - self.c_1 - self.c_mu) * self.C
+            + self.c_1 * (np.outer(self.p_c, self.p_c) + (1 - h_sigma) * self.c_c * (2 - self.c_c) * self.C)
+            + self.c_mu * rank_mu
+        )
+        self.sigma *= np.exp((self.c_sigma / self.d_sigma) * (norm_p_sigma / self.chi_n - 1))
+        self.generation += 1
+
+
+def _init_worker(cubes: Dict[str, List[Card]], sim_config: Dict, deck_config: Dict):
+    """Initializer del pool: cubi e tabelle dei mazzi una volta per processo."""
+    _WORKER_STATE.update(
+        cubes=cubes,
+        deck_tables={name: DeckFeatureTable(cards) for name, cards in cubes.items()},
+        feature_cache={},
+        sim_config=sim_config,
+        deck_config=deck_config
+    )
+
+
+def _play_tuning_draft(task: Tuple) -> List[float]:
+    """
+    Un draft sulle buste del seme: 'candidate' al posto 'seat' (o a tutti i
+    posti se seat è None) e 'reference' negli altri. Punteggi di tutti i posti.
+    """
+    cube_name, seed, seat, candidate, reference = task
+    sim_config = _WORKER_STATE['sim_config']
+    num_players = sim_config['num_players']
+    cube = _WORKER_STATE['cubes'][cube_name]
+    pack_rounds = DraftSimulator.generate_pack_rounds(
+        cube, num_players, sim_config['pack_size'], sim_config['num_packs'], random.Random(seed)
+    )
+    random.seed(seed)
+    bots = [
+        ScoringBot(
+            Player(player_id=j),
+            weights=candidate if seat is None or j == seat else reference,
+            feature_cache=_WORKER_STATE['feature_cache']
+        )
+        for j in range(num_players)
+    ]
+    final_players = DraftSimulator(
+        cube, bots, num_players, sim_config['pack_size'], sim_config['num_packs'],
+        draft_id=f"tune_{cube_name}_{seed}", pack_rounds=pack_rounds
+    ).run_draft(verbose=False)
+    deck_metrics = score_pools(
+        [final_players[j].pool for j in range(num_players)],
+        _WORKER_STATE['deck_tables'][cube_name],
+        _WORKER_STATE['deck_config']
+    )
+    return [metrics['final_score'] for metrics in deck_metrics]
+
+
+class WeightTuner:
+    """
+    Ottimizza i pesi di ScoringBot con CMA-ES. Ogni generazione gioca per ogni
+    candidato gli stessi draft (buste generate dagli stessi semi, nuovi a ogni
+    generazione) su un pool di processi.
+
+    fitness "seat": il candidato gioca a un posto (a rotazione) contro i
+    ScoringBot di riferimento; il punteggio è la differenza media rispetto al
+    draft di soli bot di riferimento sulle stesse buste e allo stesso posto.
+    fitness "table": tutti gli 8 posti usano il candidato; il punteggio è la
+    media dei mazzi del tavolo (utile per generare log da bot tutti uguali).
+    """
+    def __init__(
+        self,
+        cubes: Dict[str, List[Card]],
+        sim_config: Dict,
+        deck_config: Dict,
+        tuning_config: Dict,
+        reference_weights: Dict[str, Dict[str, float]]
+    ):
+        self.cubes = cubes
+        self.cube_names = sorted(cubes)
+        self.sim_config = sim_config
+        self.deck_config = deck_config
+        self.config = tuning_config
+        self.fitness_mode = tuning_config.get('fitness', 'seat')
+        if self.fitness_mode not in ('seat', 'table'):
+            raise ValueError(f"Fitness non riconosciuta: {self.fitness_mode} (attese 'seat' o 'table').")
+        self.reference = vector_to_weights(weights_to_vector(reference_weights))
+        self.seed = tuning_config.get('seed', 0)
+        self.num_workers = tuning_config.get('num_workers') or 1
+
+    def _draft_keys(self, offset: int, count: int) -> List[Tuple[str, int, Optional[int]]]:
+        """(cubo, seme, posto) dei draft da 'offset': cubi alternati, posti a rotazione."""
+        num_players = self.sim_config['num_players']
+        keys = []
+        for i in range(offset, offset + count):
+            cube_name = self.cube_names[i % len(self.cube_names)]
+            seat = i % num_players if self.fitness_mode == 'seat' else None
+            keys.append((cube_name, draft_seed(self.seed, cube_name, i), seat))
+        return keys
+
+    def _evaluate(self, executor: ProcessPoolExecutor, candidates: List[Dict], keys: List[Tuple]) -> np.ndarray:
+        """Fitness di ogni candidato sugli stessi draft 'keys'."""
+        tasks = [(cube_name, seed, seat, candidate, self.reference)
+                 for candidate in candidates for cube_name, seed, seat in keys]
+        if self.fitness_mode == 'seat':
+            # Draft di riferimento: solo bot di riferimento, uno per seme.
+            tasks += [(cube_name, seed, None, self.reference, self.reference) for cube_name, seed, _ in keys]
+        chunksize = max(1, len(tasks) // (4 * self.num_workers))
+        results = list(executor.map(_play_tuning_draft, tasks, chunksize=chunksize))
+
+        scores = np.array(results[:len(candidates) * len(keys)]).reshape(len(candidates), len(keys), -1)
+        if self.fitness_mode == 'table':
+            return scores.mean(axis=(1, 2))
+        baseline = np.array(results[len(candidates) * len(keys):])
+        seats = np.array([seat for _, _, seat in keys])
+        draft_range = np.arange(len(keys))
+        return (scores[:, draft_range, seats] - baseline[draft_range, seats]).mean(axis=1)
+
+    def run(self, on_generation: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Esegue le generazioni, poi rivaluta la media finale e il miglior
+        candidato visto su draft di validazione mai usati. Restituisce la storia
+        e i pesi migliori con la loro fitness di validazione (nella fitness
+        "seat" il riferimento vale 0 per definizione).
+        """
+        generations = self.config.get('generations', 20)
+        drafts = self.config.get('drafts_per_candidate', 16)
+        strategy = CMAES(
+            weights_to_vector(self.reference),
+            sigma=self.config.get('sigma', 0.5),
+            population_size=self.config.get('population_size'),
+            seed=self.seed
+        )
+        history, best_vector, best_fitness = [], None, -np.inf
+
+        context = get_context('spawn')
+        with ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.cubes, self.sim_config, self.deck_config)
+        ) as executor:
+            for generation in range(generations):
+                population = strategy.ask()
+                keys = self._draft_keys(generation * drafts, drafts)
+                fitness = self._evaluate(executor, [vector_to_weights(v) for v in population], keys)
+                strategy.tell(population, fitness)
+
+                best = int(np.argmax(fitness))
+                if fitness[best] > best_fitness:
+                    best_vector, best_fitness = population[best], float(fitness[best])
+                record = {
+                    "generation": generation,
+                    "best_fitness": float(fitness[best]),
+                    "mean_fitness": float(np.mean(fitness)),
+                    "sigma": float(strategy.sigma),
+                    "best_weights": vector_to_weights(population[best])
+                }
+                history.append(record)
+                if on_generation:
+                    on_generation(record)
+
+            # Validazione: media finale, miglior candidato e riferimento sugli stessi draft nuovi.
+            finalists = {
+                "mean": vector_to_weights(strategy.mean),
+                "best_seen": vector_to_weights(best_vector),
+                "reference": self.reference
+            }
+            keys = self._draft_keys(generations * drafts, self.config.get('validation_drafts', 64))
+            validation = self._evaluate(executor, list(finalists.values()), keys)
+
+        scores = dict(zip(finalists, (float(v) for v in validation)))
+        winner = max(scores, key=scores.get)
+        return {
+            "history": history,
+            "validation": scores,
+            "best_name": winner,
+            "best_weights": finalists[winner],
+            "improvement": scores[winner] - scores["reference"]
+        }
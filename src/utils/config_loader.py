@@ -1,4 +1,6 @@
+import copy
 import yaml
+from collections.abc import MutableMapping
 from pathlib import Path
 
 def load_config() -> dict:
@@ -14,6 +16,49 @@ def load_config() -> dict:
         
     return config
 
-# Carica la configurazione una sola volta quando il modulo viene importato.
+
+class LazyConfig(MutableMapping):
+    """
+    Configurazione caricata al primo accesso invece che all'import: i moduli
+    (e i processi worker) che importano CONFIG senza usarlo non pagano il
+    parsing del YAML. Si comporta come il dizionario della configurazione.
+    """
+    def __init__(self, loader=load_config):
+        self._loader = loader
+        self._data = None
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = self._loader()
+        return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __repr__(self) -> str:
+        return repr(self.data) if self._data is not None else "LazyConfig(<non ancora caricata>)"
+
+    # Copie e pickle producono un normale dizionario (es. per i worker dello sweep).
+    def __deepcopy__(self, memo) -> dict:
+        return copy.deepcopy(self.data, memo)
+
+    def __reduce__(self):
+        return (dict, (self.data,))
+
+
+# La configurazione viene letta una sola volta, al primo accesso.
 # Altri file possono semplicemente importare questa variabile CONFIG.
-CONFIG = load_config()
\ No newline at end of file
+CONFIG = LazyConfig()
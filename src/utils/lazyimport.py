@@ -0,0 +1,29 @@
+import importlib
+from types import ModuleType
+
+
+class _LazyModule(ModuleType):
+    """Segnaposto di un modulo che viene importato davvero al primo attributo richiesto."""
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._module = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Restituisce il modulo 'name' senza importarlo subito. Serve per le dipendenze
+    pesanti (torch, scipy) nei moduli usati anche da chi non ne ha bisogno, ad
+    esempio i worker che simulano draft con soli ScoringBot.
+    """
+    return _LazyModule(name)
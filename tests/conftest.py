@@ -0,0 +1,51 @@
+import random
+from typing import List
+
+import pytest
+
+from src.environment.draft import Card
+
+_COLORS = "WUBRG"
+_TYPES = ["Creature — Elf", "Creature — Zombie", "Instant", "Sorcery", "Enchantment", "Artifact", "Land"]
+_ORACLE = [
+    "",
+    "Destroy target creature.",
+    "Exile target artifact or enchantment.",
+    "Counter target spell.",
+    "This deals 2 damage to each creature.",
+    "Draw a card.",
+    "Flying",
+    "When this creature enters the battlefield, draw a card.",
+]
+
+
+def make_cube(num_cards: int = 360, seed: int = 0) -> List[Card]:
+    """Cubo sintetico con colori, costi, tipi e testi vari (nessun file esterno)."""
+    rng = random.Random(seed)
+    cube = []
+    for i in range(num_cards):
+        colors = rng.sample(_COLORS, rng.choice([0, 1, 1, 1, 2]))
+        cmc = rng.randint(0, 6)
+        generic = max(0, cmc - len(colors))
+        mana_cost = (f"{{{generic}}}" if generic else "") + "".join(f"{{{c}}}" for c in colors)
+        type_line = rng.choice(_TYPES)
+        details = {
+            "name": f"Carta {i}",
+            "colors": colors,
+            "color_identity": colors,
+            "cmc": float(cmc),
+            "mana_cost": mana_cost,
+            "type_line": type_line,
+            "oracle_text": rng.choice(_ORACLE),
+            "keywords": ["Flying"] if rng.random() < 0.2 else [],
+            "rarity": "common",
+        }
+        if type_line.startswith("Creature"):
+            details["power"], details["toughness"] = str(rng.randint(1, 4)), str(rng.randint(1, 4))
+        cube.append(Card(name=details["name"], details=details))
+    return cube
+
+
+@pytest.fixture
+def cube() -> List[Card]:
+    return make_cube()
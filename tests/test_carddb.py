@@ -0,0 +1,54 @@
+import io
+import json
+
+import pytest
+
+from src.data.carddb import CardDatabase, ingest_card_file, iter_json_array, rarity_filter
+
+CARDS = [
+    {"name": "Lightning Bolt", "rarity": "common", "cmc": 1.0},
+    {"name": "Fire // Ice", "rarity": "common", "cmc": 4.0, "text": "{ \"annidato\": [1, 2] }"},
+    {"name": "Lightning Bolt", "rarity": "uncommon", "cmc": 1.0, "set": "ristampa"},
+    {"name": "Counterspell", "rarity": "uncommon", "cmc": 2.0},
+    {"name": "Ice", "rarity": "common", "cmc": 2.0},
+    {"name": "Æther Adept", "rarity": "common", "cmc": 2.0},
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 16])
+def test_iter_json_array_matches_json_load(chunk_size):
+    text = json.dumps(CARDS, indent=2)
+    assert list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == CARDS
+
+
+def test_iter_json_array_rejects_bad_input():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('{"non": "un array"}')))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"name": "a"}, '), chunk_size=4))
+    assert list(iter_json_array(io.StringIO("[]"))) == []
+
+
+def test_ingest_card_file(tmp_path):
+    source = tmp_path / "bulk.json"
+    source.write_text(json.dumps(CARDS), encoding="utf-8")
+    db_path = tmp_path / "cards.sqlite"
+
+    num_cards = ingest_card_file(source, db_path, predicate=rarity_filter("common"), batch_size=2)
+    assert num_cards == 4
+
+    with CardDatabase(db_path) as database:
+        assert len(database) == 4
+        ids = database.resolve_ids(["Fire // Ice", "Fire", "Ice", "Lightning Bolt", "Counterspell", "Æther Adept"])
+        # Le facce di "A // B" sono alias della carta intera, ma un nome completo ha la precedenza.
+        assert ids["Fire"] == ids["Fire // Ice"]
+        assert ids["Ice"] != ids["Fire // Ice"]
+        # Le rarità escluse dal predicato non entrano nel database.
+        assert "Counterspell" not in ids
+        assert "Æther Adept" in database
+
+        details = database.get_by_ids([ids["Lightning Bolt"], ids["Fire"]])
+        # Di ogni nome si tiene la prima stampa che soddisfa il predicato.
+        assert details[ids["Lightning Bolt"]] == CARDS[0]
+        assert details[ids["Fire"]] == CARDS[1]
+        assert database.get("Fire") == CARDS[1]
@@ -0,0 +1,114 @@
+import json
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from src.data.cardstats import CardStatsAccumulator, CardStatsTable, iter_draft_logs, read_pick_fields
+from src.environment.draft import Card, Player
+from src.environment.draftsimulator import DraftSimulator
+from src.environment.opponents import RandomBot
+from src.training.logger import DraftLogger
+
+from tests.conftest import make_cube
+
+NUM_PLAYERS, PACK_SIZE, NUM_PACKS = 4, 5, 3
+
+
+@pytest.fixture
+def log_files(tmp_path):
+    """Log reali di DraftLogger, con nomi che mettono alla prova la lettura veloce."""
+    cube = make_cube(120)
+    # Virgolette, caratteri non ASCII e una parentesi quadra nel nome.
+    cube[0] = Card(name='Carta "Æther" [0]', details=cube[0].details)
+    cube[1] = Card(name="Fire // Ice", details=cube[1].details)
+    logger = DraftLogger(log_dir=tmp_path)
+    random.seed(0)
+    for draft_index in range(6):
+        bots = [RandomBot(Player(player_id=j)) for j in range(NUM_PLAYERS)]
+        simulator = DraftSimulator(
+            cube, bots, NUM_PLAYERS, PACK_SIZE, NUM_PACKS, draft_id=f"test_{draft_index}",
+            logger=logger, rng=random.Random(draft_index), cube_name="cubo_a" if draft_index % 2 else 'cubo "b"'
+        )
+        simulator.run_draft(verbose=False)
+    return sorted(tmp_path.glob("*.json"))
+
+
+def _stats_fields(log):
+    return {
+        "cube": log.get("cube"),
+        "picks": [
+            {key: pick[key] for key in ("pack_cards", "player_id", "pick_num", "choice_index")}
+            for pick in log["picks"]
+        ]
+    }
+
+
+def test_read_pick_fields_matches_json_load(log_files):
+    assert log_files
+    for log_file in log_files:
+        with open(log_file, encoding="utf-8") as f:
+            expected = _stats_fields(json.load(f))
+        assert read_pick_fields(log_file) == expected
+
+
+def test_read_pick_fields_old_log_without_names(tmp_path):
+    log_file = tmp_path / "old.json"
+    log_file.write_text(json.dumps({"draft_id": 1, "picks": [
+        {"player_id": 0, "pack_num": 1, "pick_num": 1, "pack": [[0.0]], "pool": [], "choice_index": 0}
+    ]}), encoding="utf-8")
+    log = read_pick_fields(log_file)
+    assert log["cube"] is None
+    assert "pack_cards" not in log["picks"][0]
+
+    accumulator = CardStatsAccumulator()
+    accumulator.add_draft(log)
+    assert accumulator.skipped == 1 and accumulator.drafts == 0
+
+
+def test_accumulator_matches_naive_counts(log_files, tmp_path):
+    # batch_rows piccolo: più flush con tabelle che crescono tra un flush e l'altro.
+    accumulator = CardStatsAccumulator(batch_rows=50)
+    for log in iter_draft_logs(log_files):
+        accumulator.add_draft(log)
+    table = accumulator.table()
+
+    seen, picked, position_sum, seen_first, picked_first, seen_wheel = (Counter() for _ in range(6))
+    for log_file in log_files:
+        with open(log_file, encoding="utf-8") as f:
+            log = json.load(f)
+        for pick in log["picks"]:
+            for slot, name in enumerate(pick["pack_cards"]):
+                key = (log["cube"], name)
+                seen[key] += 1
+                taken = slot == pick["choice_index"]
+                picked[key] += taken
+                position_sum[key] += pick["pick_num"] * taken
+                if pick["pick_num"] == 1:
+                    seen_first[key] += 1
+                    picked_first[key] += taken
+                if pick["pick_num"] == NUM_PLAYERS + 1:
+                    seen_wheel[key] += 1
+
+    expected = {
+        "seen": seen, "picked": picked, "taken_position_sum": position_sum,
+        "seen_first": seen_first, "picked_first": picked_first, "seen_wheel": seen_wheel
+    }
+    for field, counter in expected.items():
+        for (cube_name, card_name), value in counter.items():
+            row, column = table.cube_names.index(cube_name), table.card_names.index(card_name)
+            assert table.counts[field][row, column] == value, (field, cube_name, card_name)
+        assert table.counts[field].sum() == sum(counter.values())
+    assert table.drafts == len(log_files)
+    assert table.picks == NUM_PLAYERS * PACK_SIZE * NUM_PACKS * len(log_files)
+
+    # Il salvataggio compatto conserva tutto.
+    path = tmp_path / "stats" / "card_stats.npz"
+    table.save(path)
+    loaded = CardStatsTable.load(path)
+    assert loaded.cube_names == table.cube_names and loaded.card_names == table.card_names
+    for field in expected:
+        np.testing.assert_array_equal(loaded.counts[field], table.counts[field])
+    stats = loaded.statistics()
+    assert np.all(stats["pick_rate"][stats["seen"] > 0] <= 1.0)
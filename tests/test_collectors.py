@@ -0,0 +1,135 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.data.collectors import CubeDownloader, download_scryfall_bulk
+
+CUBE_LIST = "\n".join(f"Carta {i}" for i in range(5))
+ETAG = '"v1"'
+BULK = [{"name": "Lightning Bolt", "rarity": "common"}]
+
+
+class _CubeCobraStandIn(BaseHTTPRequestHandler):
+    """
+    Sostituto locale di CubeCobra (risponde 304 se l'ETag inviato è quello
+    corrente) e dei bulk data di Scryfall.
+    """
+    requests = []
+    bulk_updated_at = "2024-01-01T10:00:00+00:00"
+
+    def do_GET(self):
+        type(self).requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path.startswith("/bulk-data/"):
+            host = self.headers.get("Host")
+            self._send_json({"updated_at": type(self).bulk_updated_at, "download_uri": f"http://{host}/files/bulk.json"})
+            return
+        if self.path == "/files/bulk.json":
+            self._send_json(BULK)
+            return
+        if not self.path.startswith("/cube/api/cubelist/"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        body = CUBE_LIST.encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # Nessun proxy di sistema per il server locale.
+    for variable in ("HTTP_PROXY", "HTTPS_PROXY", "http_proxy", "https_proxy", "ALL_PROXY", "all_proxy"):
+        monkeypatch.delenv(variable, raising=False)
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+    _CubeCobraStandIn.requests = []
+    monkeypatch.setattr(_CubeCobraStandIn, "bulk_updated_at", _CubeCobraStandIn.bulk_updated_at)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _CubeCobraStandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _downloader(tmp_path, base_url):
+    return CubeDownloader(output_dir=tmp_path, base_url=base_url, max_workers=2, max_retries=0, min_cards=3)
+
+
+def test_download_then_not_modified(tmp_path, server):
+    with _downloader(tmp_path, server) as downloader:
+        assert downloader.download_many(["cubo_a", "cubo_b"]) == {"cubo_a": "updated", "cubo_b": "updated"}
+
+    saved = json.loads((tmp_path / "cubo_a.json").read_text(encoding="utf-8"))
+    assert saved["cards"] == CUBE_LIST.split("\n")
+    assert saved["card_count"] == 5
+    metadata = json.loads((tmp_path / CubeDownloader.METADATA_FILE).read_text(encoding="utf-8"))
+    assert metadata["cubo_a"]["etag"] == ETAG
+    # Accanto alle liste ci sono solo i cubi tra i file .json.
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["cubo_a.json", "cubo_b.json"]
+
+    # Seconda esecuzione (nuovo downloader, metadati letti dal disco): richieste condizionali e 304.
+    _CubeCobraStandIn.requests = []
+    with _downloader(tmp_path, server) as downloader:
+        assert downloader.download_many(["cubo_a"]) == {"cubo_a": "not_modified"}
+    assert _CubeCobraStandIn.requests == [("/cube/api/cubelist/cubo_a", ETAG)]
+
+
+def test_missing_local_copy_skips_conditional_headers(tmp_path, server):
+    with _downloader(tmp_path, server) as downloader:
+        downloader.download_many(["cubo_a"])
+    (tmp_path / "cubo_a.json").unlink()
+
+    _CubeCobraStandIn.requests = []
+    with _downloader(tmp_path, server) as downloader:
+        assert downloader.download_many(["cubo_a"]) == {"cubo_a": "updated"}
+    assert _CubeCobraStandIn.requests == [("/cube/api/cubelist/cubo_a", None)]
+    assert (tmp_path / "cubo_a.json").exists()
+
+
+def test_legacy_metadata_file_is_migrated(tmp_path, server):
+    (tmp_path / "cubo_a.json").write_text(json.dumps({"id": "cubo_a", "cards": []}), encoding="utf-8")
+    (tmp_path / CubeDownloader.LEGACY_METADATA_FILE).write_text(json.dumps({"cubo_a": {"etag": ETAG}}), encoding="utf-8")
+
+    with _downloader(tmp_path, server) as downloader:
+        assert downloader.download_many(["cubo_a"]) == {"cubo_a": "not_modified"}
+    assert not (tmp_path / CubeDownloader.LEGACY_METADATA_FILE).exists()
+    assert json.loads((tmp_path / CubeDownloader.METADATA_FILE).read_text(encoding="utf-8"))["cubo_a"]["etag"] == ETAG
+
+
+def test_bulk_download_follows_updated_at(tmp_path, server):
+    output_path = tmp_path / "bulk.json"
+    download_scryfall_bulk(output_path, bulk_type="default_cards", api_url=server)
+    assert json.loads(output_path.read_text(encoding="utf-8")) == BULK
+
+    # Stessa versione su Scryfall: solo la richiesta dei metadati, nessun download.
+    _CubeCobraStandIn.requests = []
+    download_scryfall_bulk(output_path, bulk_type="default_cards", api_url=server)
+    assert [path for path, _ in _CubeCobraStandIn.requests] == ["/bulk-data/default_cards"]
+
+    # Nuova versione: il file viene riscaricato.
+    _CubeCobraStandIn.requests = []
+    _CubeCobraStandIn.bulk_updated_at = "2024-02-01T10:00:00+00:00"
+    download_scryfall_bulk(output_path, bulk_type="default_cards", api_url=server)
+    assert [path for path, _ in _CubeCobraStandIn.requests] == ["/bulk-data/default_cards", "/files/bulk.json"]
@@ -0,0 +1,20 @@
+import random
+
+from src.evaluation.deckanalyzer import DeckFeatureTable, evaluate_deck, evaluate_decks_batch
+
+
+def test_evaluate_decks_batch_matches_evaluate_deck(cube):
+    """La versione vettorizzata deve dare esattamente le metriche di evaluate_deck."""
+    rng = random.Random(1)
+    pools = [rng.sample(cube, rng.choice([0, 10, 22, 23, 30, 45])) for _ in range(200)]
+    # Anche pool con copie della stessa carta.
+    pools += [rng.choices(cube[:40], k=45) for _ in range(20)]
+
+    table = DeckFeatureTable(cube)
+    batch = evaluate_decks_batch(pools, table)
+    assert batch == [evaluate_deck(pool) for pool in pools]
+
+
+def test_evaluate_decks_batch_without_table(cube):
+    pools = [cube[:45], cube[45:90]]
+    assert evaluate_decks_batch(pools) == [evaluate_deck(pool) for pool in pools]
@@ -0,0 +1,127 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.environment.draft import Player
+from src.environment.draftsimulator import DraftSimulator
+from src.environment.draftstate import RolloutPolicy, RolloutTable, rollout_scores
+from src.environment.opponents import BaseBot
+from src.evaluation.deckanalyzer import evaluate_deck
+
+NUM_PLAYERS, PACK_SIZE, NUM_PACKS = 4, 6, 3
+SNAPSHOT_AT = (2, 3, 2)  # round, pick, posto
+
+
+class _SnapshotBot(BaseBot):
+    """Prende la prima carta e, al pick indicato, salva lo stato del draft."""
+    def __init__(self, player, table):
+        super().__init__(player)
+        self.table = table
+        self.simulator = None
+        self.snapshot = None
+
+    def bind_simulator(self, simulator):
+        self.simulator = simulator
+
+    def pick(self, pack, pack_number, pick_number):
+        if (pack_number, pick_number, self.player.player_id) == SNAPSHOT_AT:
+            self.snapshot = self.simulator.snapshot(self.table)
+        return pack.cards[0]
+
+
+def _draft_state(cube, pack_rounds: bool):
+    table = RolloutTable(cube, base_score=lambda card: card.details["cmc"])
+    bots = [_SnapshotBot(Player(player_id=j), table) for j in range(NUM_PLAYERS)]
+    rounds = DraftSimulator.generate_pack_rounds(cube, NUM_PLAYERS, PACK_SIZE, NUM_PACKS, random.Random(0)) if pack_rounds else None
+    DraftSimulator(cube, bots, NUM_PLAYERS, PACK_SIZE, NUM_PACKS, draft_id="test",
+                   rng=random.Random(0), pack_rounds=rounds).run_draft(verbose=False)
+    state = bots[SNAPSHOT_AT[2]].snapshot
+    assert state is not None
+    return table, state
+
+
+def _card_counts(table, *arrays):
+    counts = np.bincount(np.concatenate([array.ravel() for array in arrays]), minlength=len(table.cube_counts))
+    counts[table.empty] = 0
+    return counts
+
+
+@pytest.mark.parametrize("pack_rounds", [True, False])
+def test_fork_is_independent(cube, pack_rounds):
+    _, state = _draft_state(cube, pack_rounds)
+    packs, pools = state.packs.copy(), state.pools.copy()
+    fork = state.fork()
+    fork.packs[:] = 0
+    fork.pools[:] = 0
+    fork.pool_sizes[:] = 0
+    fork.color_counts[:] = 0
+    np.testing.assert_array_equal(state.packs, packs)
+    np.testing.assert_array_equal(state.pools, pools)
+    assert state.pool_sizes.sum() > 0 and state.color_counts.sum() > 0
+    # I round futuri sono condivisi in sola lettura.
+    assert fork.future_rounds is state.future_rounds
+    assert fork.undealt is state.undealt
+
+
+def test_snapshot_matches_simulator_state(cube):
+    table, state = _draft_state(cube, pack_rounds=True)
+    pack_number, pick_number, seat = SNAPSHOT_AT
+    assert (state.pack_number, state.pick_number) == (pack_number, pick_number)
+    np.testing.assert_array_equal(state.picked, np.arange(NUM_PLAYERS) < seat)
+    np.testing.assert_array_equal(state.pool_sizes, (state.pools != table.empty).sum(axis=1))
+    np.testing.assert_array_equal(state.color_counts, table.color_presence[state.pools].sum(axis=-2))
+    assert state.future_rounds.shape == (NUM_PACKS - pack_number, NUM_PLAYERS, PACK_SIZE)
+
+
+@pytest.mark.parametrize("pack_rounds", [True, False])
+def test_expand_perfect_information(cube, pack_rounds):
+    table, state = _draft_state(cube, pack_rounds)
+    lanes = state.expand(5, table, np.random.default_rng(0))
+    for lane in range(5):
+        np.testing.assert_array_equal(lanes.packs[lane], state.packs)
+        np.testing.assert_array_equal(lanes.pools[lane], state.pools)
+        # Nessuna carta compare più volte di quante ne ha il cubo.
+        assert np.all(_card_counts(table, lanes.packs[lane], lanes.pools[lane], lanes.future_rounds[lane]) <= table.cube_counts)
+    if pack_rounds:
+        np.testing.assert_array_equal(lanes.future_rounds[3], state.future_rounds)
+    assert lanes.undealt is None
+    # Lo stato di partenza non viene toccato dalle corsie.
+    lanes.packs[:] = table.empty
+    assert (state.packs != table.empty).any()
+
+
+def test_expand_with_observer_resamples_hidden_cards(cube):
+    table, state = _draft_state(cube, pack_rounds=True)
+    observer = SNAPSHOT_AT[2]
+    lanes = state.expand(8, table, np.random.default_rng(1), observer=observer)
+    others = np.arange(NUM_PLAYERS) != observer
+
+    for lane in range(8):
+        # L'osservatore vede la sua busta e il suo pool così come sono.
+        np.testing.assert_array_equal(lanes.packs[lane, observer], state.packs[observer])
+        np.testing.assert_array_equal(lanes.pools[lane, observer], state.pools[observer])
+        # Le dimensioni di buste e pool degli altri restano quelle vere.
+        np.testing.assert_array_equal(lanes.packs[lane] == table.empty, state.packs == table.empty)
+        np.testing.assert_array_equal(lanes.pools[lane] == table.empty, state.pools == table.empty)
+        assert np.all(_card_counts(table, lanes.packs[lane], lanes.pools[lane], lanes.future_rounds[lane]) <= table.cube_counts)
+        np.testing.assert_array_equal(lanes.color_counts[lane], table.color_presence[lanes.pools[lane]].sum(axis=-2))
+
+    # Le carte nascoste vengono ripescate: le corsie non sono tutte uguali.
+    hidden_packs = lanes.packs[:, others]
+    assert any(not np.array_equal(hidden_packs[0], hidden_packs[lane]) for lane in range(1, 8))
+
+
+def test_rollout_scores_match_evaluate_deck(cube):
+    table, state = _draft_state(cube, pack_rounds=True)
+    seat = SNAPSHOT_AT[2]
+    lanes = state.expand(4, table, np.random.default_rng(2))
+    first_slots = np.zeros(4, dtype=np.int64)
+    scores = rollout_scores(lanes, table, seat, first_slots, RolloutPolicy(), np.random.default_rng(3))
+
+    # Alla fine ogni pool è completo e il punteggio è quello di evaluate_deck.
+    assert np.all(lanes.pool_sizes == NUM_PACKS * PACK_SIZE)
+    cards = table.deck_table.cards
+    for lane in range(4):
+        pool = [cards[index] for index in lanes.pools[lane, seat]]
+        assert scores[lane] == pytest.approx(evaluate_deck(pool)["final_score"])